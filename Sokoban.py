@@ -4,11 +4,13 @@ import sys
 import time
 import os
 
-from typing import List, Tuple, Optional
-from sokoban_common import SokobanState, MOVES
-from astar_solver import solve_sokoban_astar
+from typing import Iterator, List, Tuple, Optional
+from sokoban_common import SokobanState, CancellationToken, ResultsSink, MOVES, load_maps, map_to_game_state
+from astar_solver import solve_sokoban_astar_anytime
 from hill_climbing_solver import solve_sokoban_hillclimbing
 from bfs_solver import solve_sokoban_bfs
+from idastar_solver import solve_sokoban_idastar
+from portfolio_solver import solve_sokoban_portfolio
 
 class SokobanGame:
     WHITE = (255, 255, 255)
@@ -36,13 +38,14 @@ class SokobanGame:
         self.load_assets()
         self.maps = self.load_maps('maps.txt')
         self.current_algorithm = 'hillclimbing'
-        self.algorithms = ['hillclimbing','astar','bfs']
+        self.algorithms = ['hillclimbing','astar','bfs','idastar','portfolio']
         self.player_direction = 'player' 
         self.game_time = 0
         self.start_time = None
         self.pause_time = 0
         self.is_paused = False
         self.solve_time = 0
+        self.solve_timeout = 30  # Thời gian tìm lời giải tối đa (giây)
         self.solve_steps = 0      
         self.player_moves = []
         self.player_moves_by_space = []
@@ -209,47 +212,12 @@ class SokobanGame:
     # Đọc map
     @staticmethod
     def load_maps(filename: str) -> List[List[str]]:
-        maps = []
-        current_map = []
-        with open(filename, 'r') as file:
-            for line in file:
-                line = line.strip()
-                if line.startswith('#'):
-                    if current_map:
-                        maps.append(current_map)
-                        current_map = []
-                elif line:
-                    current_map.append(line)
-            if current_map:
-                maps.append(current_map)
-        return maps
+        return load_maps(filename)
     
     # Chuyển map thành mê cung
     @staticmethod
     def map_to_game_state(map_data: List[str]) -> Tuple[List[List[int]], Tuple[int, int], List[Tuple[int, int]], List[Tuple[int, int]]]:
-        maze = []
-        player_pos = None
-        boxes = []
-        targets = []
-        
-        for y, row in enumerate(map_data):
-            maze_row = []
-            for x, cell in enumerate(row):
-                if cell == 'W':
-                    maze_row.append(1)
-                elif cell == 'P':
-                    maze_row.append(0)
-                    player_pos = (x, y)
-                elif cell == 'B':
-                    maze_row.append(0)
-                    boxes.append((x, y))
-                elif cell == 'T':
-                    maze_row.append(0)
-                    targets.append((x, y))
-                else:
-                    maze_row.append(0)
-            maze.append(maze_row)
-        return maze, player_pos, boxes, targets
+        return map_to_game_state(map_data)
     
     def draw_background(self):
         # Tải hình ảnh nền
@@ -658,23 +626,31 @@ class SokobanGame:
             (new_x, new_y),
             frozenset(new_boxes),
             current_state.targets,
-            current_state._zone_map,
-            current_state._deadlock_cache
+            current_state.level
         ), True
     
     # Giới hạn thời gian tìm kiếm
     def solve_with_timeout(self, solver_func, *args):
         solution = [None]
+        # Bộ giải tự kiểm tra thời hạn và cờ hủy, nên luồng không tiếp tục chạy ngầm sau khi hết giờ
+        cancel_token = CancellationToken()
+        deadline = time.time() + self.solve_timeout
         def target():
-            solution[0] = solver_func(*args)
+            result = solver_func(*args, deadline=deadline, cancel_token=cancel_token)
+            if isinstance(result, Iterator):
+                # Bộ giải anytime: giữ lại lời giải tốt nhất mỗi khi có lời giải mới
+                for improved in result:
+                    solution[0] = improved.moves
+            else:
+                solution[0] = result
         
-        thread = threading.Thread(target=target)
+        thread = threading.Thread(target=target, daemon=True)
         thread.start()
-        thread.join(30)  # Đợi tối đa 30 giây
+        thread.join(self.solve_timeout)  # Đợi tối đa 30 giây
+        cancel_token.cancel()
+        ResultsSink.flush_all()  # Ghi ngay các dòng kết quả đang chờ vào tệp kết quả
         
-        if thread.is_alive():
-            # Nếu thread vẫn đang chạy sau 30 giây
-            return None
+        # Nếu thread vẫn đang chạy sau 30 giây, dùng lời giải tốt nhất đã có (chỉ bộ giải anytime có)
         return solution[0]
     
     # Tìm kếm giải pháp
@@ -685,7 +661,7 @@ class SokobanGame:
         self.screen.blit(text, (300, 250))
         pygame.display.flip()
         if self.current_algorithm == 'astar':
-            solution = self.solve_with_timeout(solve_sokoban_astar, current_state.maze, current_state.player_pos,
+            solution = self.solve_with_timeout(solve_sokoban_astar_anytime, current_state.maze, current_state.player_pos,
                                                list(current_state.boxes), list(current_state.targets))
         elif self.current_algorithm == 'hillclimbing':
             solution = self.solve_with_timeout(solve_sokoban_hillclimbing, current_state.maze, current_state.player_pos,
@@ -693,6 +669,13 @@ class SokobanGame:
         elif self.current_algorithm == 'bfs':
             solution = self.solve_with_timeout(solve_sokoban_bfs, current_state.maze, current_state.player_pos,
                                                list(current_state.boxes), list(current_state.targets))
+        elif self.current_algorithm == 'idastar':
+            solution = self.solve_with_timeout(solve_sokoban_idastar, current_state.maze, current_state.player_pos,
+                                               list(current_state.boxes), list(current_state.targets))
+        elif self.current_algorithm == 'portfolio':
+            # Chạy mọi bộ giải trong các tiến trình riêng, lấy lời giải hợp lệ đầu tiên
+            solution = self.solve_with_timeout(solve_sokoban_portfolio, current_state.maze, current_state.player_pos,
+                                               list(current_state.boxes), list(current_state.targets))
         
         self.solve_time = time.time() - solve_start_time
         
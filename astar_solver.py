@@ -1,12 +1,31 @@
 import heapq
 import time
 import sys
-import csv
-from typing import List, Tuple, Optional, FrozenSet
-from sokoban_common import SokobanState, MOVES
-from pympler import asizeof
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple, Optional, FrozenSet, Union, Hashable, Sequence
+from sokoban_common import (SokobanState, BitboardState, ZobristTable, NodePool, Assignment, DeadlockPruner,
+                            PatternDatabase, CancellationToken, SearchLimits, SolveResult, MemoryMonitor, ResultsSink,
+                            PhaseProfiler, SolverBase, pushed_box, is_pruned, learn_deadlock, probe, MOVES)
+
+@dataclass(frozen=True)
+class AnytimeSolution:
+    """
+    Một lời giải do AStarSolver.solve_anytime trả về.
+
+    Attributes:
+        moves (List[Tuple[int, int]]): Danh sách các nước đi của lời giải.
+        pushes (int): Số cú đẩy hộp của lời giải.
+        weight (float): Trọng số heuristic của vòng tìm kiếm đã tạo ra lời giải.
+        bound (float): Cận trên của tỉ lệ pushes / số cú đẩy tối ưu; 1.0 nghĩa là lời giải tối ưu.
+        elapsed (float): Thời gian (giây) từ lúc bắt đầu tìm kiếm.
+    """
+    moves: List[Tuple[int, int]]
+    pushes: int
+    weight: float
+    bound: float
+    elapsed: float
 
-class AStarSolver:
+class AStarSolver(SolverBase):
     """
     Lớp giải quyết bài toán Sokoban sử dụng thuật toán A*.
     
@@ -15,44 +34,51 @@ class AStarSolver:
 
     Attributes:
         max_iterations (int): Số lần lặp tối đa để tìm giải pháp.
-        csv_file (str): Đường dẫn tới tệp CSV để ghi kết quả.
+        csv_file (Optional[str]): Tệp kết quả (CSV hoặc JSON Lines, xem ResultsSink), None nếu không ghi.
+        push_mode (bool): Tìm kiếm theo từng cú đẩy hộp thay vì từng bước đi.
+        distance (str): Thước đo khoảng cách hộp - mục tiêu của heuristic: 'manhattan' hoặc 'push'
+            (số cú đẩy thực sự theo bảng LevelIndex.push_distances; nút có hộp không tới được mục tiêu bị loại bỏ).
+        pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc chạy sau mỗi cú đẩy hộp.
+        heuristic_stats (dict): Số lần tính heuristic của lần giải gần nhất: giải phép ghép từ đầu ('full'),
+            sửa phép ghép khi một hộp di chuyển ('incremental') và chỉ tính lại khoảng cách người chơi ('player_only').
+            Phép ghép được lưu trong bộ nhớ đệm LevelIndex.heuristic_cache theo cấu hình hộp, dùng chung giữa các lần
+            giải trên cùng bản đồ; cấu hình đã có trong bộ nhớ đệm không được tính ở 'full' hay 'incremental'.
+        limits (SearchLimits): Thời hạn và cờ hủy, được kiểm tra định kỳ trong vòng lặp tìm kiếm.
+        memory (MemoryMonitor): Đo mức tăng bộ nhớ đỉnh của mỗi lần giải (stats['peak_mb'] của kết quả).
+        profile (bool): Đo số lần gọi và thời gian của từng pha tìm kiếm (stats['profile'] của kết quả).
+        profiler (Optional[PhaseProfiler]): Bộ đo của lần giải gần nhất, None nếu không bật profile.
+        result (Optional[SolveResult]): Kết quả có cấu trúc của lần giải gần nhất.
     """
-    def __init__(self, max_iterations: int = 1000000, csv_file: str = 'results.csv'):
+    def __init__(self, max_iterations: int = 1000000, csv_file: Optional[str] = 'results_v2.csv', push_mode: bool = False,
+                 distance: str = 'manhattan', pruners: Sequence[DeadlockPruner] = (),
+                 deadline: Optional[float] = None, cancel_token: Optional[CancellationToken] = None,
+                 memory: str = 'rss', profile: bool = False):
         """
         Khởi tạo bộ giải A* Sokoban.
 
         Arguments:
             max_iterations (int): Số lần lặp tối đa để tìm giải pháp. Mặc định là 1.000.000.
-            csv_file (str): Tên tệp CSV để lưu kết quả. Mặc định là 'results.csv'.
+            csv_file (Optional[str]): Tệp kết quả (.csv hoặc .jsonl), None để không ghi. Mặc định là 'results_v2.csv'.
+            push_mode (bool): Tìm kiếm theo từng cú đẩy hộp (macro move). Mặc định là False.
+            distance (str): Thước đo khoảng cách của heuristic ('manhattan' hoặc 'push'). Mặc định là 'manhattan'.
+            pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc (ví dụ FreezeDeadlockPruner). Mặc định là rỗng.
+            deadline (Optional[float]): Thời điểm phải dừng (theo time.time()). Mặc định là None (không giới hạn).
+            cancel_token (Optional[CancellationToken]): Cờ hủy tìm kiếm. Mặc định là None.
+            memory (str): Cách đo bộ nhớ đỉnh ('rss', 'tracemalloc' hoặc 'off'). Mặc định là 'rss'.
+            profile (bool): Đo từng pha tìm kiếm (xem PhaseProfiler). Mặc định là False.
         """
         self.max_iterations = max_iterations
         self.csv_file = csv_file
-        self._initialize_csv()  # Khởi tạo tệp CSV khi tạo đối tượng
-
-    def _initialize_csv(self):
-        """
-        Khởi tạo tệp CSV, thêm tiêu đề nếu tệp trống hoặc chưa tồn tại.
-        
-        Chức năng này đảm bảo tệp CSV luôn có tiêu đề được định dạng đúng.
-        """
-        try:
-            # Mở file ở chế độ nối thêm để tránh ghi đè
-            with open(self.csv_file, mode='a', newline='') as file:
-                if file.tell() == 0:  # Kiểm tra nếu file trống
-                    writer = csv.writer(file)
-                    # Viết tiêu đề với căn chỉnh phù hợp
-                    writer.writerow([f"{'Algorithm':<15}"
-                                    f"{'Storage (MB)':>10}"
-                                    f"{'States Visited':>15}"
-                                    f"{'Time (s)':>10}"])
-        except FileNotFoundError:
-            # Nếu file không tồn tại, tạo mới và ghi tiêu đề
-            with open(self.csv_file, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([f"{'Algorithm':<15}"
-                                f"{'Storage (MB)':>10}"
-                                f"{'States Visited':>15}"
-                                f"{'Time (s)':>10}"])
+        self.push_mode = push_mode
+        self.distance = distance
+        self.pruners = list(pruners)
+        self.heuristic_stats = {'full': 0, 'incremental': 0, 'player_only': 0}
+        self.limits = SearchLimits(deadline, cancel_token)
+        self.memory = MemoryMonitor(memory)
+        self.profile = profile
+        self.profiler: Optional[PhaseProfiler] = None
+        self.result: Optional[SolveResult] = None
+        self.results = ResultsSink.shared(csv_file) if csv_file else None  # Tệp kết quả dùng chung
 
     def solve(self, initial_state: SokobanState) -> Optional[List[Tuple[int, int]]]:
         """
@@ -65,74 +91,426 @@ class AStarSolver:
             Optional[List[Tuple[int, int]]]: Danh sách các nước đi để giải quyết bài toán,
             hoặc None nếu không tìm thấy giải pháp.
         """
+        self.heuristic_stats = {'full': 0, 'incremental': 0, 'player_only': 0}
+        if self.push_mode:
+            return self._solve_pushes(initial_state)
         
+        level = initial_state.level
+        # nodes: kho nút lưu nút cha và chỉ số nước đi (trong MOVES); đường đi được dựng lại khi tới đích
+        nodes = NodePool()
+        # Phép ghép hộp - mục tiêu chỉ được giải từ đầu một lần cho trạng thái ban đầu;
+        # mỗi nút mang theo phép ghép của mình để các nút con cập nhật tăng dần
+        assignment = self._initial_assignment(level, initial_state.box_mask)
         # Khởi tạo điểm xuất phát cho thuật toán A*
-        start_node = (initial_state.heuristic(), 0, [], initial_state)
+        start_node = (self._heuristic(initial_state, assignment), 0, nodes.add(-1, -1), initial_state, assignment)
         # frontier: hàng đợi ưu tiên (min-heap) lưu trữ các trạng thái cần kiểm tra, theo thứ tự chi phí thấp nhất
         frontier = [start_node]
-        # explored: tập trạng thái đã được kiểm tra
-        explored = set()
+        # explored: tập trạng thái đã được kiểm tra, khóa bằng giá trị Zobrist
+        explored = ZobristTable()
         # deadlock_cache: bộ nhớ lưu trữ các trạng thái đã xác định là deadlock (bế tắc)
         deadlock_cache = {}
 
         # Thời gian bắt đầu
-        start_time = time.time()
+        start_time = self._start('A*', initial_state)
+        status = SolveResult.NODE_LIMIT  # Lý do dừng nếu vòng lặp chạy hết max_iterations
+        # Hàm của các pha tìm kiếm; khi bật profile chúng được bọc để đếm và đo thời gian (xem PhaseProfiler)
+        profiler = self.profiler
+        heappop = probe(profiler, 'expand', heapq.heappop, counted=False)
+        heappush = probe(profiler, 'expand', heapq.heappush, counted=False)
+        apply_move = probe(profiler, 'successors', type(initial_state).apply_move)
+        seen = probe(profiler, 'duplicates', explored.add)
+        heuristic = probe(profiler, 'heuristic', self._heuristic)
+        child_assignment = probe(profiler, 'heuristic', self._child_assignment)
+        is_deadlock = probe(profiler, 'deadlock', self.is_deadlock)
+        pruned = probe(profiler, 'deadlock', is_pruned)
 
         # Vòng lặp chính của thuật toán A*
         for iteration in range(self.max_iterations):
+            # Dừng sớm nếu hết thời gian hoặc bị hủy
+            reason = self.limits.stop_reason(iteration)
+            if reason:
+                status = reason
+                break
             # Nếu frontier trống, tức là không còn trạng thái nào để kiểm tra, trả về None
             if not frontier:
-                return None
+                return self._finish(SolveResult.NO_SOLUTION, None, iteration, start_time, explored=len(explored),
+                                    generated=len(nodes), node_bytes=nodes.nbytes)
 
             # Lấy phần tử có chi phí thấp nhất từ frontier
-            _, cost, path, current_state = heapq.heappop(frontier)
+            _, cost, node, current_state, assignment = heappop(frontier)
 
             # Kiểm tra xem trạng thái hiện tại có phải là trạng thái mục tiêu không
             if current_state.is_goal():
                 # Nếu là mục tiêu, tính toán thời gian kết thúc và trả về các nước đi
-                end_time = time.time()
-                self._log_results('A*', iteration, current_state, start_time, end_time)
-                return path
-
-            # Chuyển trạng thái hiện tại thành dạng có thể so sánh (hashable) để kiểm tra đã thăm chưa
-            state_hash = self.state_to_hashable(current_state)
-            # Nếu trạng thái đã được thăm, bỏ qua
-            if state_hash in explored:
+                return self._finish(SolveResult.SOLVED, [MOVES[code] for code in nodes.path(node)], iteration,
+                                    start_time, explored=len(explored), generated=len(nodes), node_bytes=nodes.nbytes)
+
+            # Thêm trạng thái hiện tại vào tập explored; nếu đã được thăm thì bỏ qua.
+            # Khóa đầy đủ chỉ được so sánh khi trùng giá trị Zobrist.
+            if not seen(current_state.zobrist, self.state_to_hashable(current_state)):
                 continue
-            # Thêm trạng thái hiện tại vào tập explored
-            explored.add(state_hash)
+            if profiler is not None:
+                profiler.count('expand')  # Một nút thực sự được mở rộng (xem PhaseProfiler)
 
             # Duyệt qua tất cả các nước đi có thể có
-            for move in MOVES:
+            for code, move in enumerate(MOVES):
                 # Áp dụng nước đi và tạo ra trạng thái tiếp theo
-                next_state = current_state.apply_move(move)
+                next_state = apply_move(current_state, move)
                 # Nếu trạng thái tiếp theo khác với trạng thái hiện tại và không bị deadlock
-                if next_state != current_state and not self.is_deadlock(next_state, deadlock_cache):
+                if next_state != current_state and not is_deadlock(next_state, deadlock_cache):
+                    # Cập nhật phép ghép: nếu không hộp nào di chuyển thì phép ghép được dùng lại;
+                    # nếu có, chạy các bộ cắt tỉa bế tắc rồi sửa phép ghép theo hộp vừa bị đẩy
+                    pushed = pushed_box(current_state, next_state, code)
+                    next_assignment = assignment
+                    if pushed < 0:
+                        self.heuristic_stats['player_only'] += 1
+                    else:
+                        player, next_boxes = next_state.player_cell, next_state.box_mask
+                        if self.pruners and pruned(self.pruners, level, player, next_boxes, pushed):
+                            continue
+                        next_assignment = child_assignment(level, assignment, next_boxes, player, pushed)
                     # Tính toán chi phí mới và heuristic cho trạng thái tiếp theo
                     next_cost = cost + 1
-                    next_heuristic = next_state.heuristic()
+                    next_heuristic = heuristic(next_state, next_assignment)
+                    if next_heuristic == float('inf'):
+                        continue  # Có hộp không thể tới được mục tiêu nào còn lại
                     # Tạo một node mới cho trạng thái tiếp theo và thêm vào frontier
-                    next_node = (next_cost + next_heuristic, next_cost, path + [move], next_state)
-                    heapq.heappush(frontier, next_node)
+                    next_node = (next_cost + next_heuristic, next_cost, nodes.add(node, code), next_state, next_assignment)
+                    heappush(frontier, next_node)
+
+        # Nếu không tìm thấy giải pháp sau max_iterations (hoặc bị dừng sớm), tính toán thời gian kết thúc và trả về None
+        return self._finish(status, None, iteration, start_time, explored=len(explored), generated=len(nodes),
+                            node_bytes=nodes.nbytes)
+
+
+    def _solve_pushes(self, initial_state: SokobanState) -> Optional[List[Tuple[int, int]]]:
+        """
+        Giải quyết bài toán Sokoban bằng A* trên các cú đẩy hộp (macro move).
+
+        Mỗi nút là một cấu hình hộp cùng vùng người chơi đi tới được; chi phí g là số cú đẩy và
+        heuristic là chi phí ghép tối ưu giữa hộp và mục tiêu. Đường đi bộ giữa các cú đẩy chỉ được
+        dựng lại khi trả về lời giải.
+
+        Arguments:
+            initial_state (SokobanState): Trạng thái ban đầu của bản đồ Sokoban.
+
+        Returns:
+            Optional[List[Tuple[int, int]]]: Danh sách các nước đi để giải quyết bài toán,
+            hoặc None nếu không tìm thấy giải pháp.
+        """
+        level = initial_state.level
+        start_player, start_boxes = initial_state.player_cell, initial_state.box_mask
+
+        # nodes: kho nút lưu nút cha và mã cú đẩy (ô hộp * 4 + hướng đẩy)
+        nodes = NodePool()
+        # Mỗi cú đẩy di chuyển đúng một hộp nên phép ghép của nút con được sửa từ phép ghép của nút cha
+        assignment = self._initial_assignment(level, start_boxes)
+        # frontier: (f, g, chỉ số nút, mặt nạ hộp, ô người chơi, giá trị Zobrist của hộp, phép ghép)
+        frontier = [(assignment.cost, 0, nodes.add(-1, -1), start_boxes, start_player,
+                     level.box_hash(start_boxes), assignment)]
+        explored = ZobristTable()
+
+        start_time = self._start('A* (push)', initial_state)
+        status = SolveResult.NODE_LIMIT
+        # Hàm của các pha tìm kiếm; khi bật profile chúng được bọc để đếm và đo thời gian (xem PhaseProfiler)
+        profiler = self.profiler
+        heappop = probe(profiler, 'expand', heapq.heappop, counted=False)
+        heappush = probe(profiler, 'expand', heapq.heappush, counted=False)
+        region = probe(profiler, 'successors', level.region)
+        push_successors = probe(profiler, 'successors', level.push_successors)
+        normalize = probe(profiler, 'duplicates', level.normalize)
+        seen = probe(profiler, 'duplicates', explored.add)
+        known = probe(profiler, 'duplicates', explored.contains)
+        child_assignment = probe(profiler, 'heuristic', self._child_assignment)
+        pruned = probe(profiler, 'deadlock', is_pruned)
+
+        for iteration in range(self.max_iterations):
+            reason = self.limits.stop_reason(iteration)
+            if reason:
+                status = reason
+                break
+            if not frontier:
+                return self._finish(SolveResult.NO_SOLUTION, None, iteration, start_time, explored=len(explored),
+                                    generated=len(nodes), node_bytes=nodes.nbytes)
+
+            _, cost, node, box_mask, player, box_hash, assignment = heappop(frontier)
+
+            if box_mask == level.target_mask:
+                pushes = [(code >> 2, code & 3) for code in nodes.path(node)]
+                return self._finish(SolveResult.SOLVED, level.moves_for_pushes(start_player, start_boxes, pushes),
+                                    iteration, start_time, explored=len(explored), generated=len(nodes),
+                                    node_bytes=nodes.nbytes)
+
+            representative, reach = region(player, box_mask)
+            if not seen(box_hash ^ level.zobrist_player[representative], (box_mask, representative)):
+                continue
+            if profiler is not None:
+                profiler.count('expand')  # Một nút thực sự được mở rộng (xem PhaseProfiler)
+
+            alive = False  # Có nút con nào không bị loại vì bế tắc không
+            for box, direction, next_boxes in push_successors(reach, box_mask):
+                destination = level.neighbors[box][direction]
+                next_hash = box_hash ^ level.zobrist_box[box] ^ level.zobrist_box[destination]
+                representative = normalize(box, next_boxes)
+                if known(next_hash ^ level.zobrist_player[representative], (next_boxes, representative)):
+                    alive = True
+                    continue
+                if self.pruners and pruned(self.pruners, level, box, next_boxes, destination):
+                    continue
+                next_assignment = child_assignment(level, assignment, next_boxes, box, destination)
+                if next_assignment.cost == float('inf'):
+                    continue
+                alive = True
+                next_cost = cost + 1
+                next_node = (next_cost + next_assignment.cost, next_cost,
+                             nodes.add(node, box << 2 | direction), next_boxes, box, next_hash, next_assignment)
+                heappush(frontier, next_node)
+            if not alive and self.pruners and node:
+                # Mọi nhánh con đều bế tắc: báo trạng thái này cho các bộ cắt tỉa (ví dụ để học mẫu bế tắc)
+                code = nodes.moves[node]
+                learn_deadlock(self.pruners, level, player, box_mask, level.neighbors[code >> 2][code & 3])
+
+        return self._finish(status, None, iteration, start_time, explored=len(explored), generated=len(nodes),
+                            node_bytes=nodes.nbytes)
+
+    def solve_anytime(self, initial_state: SokobanState, time_limit: Optional[float] = None,
+                      weights: Sequence[float] = (5.0, 3.0, 2.0, 1.5, 1.25, 1.0)) -> Iterator[AnytimeSolution]:
+        """
+        Giải bài toán Sokoban bằng A* có trọng số dạng anytime (kiểu ARA*) trên các cú đẩy hộp.
+
+        Vòng đầu dùng trọng số lớn (f = g + w * h) để tìm nhanh một lời giải; mỗi vòng sau giảm trọng số
+        theo weights và dùng lại danh sách mở, các giá trị g đã biết và kho nút của vòng trước thay vì tìm lại
+        từ đầu. Trạng thái được cải thiện g sau khi đã mở rộng trong vòng hiện tại được giữ riêng (INCONS) và
+        đưa lại vào danh sách mở ở vòng sau. Các nút có g + h không nhỏ hơn lời giải tốt nhất bị bỏ qua.
+        Tìm kiếm luôn theo từng cú đẩy (bỏ qua push_mode), nên chất lượng lời giải được đo bằng số cú đẩy.
+
+        Mỗi khi lời giải tốt hơn hoặc cận sai số chặt hơn, một AnytimeSolution được trả về ngay; nơi gọi có thể
+        dừng bất kỳ lúc nào và dùng lời giải cuối cùng nhận được. Tìm kiếm dừng khi lời giải đã tối ưu
+        (bound = 1.0), hết trọng số, hết thời gian time_limit, tới thời hạn hoặc cờ hủy của solver, hoặc hết
+        max_iterations nút mở rộng. Khi kết thúc, self.result chứa lời giải tốt nhất và lý do dừng; nếu nơi gọi
+        đóng generator giữa chừng (close() hoặc bỏ generator), lần giải kết thúc với SolveResult.CANCELLED.
+
+        Arguments:
+            initial_state (SokobanState): Trạng thái ban đầu của bản đồ Sokoban.
+            time_limit (Optional[float]): Thời gian tìm kiếm tối đa (giây), None nếu không giới hạn.
+            weights (Sequence[float]): Các trọng số heuristic theo thứ tự giảm dần, nên kết thúc bằng 1.0.
+
+        Returns:
+            Iterator[AnytimeSolution]: Dãy lời giải ngày càng tốt hơn kèm cận sai số của từng lời giải.
+        """
+        self.heuristic_stats = {'full': 0, 'incremental': 0, 'player_only': 0}
+        level = initial_state.level
+        start_player, start_boxes = initial_state.player_cell, initial_state.box_mask
+        start_time = self._start('A* (anytime)', initial_state)
+        deadline = None if time_limit is None else start_time + time_limit
+        if start_boxes == level.target_mask:
+            self._finish(SolveResult.SOLVED, [], 0, start_time)
+            yield AnytimeSolution([], 0, 1.0, 1.0, 0.0)
+            return
+
+        nodes = NodePool()
+        assignment = self._initial_assignment(level, start_boxes)
+        start_key = (start_boxes, level.normalize(start_player, start_boxes))
+        # best_g: số cú đẩy ít nhất đã biết tới mỗi trạng thái (mặt nạ hộp, ô đại diện vùng người chơi)
+        best_g: Dict[Tuple[int, int], int] = {start_key: 0}
+        # open_states: trạng thái chờ mở rộng -> (g, chỉ số nút, mặt nạ hộp, ô người chơi, phép ghép);
+        # heap chỉ giữ (f, g, chỉ số nút, khóa) và mục cũ bị bỏ qua khi lấy ra (so chỉ số nút)
+        open_states = {start_key: (0, nodes.add(-1, -1), start_boxes, start_player, assignment)}
+        if assignment.cost == float('inf'):
+            open_states.clear()
+        # Hàm của các pha tìm kiếm; khi bật profile chúng được bọc để đếm và đo thời gian (xem PhaseProfiler)
+        profiler = self.profiler
+        heappop = probe(profiler, 'expand', heapq.heappop, counted=False)
+        heappush = probe(profiler, 'expand', heapq.heappush, counted=False)
+        region = probe(profiler, 'successors', level.region)
+        push_successors = probe(profiler, 'successors', level.push_successors)
+        normalize = probe(profiler, 'duplicates', level.normalize)
+        best_known = probe(profiler, 'duplicates', best_g.get)
+        child_assignment = probe(profiler, 'heuristic', self._child_assignment)
+        pruned = probe(profiler, 'deadlock', is_pruned)
+        incumbent = None  # (số cú đẩy, chỉ số nút) của lời giải tốt nhất
+        reported = None  # (số cú đẩy, cận) đã trả về gần nhất
+        iteration = 0
+        exhausted = False
+        status = SolveResult.NO_SOLUTION  # Lý do dừng khi chưa có lời giải
+        solution = None  # Lời giải tốt nhất đã trả về
+
+        completed = False
+        try:
+            for weight in weights:
+                heap = [(g + weight * entry.cost, g, node, key)
+                        for key, (g, node, _, _, entry) in open_states.items()]
+                heapq.heapify(heap)
+                closed = set()
+                inconsistent = {}
+                while heap and (incumbent is None or heap[0][0] < incumbent[0]):
+                    reason = self.limits.stop_reason(iteration)
+                    if iteration >= self.max_iterations:
+                        reason = SolveResult.NODE_LIMIT
+                    elif deadline is not None and time.time() >= deadline:
+                        reason = SolveResult.TIMEOUT
+                    if reason:
+                        status = reason
+                        exhausted = True
+                        break
+                    _, g, node, key = heappop(heap)
+                    entry = open_states.get(key)
+                    if entry is None or entry[1] != node:
+                        continue  # Mục cũ: trạng thái đã được đưa vào lại với g nhỏ hơn
+                    del open_states[key]
+                    _, _, box_mask, player, assignment = entry
+                    if incumbent is not None and g + assignment.cost >= incumbent[0]:
+                        continue  # Không thể cho lời giải tốt hơn lời giải đã có
+                    closed.add(key)
+                    iteration += 1
+                    if profiler is not None:
+                        profiler.count('expand')  # Một nút thực sự được mở rộng (xem PhaseProfiler)
+
+                    _, reach = region(player, box_mask)
+                    for box, direction, next_boxes in push_successors(reach, box_mask):
+                        next_g = g + 1
+                        next_key = (next_boxes, normalize(box, next_boxes))
+                        if best_known(next_key, sys.maxsize) <= next_g:
+                            continue
+                        destination = level.neighbors[box][direction]
+                        if self.pruners and pruned(self.pruners, level, box, next_boxes, destination):
+                            continue
+                        next_assignment = child_assignment(level, assignment, next_boxes, box, destination)
+                        if next_assignment.cost == float('inf'):
+                            continue
+                        if incumbent is not None and next_g + next_assignment.cost >= incumbent[0]:
+                            continue
+                        best_g[next_key] = next_g
+                        next_node = nodes.add(node, box << 2 | direction)
+                        if next_boxes == level.target_mask:
+                            incumbent = (next_g, next_node)
+                            continue
+                        next_entry = (next_g, next_node, next_boxes, box, next_assignment)
+                        if next_key in closed:
+                            inconsistent[next_key] = next_entry  # Mở rộng lại ở vòng sau
+                        else:
+                            open_states[next_key] = next_entry
+                            heappush(heap, (next_g + weight * next_assignment.cost, next_g, next_node, next_key))
+                open_states.update(inconsistent)
+
+                if incumbent is not None:
+                    # Cận dưới của số cú đẩy tối ưu: g + h nhỏ nhất trong danh sách mở (h chấp nhận được)
+                    lower = min((g + entry.cost for g, _, _, _, entry in open_states.values()), default=incumbent[0])
+                    lower = min(lower, incumbent[0])
+                    bound = incumbent[0] / lower if lower > 0 else 1.0
+                    if not exhausted:
+                        bound = min(bound, weight)  # Vòng đã chạy xong: lời giải không tệ hơn weight lần tối ưu
+                    if reported is None or (incumbent[0], bound) < reported:
+                        reported = (incumbent[0], bound)
+                        pushes = [(code >> 2, code & 3) for code in nodes.path(incumbent[1])]
+                        solution = AnytimeSolution(level.moves_for_pushes(start_player, start_boxes, pushes),
+                                                   incumbent[0], weight, bound, time.time() - start_time)
+                        yield solution
+                    if bound <= 1.0:
+                        break
+                if exhausted or not open_states:
+                    break
+            completed = True
+        finally:
+            # Cũng chạy khi nơi gọi đóng generator giữa chừng (GeneratorExit), ví dụ sau lời giải đầu tiên đủ tốt:
+            # dừng đo bộ nhớ, lưu self.result và ghi dòng kết quả với lời giải tốt nhất đã trả về
+            if not completed:
+                status = SolveResult.CANCELLED
+            elif solution is not None:
+                # Có lời giải: SOLVED nếu đã chứng minh tối ưu hoặc chạy hết các trọng số, nếu không giữ lý do dừng sớm
+                status = status if exhausted and solution.bound > 1.0 else SolveResult.SOLVED
+            self._finish(status, solution and solution.moves, iteration, start_time, visited=len(best_g),
+                         bound=solution and solution.bound, generated=len(nodes), node_bytes=nodes.nbytes)
+
+    def parameters(self) -> Dict[str, object]:
+        """
+        Tham số của bộ giải, được ghi cùng mỗi dòng kết quả.
+
+        Returns:
+            Dict[str, object]: Tên tham số -> giá trị (bộ cắt tỉa được ghi bằng tên lớp).
+        """
+        return {'max_iterations': self.max_iterations, 'push_mode': self.push_mode, 'distance': self.distance,
+                'pruners': [type(pruner).__name__ for pruner in self.pruners]}
 
-        # Nếu không tìm thấy giải pháp sau khi kiểm tra hết các trạng thái, tính toán thời gian kết thúc và trả về None
-        end_time = time.time()
-        self._log_results('A*', iteration, current_state, start_time, end_time)
-        return None
+    def _collect_stats(self, stats: Dict[str, object]):
+        """
+        Thêm số lần tính heuristic (heuristic_stats) vào số liệu của lần giải.
+
+        Arguments:
+            stats (Dict[str, object]): Số liệu của lần giải, được sửa tại chỗ.
+        """
+        stats.update(self.heuristic_stats)
+
+    def _initial_assignment(self, level, box_mask: int) -> Assignment:
+        """
+        Lấy phép ghép của trạng thái ban đầu từ bộ nhớ đệm heuristic, hoặc giải từ đầu nếu chưa có.
+
+        Arguments:
+            level (LevelIndex): Chỉ mục của bản đồ.
+            box_mask (int): Mặt nạ bit các ô có hộp.
+
+        Returns:
+            Assignment: Phép ghép tối ưu.
+        """
+        key = (self.distance, box_mask)
+        assignment = level.heuristic_cache.get(key)
+        if assignment is None:
+            assignment = Assignment.solve(level, level.cells_of(box_mask), self.distance)
+            level.heuristic_cache.put(key, assignment)
+            self.heuristic_stats['full'] += 1
+        return assignment
+
+    def _child_assignment(self, level, assignment: Assignment, box_mask: int, old_cell: int, new_cell: int) -> Assignment:
+        """
+        Lấy phép ghép của nút con sau một cú đẩy từ bộ nhớ đệm heuristic, hoặc sửa từ phép ghép của nút cha.
+
+        Arguments:
+            level (LevelIndex): Chỉ mục của bản đồ.
+            assignment (Assignment): Phép ghép của nút cha.
+            box_mask (int): Mặt nạ bit các ô có hộp của nút con.
+            old_cell (int): Ô cũ của hộp bị đẩy.
+            new_cell (int): Ô mới của hộp bị đẩy.
+
+        Returns:
+            Assignment: Phép ghép tối ưu của nút con.
+        """
+        key = (self.distance, box_mask)
+        next_assignment = level.heuristic_cache.get(key)
+        if next_assignment is None:
+            next_assignment = assignment.moved(old_cell, new_cell)
+            level.heuristic_cache.put(key, next_assignment)
+            self.heuristic_stats['incremental'] += 1
+        return next_assignment
+
+    @staticmethod
+    def _heuristic(state: Union[SokobanState, BitboardState], assignment: Assignment) -> float:
+        """
+        Heuristic của chế độ từng bước, giống SokobanState.heuristic nhưng lấy chi phí ghép từ phép ghép
+        đã được cập nhật tăng dần: chi phí ghép cộng khoảng cách từ người chơi tới hộp gần nhất.
+
+        Arguments:
+            state (SokobanState | BitboardState): Trạng thái cần đánh giá.
+            assignment (Assignment): Phép ghép hộp - mục tiêu của trạng thái.
 
+        Returns:
+            float: Giá trị heuristic, 0 nếu trạng thái là mục tiêu.
+        """
+        if state.is_goal():
+            return 0
+        return assignment.cost + assignment.player_distance(state.player_cell)
 
     @staticmethod
-    def state_to_hashable(state: SokobanState) -> Tuple[Tuple[int, int], FrozenSet[Tuple[int, int]]]:
+    def state_to_hashable(state: Union[SokobanState, BitboardState]) -> Hashable:
         """
         Chuyển trạng thái Sokoban thành một dạng có thể băm được.
 
         Arguments:
-            state (SokobanState): Trạng thái cần chuyển đổi.
+            state (SokobanState | BitboardState): Trạng thái cần chuyển đổi.
 
         Returns:
-            Tuple chứa vị trí người chơi và vị trí các hộp.
+            Khóa gọn chứa vị trí người chơi và vị trí các hộp (xem SokobanState.key).
         """
-        return (state.player_pos, state.boxes)
+        return state.key()
 
     def is_deadlock(self, state: SokobanState, deadlock_cache: dict) -> bool:
         """
@@ -145,7 +523,8 @@ class AStarSolver:
         Returns:
             bool: True nếu là bế tắc, False nếu ngược lại.
         """
-        state_hash = self.state_to_hashable(state)
+        # Bế tắc chỉ phụ thuộc cấu hình hộp, nên mọi vị trí người chơi dùng chung một mục trong bộ nhớ đệm
+        state_hash = state.box_mask
         if state_hash in deadlock_cache:
             return deadlock_cache[state_hash]
 
@@ -155,7 +534,9 @@ class AStarSolver:
 
     def check_deadlock(self, state: SokobanState) -> bool:
         """
-        Kiểm tra xem có hộp nào ở trạng thái bế tắc không.
+        Kiểm tra xem có hộp nào nằm trên ô bế tắc không.
+
+        Bảng ô bế tắc được tính sẵn một lần cho mỗi bản đồ (LevelIndex), nên mỗi hộp chỉ cần một lần tra bảng.
 
         Arguments:
             state (SokobanState): Trạng thái cần kiểm tra.
@@ -163,62 +544,64 @@ class AStarSolver:
         Returns:
             bool: True nếu có hộp bị bế tắc, False nếu ngược lại.
         """
-        for box in state.boxes:
-            if self.is_corner_deadlock(state, box):
-                return True
-        return False
-
-    def is_corner_deadlock(self, state: SokobanState, box: Tuple[int, int]) -> bool:
-        """
-        Kiểm tra xem hộp có ở trạng thái bế tắc góc không.
-
-        Arguments:
-            state (SokobanState): Trạng thái của bản đồ.
-            box (Tuple[int, int]): Vị trí của hộp cần kiểm tra.
-
-        Returns:
-            bool: True nếu hộp bị kẹt ở góc, False nếu ngược lại.
-        """
-        x, y = box
-        if box in state.targets:
-            return False
-        
-        walls = [
-            (state.maze[y-1][x] == 1 and state.maze[y][x-1] == 1),  # Góc trên trái
-            (state.maze[y-1][x] == 1 and state.maze[y][x+1] == 1),  # Góc trên phải
-            (state.maze[y+1][x] == 1 and state.maze[y][x-1] == 1),  # Góc dưới trái
-            (state.maze[y+1][x] == 1 and state.maze[y][x+1] == 1)   # Góc dưới phải
-        ]
-        
-        return any(walls)
+        level = state.level
+        return any(level.is_dead_position(x, y) for x, y in state.boxes)
+
+
+def solve_sokoban_astar_anytime(maze: List[List[int]],
+                                player_pos: Tuple[int, int],
+                                boxes: List[Tuple[int, int]],
+                                targets: List[Tuple[int, int]],
+                                time_limit: Optional[float] = None,
+                                weights: Sequence[float] = (5.0, 3.0, 2.0, 1.5, 1.25, 1.0),
+                                use_bitboard: bool = False,
+                                distance: str = 'manhattan',
+                                pruners: Sequence[DeadlockPruner] = (),
+                                use_patterns: bool = False,
+                                deadline: Optional[float] = None,
+                                cancel_token: Optional[CancellationToken] = None) -> Iterator[AnytimeSolution]:
+    """
+    Hàm giải bài toán Sokoban bằng A* có trọng số dạng anytime (xem AStarSolver.solve_anytime).
 
-    def _log_results(self, algorithm: str, iteration: int, state: SokobanState, start_time: float, end_time: float):
-        """
-        Ghi kết quả giải thuật vào tệp CSV.
+    Arguments:
+        maze (List[List[int]]): Bản đồ trò chơi, với 1 là tường, 0 là ô trống.
+        player_pos (Tuple[int, int]): Vị trí ban đầu của người chơi.
+        boxes (List[Tuple[int, int]]): Danh sách vị trí các hộp.
+        targets (List[Tuple[int, int]]): Danh sách vị trí đích của các hộp.
+        time_limit (Optional[float]): Thời gian tìm kiếm tối đa (giây), None nếu không giới hạn.
+        weights (Sequence[float]): Các trọng số heuristic theo thứ tự giảm dần.
+        use_bitboard (bool): Dùng trạng thái dạng bitboard (BitboardState) thay cho SokobanState.
+        distance (str): Thước đo khoảng cách của heuristic: 'manhattan' hoặc 'push' (có tính tường).
+        pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc chạy sau mỗi cú đẩy hộp.
+        use_patterns (bool): Dùng (và bổ sung) cơ sở dữ liệu mẫu bế tắc lưu cùng thư mục với results_v2.csv.
+        deadline (Optional[float]): Thời điểm phải dừng tìm kiếm (theo time.time()), None nếu không giới hạn.
+        cancel_token (Optional[CancellationToken]): Cờ hủy; bộ giải tự dừng khi cờ được bật.
 
-        Arguments:
-            algorithm (str): Tên thuật toán.
-            iteration (int): Số lần lặp.
-            state (SokobanState): Trạng thái cuối cùng của bài toán.
-            start_time (float): Thời điểm bắt đầu.
-            end_time (float): Thời điểm kết thúc.
-        """
-        # Sử dụng pympler để đo bộ nhớ của đối tượng state và các đối tượng con
-        storage_used = asizeof.asizeof(state) / (1024 * 1024)  # Chuyển sang MB
-        states_visited = iteration
-        elapsed_time = end_time - start_time
-
-        with open(self.csv_file, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([f"{algorithm:<15}"
-                            f"{storage_used:>10.2f}"
-                            f"{states_visited:>15}"
-                            f"{elapsed_time:>10.4f}"])
+    Returns:
+        Iterator[AnytimeSolution]: Dãy lời giải ngày càng tốt hơn kèm cận sai số của từng lời giải.
+    """
+    maze = tuple(tuple(row) for row in maze)
+    if use_bitboard:
+        initial_state = BitboardState.from_tuples(maze, player_pos, boxes, targets)
+    else:
+        initial_state = SokobanState(maze, player_pos, frozenset(boxes), frozenset(targets))
+    if use_patterns:
+        pruners = [PatternDatabase.for_results('results_v2.csv')] + list(pruners)
+    solver = AStarSolver(csv_file='results_v2.csv', distance=distance, pruners=pruners, deadline=deadline,
+                         cancel_token=cancel_token)
+    return solver.solve_anytime(initial_state, time_limit, weights)
 
 def solve_sokoban_astar(maze: List[List[int]], 
                         player_pos: Tuple[int, int],
                         boxes: List[Tuple[int, int]], 
-                        targets: List[Tuple[int, int]]) -> Optional[List[Tuple[int, int]]]:
+                        targets: List[Tuple[int, int]],
+                        use_bitboard: bool = False,
+                        push_mode: bool = False,
+                        distance: str = 'manhattan',
+                        pruners: Sequence[DeadlockPruner] = (),
+                        use_patterns: bool = False,
+                        deadline: Optional[float] = None,
+                        cancel_token: Optional[CancellationToken] = None) -> Optional[List[Tuple[int, int]]]:
     """
     Hàm giải quyết bài toán Sokoban sử dụng thuật toán A*.
 
@@ -227,11 +610,25 @@ def solve_sokoban_astar(maze: List[List[int]],
         player_pos (Tuple[int, int]): Vị trí ban đầu của người chơi.
         boxes (List[Tuple[int, int]]): Danh sách vị trí các hộp.
         targets (List[Tuple[int, int]]): Danh sách vị trí đích của các hộp.
+        use_bitboard (bool): Dùng trạng thái dạng bitboard (BitboardState) thay cho SokobanState.
+        push_mode (bool): Tìm kiếm theo từng cú đẩy hộp thay vì từng bước đi.
+        distance (str): Thước đo khoảng cách của heuristic: 'manhattan' hoặc 'push' (có tính tường).
+        pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc chạy sau mỗi cú đẩy hộp.
+        use_patterns (bool): Dùng (và bổ sung) cơ sở dữ liệu mẫu bế tắc lưu cùng thư mục với results_v2.csv.
+        deadline (Optional[float]): Thời điểm phải dừng tìm kiếm (theo time.time()), None nếu không giới hạn.
+        cancel_token (Optional[CancellationToken]): Cờ hủy; bộ giải tự dừng khi cờ được bật.
 
     Returns:
         Optional[List[Tuple[int, int]]]: Danh sách các nước đi để giải quyết bài toán,
         hoặc None nếu không tìm thấy giải pháp.
     """
-    initial_state = SokobanState(tuple(tuple(row) for row in maze), player_pos, frozenset(boxes), frozenset(targets))
-    solver = AStarSolver(csv_file='results.csv')
+    maze = tuple(tuple(row) for row in maze)
+    if use_bitboard:
+        initial_state = BitboardState.from_tuples(maze, player_pos, boxes, targets)
+    else:
+        initial_state = SokobanState(maze, player_pos, frozenset(boxes), frozenset(targets))
+    if use_patterns:
+        pruners = [PatternDatabase.for_results('results_v2.csv')] + list(pruners)
+    solver = AStarSolver(csv_file='results_v2.csv', push_mode=push_mode, distance=distance, pruners=pruners,
+                         deadline=deadline, cancel_token=cancel_token)
     return solver.solve(initial_state)
@@ -0,0 +1,276 @@
+"""
+Đo hiệu năng các bộ giải trên các bản đồ của maps.txt mà không cần giao diện pygame.
+
+Ví dụ:
+    python benchmark.py --maps 1-5,10 --algorithms astar,bfs --timeout 30 --repeats 3 --warmup 1 --workers 4
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import statistics
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from sokoban_common import (SokobanState, BitboardState, SolveResult, MemoryMonitor, ResultsSink, PhaseProfiler,
+                            load_maps, map_to_game_state)
+from astar_solver import AStarSolver
+from bfs_solver import BFSSolver
+from hill_climbing_solver import HillClimbingSolver
+from idastar_solver import IDAStarSolver
+
+# Các cấu hình bộ giải được đo: tên -> (lớp bộ giải, phương thức giải, tham số thêm cho hàm khởi tạo)
+SOLVERS = {
+    'astar': (AStarSolver, 'run', {}),
+    'astar_push': (AStarSolver, 'run', {'push_mode': True, 'distance': 'push'}),
+    'astar_anytime': (AStarSolver, 'solve_anytime', {'distance': 'push'}),
+    'bfs': (BFSSolver, 'run', {}),
+    'bfs_push': (BFSSolver, 'run', {'push_mode': True}),
+    'bfs_bidir': (BFSSolver, 'run', {'bidirectional': True}),
+    'hillclimbing': (HillClimbingSolver, 'run', {'seed': 0}),
+    'idastar': (IDAStarSolver, 'run', {'distance': 'push'}),
+}
+
+# Các cột của bảng kết quả: (tiêu đề, khóa trong dòng kết quả, định dạng)
+COLUMNS = [
+    ('Map', 'map', '{}'),
+    ('Algorithm', 'algorithm', '{}'),
+    ('Status', 'status', '{}'),
+    ('Solved', 'solved', '{}'),
+    ('Time (s)', 'time', '{:.4f}'),
+    ('Expansions', 'expansions', '{}'),
+    ('States/s', 'states_per_second', '{:.0f}'),
+    ('Peak (MB)', 'peak_mb', '{:.2f}'),
+    ('Length', 'length', '{}'),
+]
+
+# Các cột của bảng thời gian theo pha (--profile): thời gian cộng dồn rồi số lần gọi của từng pha (xem PhaseProfiler)
+PROFILE_COLUMNS = ([('Map', 'map', '{}'), ('Algorithm', 'algorithm', '{}')] +
+                   [(f'{phase.capitalize()} (s)', f'{phase}_time', '{:.3f}') for phase in PhaseProfiler.phases] +
+                   [(f'{phase.capitalize()} #', f'{phase}_calls', '{}') for phase in PhaseProfiler.phases])
+
+def parse_selection(text: str, count: int) -> List[int]:
+    """
+    Đọc danh sách số thứ tự bản đồ dạng '1-5,8,10' (đánh số từ 1) hoặc 'all'.
+
+    Arguments:
+        text (str): Chuỗi lựa chọn.
+        count (int): Số bản đồ hiện có.
+
+    Returns:
+        List[int]: Các số thứ tự bản đồ, không trùng lặp và theo thứ tự tăng dần.
+    """
+    if text == 'all':
+        return list(range(1, count + 1))
+    selected = set()
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        selected.update(range(int(first), int(last or first) + 1))
+    invalid = [number for number in selected if not 1 <= number <= count]
+    if invalid:
+        raise ValueError(f"Không có bản đồ số {invalid[0]} (maps có {count} bản đồ)")
+    return sorted(selected)
+
+def _solve_once(algorithm: str, initial_state: SokobanState, timeout: float, memory: str,
+                profile: bool = False) -> Tuple[SolveResult, float, Dict[str, object]]:
+    """
+    Giải một bản đồ một lần bằng một cấu hình trong SOLVERS.
+
+    Arguments:
+        algorithm (str): Tên cấu hình trong SOLVERS.
+        initial_state (SokobanState): Trạng thái ban đầu.
+        timeout (float): Thời gian tối đa (giây) của lần giải.
+        memory (str): Cách đo bộ nhớ đỉnh của bộ giải (xem MemoryMonitor).
+        profile (bool): Đo thời gian từng pha tìm kiếm (stats['profile'] của kết quả).
+
+    Returns:
+        Tuple[SolveResult, float, Dict[str, object]]: Kết quả của bộ giải, thời gian chạy thực tế (giây) và dòng
+        kết quả dạng ResultsSink.
+    """
+    solver_class, method, options = SOLVERS[algorithm]
+    start_time = time.perf_counter()
+    # Bộ giải không tự ghi tệp kết quả: tiến trình chính ghi các dòng của mọi lần đo (xem --results)
+    solver = solver_class(csv_file=None, deadline=time.time() + timeout, memory=memory, profile=profile, **options)
+    outcome = getattr(solver, method)(initial_state)
+    if isinstance(outcome, Iterator):
+        # Bộ giải anytime: chạy tới khi tối ưu hoặc hết giờ, kết quả cuối nằm trong solver.result
+        for _ in outcome:
+            pass
+    elapsed = time.perf_counter() - start_time
+    return solver.result, elapsed, ResultsSink.row(algorithm, initial_state, solver.parameters(), solver.result)
+
+def run_benchmark(map_number: int, map_data: List[str], algorithm: str, timeout: float, repeats: int,
+                  warmup: int, use_bitboard: bool, memory: str = 'rss',
+                  profile: bool = False) -> Tuple[Dict[str, object], List[Dict[str, object]]]:
+    """
+    Đo một cặp (bản đồ, bộ giải): chạy warmup lần không tính, rồi repeats lần được đo.
+
+    Hàm chạy trong một tiến trình riêng cho mỗi cặp, nên bộ đệm của cặp trước không ảnh hưởng cặp sau.
+
+    Arguments:
+        map_number (int): Số thứ tự bản đồ (từ 1).
+        map_data (List[str]): Các dòng của bản đồ.
+        algorithm (str): Tên cấu hình trong SOLVERS.
+        timeout (float): Thời gian tối đa (giây) của mỗi lần giải.
+        repeats (int): Số lần giải được đo.
+        warmup (int): Số lần giải chạy trước để làm nóng (nạp module, tạo bộ đệm của bản đồ).
+        use_bitboard (bool): Dùng BitboardState thay cho SokobanState.
+        memory (str): Cách đo bộ nhớ đỉnh: 'rss', 'tracemalloc' hoặc 'off'.
+        profile (bool): Đo thời gian từng pha tìm kiếm; số liệu của lần đo cuối nằm ở khóa 'profile' của dòng.
+
+    Returns:
+        Tuple[Dict[str, object], List[Dict[str, object]]]: Một dòng của bảng kết quả (xem COLUMNS), với thời gian
+        là trung vị các lần đo, và dòng ResultsSink của từng lần đo.
+    """
+    maze, player_pos, boxes, targets = map_to_game_state(map_data)
+    maze = tuple(tuple(row) for row in maze)
+    if use_bitboard:
+        initial_state = BitboardState.from_tuples(maze, player_pos, boxes, targets)
+    else:
+        initial_state = SokobanState(maze, player_pos, frozenset(boxes), frozenset(targets))
+
+    for _ in range(warmup):
+        _solve_once(algorithm, initial_state, timeout, memory, profile)
+    runs = [_solve_once(algorithm, initial_state, timeout, memory, profile) for _ in range(repeats)]
+    peaks = [run.stats['peak_mb'] for run, _, _ in runs if run.stats.get('peak_mb') is not None]
+
+    result = runs[-1][0]
+    elapsed = statistics.median(wall for _, wall, _ in runs)
+    row = {
+        'map': map_number,
+        'algorithm': algorithm,
+        'status': result.status,
+        'solved': f"{sum(run.solved for run, _, _ in runs)}/{repeats}",
+        'time': elapsed,
+        'expansions': result.iterations,
+        'states_per_second': result.iterations / elapsed if elapsed > 0 else None,
+        # Mức tăng bộ nhớ đỉnh lớn nhất của các lần đo (MemoryMonitor của bộ giải)
+        'peak_mb': max(peaks) if peaks else None,
+        'length': len(result.moves) if result.moves is not None else None,
+        'profile': result.stats.get('profile'),
+    }
+    return row, [record for _, _, record in runs]
+
+
+def _run_pair(task: tuple) -> Tuple[Dict[str, object], List[Dict[str, object]]]:
+    """
+    Gọi run_benchmark với các tham số đã gói thành một bộ (Pool.imap_unordered chỉ truyền một đối số).
+
+    Arguments:
+        task (tuple): Các tham số theo thứ tự của run_benchmark.
+
+    Returns:
+        Tuple[Dict[str, object], List[Dict[str, object]]]: Kết quả của run_benchmark.
+    """
+    return run_benchmark(*task)
+
+def format_table(rows: Sequence[Dict[str, object]], columns: Sequence[Tuple[str, str, str]] = COLUMNS) -> str:
+    """
+    Định dạng các dòng kết quả thành bảng văn bản căn cột.
+
+    Arguments:
+        rows (Sequence[Dict[str, object]]): Các dòng kết quả của run_benchmark.
+        columns (Sequence[Tuple[str, str, str]]): Các cột (tiêu đề, khóa, định dạng). Mặc định là COLUMNS.
+
+    Returns:
+        str: Bảng kết quả; ô không có giá trị được ghi là '-'.
+    """
+    cells = [[title for title, _, _ in columns]]
+    for row in rows:
+        cells.append(['-' if row.get(key) is None else pattern.format(row[key]) for _, key, pattern in columns])
+    widths = [max(len(line[column]) for line in cells) for column in range(len(columns))]
+    lines = []
+    for line in cells:
+        # Hai cột đầu căn trái, các cột số căn phải
+        lines.append('  '.join(cell.ljust(width) if column < 2 else cell.rjust(width)
+                               for column, (cell, width) in enumerate(zip(line, widths))))
+    return '\n'.join(lines)
+
+def format_profile(rows: Sequence[Dict[str, object]]) -> str:
+    """
+    Định dạng thời gian cộng dồn và số lần gọi theo pha tìm kiếm của các dòng kết quả (xem PROFILE_COLUMNS).
+
+    Arguments:
+        rows (Sequence[Dict[str, object]]): Các dòng kết quả của run_benchmark chạy với profile.
+
+    Returns:
+        str: Bảng thời gian theo pha; pha mà bộ giải không có được ghi là 0.
+    """
+    flat = []
+    for row in rows:
+        line = {'map': row['map'], 'algorithm': row['algorithm']}
+        for phase, values in (row['profile'] or {}).items():
+            line[f'{phase}_time'], line[f'{phase}_calls'] = values['time'], values['calls']
+        flat.append(line)
+    return format_table(flat, PROFILE_COLUMNS)
+
+def main(argv: Optional[Sequence[str]] = None):
+    """
+    Điểm vào dòng lệnh: đọc tham số, chạy các cặp (bản đồ, bộ giải) trên nhóm tiến trình và in bảng kết quả.
+
+    Arguments:
+        argv (Optional[Sequence[str]]): Tham số dòng lệnh, None để dùng sys.argv.
+    """
+    parser = argparse.ArgumentParser(description='Đo hiệu năng các bộ giải Sokoban trên maps.txt.')
+    parser.add_argument('--maps-file', default='maps.txt', help='Tệp bản đồ (mặc định: maps.txt).')
+    parser.add_argument('--maps', default='all', help="Các bản đồ được đo, ví dụ '1-5,8' (mặc định: all).")
+    parser.add_argument('--algorithms', default='astar,bfs,hillclimbing,idastar',
+                        help=f"Các bộ giải, cách nhau bởi dấu phẩy, hoặc 'all'. Có: {', '.join(SOLVERS)}.")
+    parser.add_argument('--timeout', type=float, default=30.0, help='Thời gian tối đa (giây) của mỗi lần giải.')
+    parser.add_argument('--repeats', type=int, default=1, help='Số lần giải được đo cho mỗi cặp.')
+    parser.add_argument('--warmup', type=int, default=0, help='Số lần giải làm nóng (không tính) cho mỗi cặp.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Số tiến trình chạy song song.')
+    parser.add_argument('--memory', choices=MemoryMonitor.modes, default='rss',
+                        help="Cách đo bộ nhớ đỉnh. 'rss' gần như không tốn thời gian nhưng sau lần làm nóng chỉ thấy "
+                             "phần bộ nhớ tiến trình phải xin thêm; 'tracemalloc' chính xác nhưng làm chậm bộ giải.")
+    parser.add_argument('--bitboard', action='store_true', help='Dùng BitboardState thay cho SokobanState.')
+    parser.add_argument('--profile', action='store_true',
+                        help='Đo và in thêm thời gian, số lần gọi của từng pha tìm kiếm (làm bộ giải chậm đi).')
+    parser.add_argument('--output', help='Ghi thêm bảng kết quả ra tệp CSV.')
+    parser.add_argument('--results', help='Ghi từng lần đo ra tệp kết quả (.csv hoặc .jsonl, xem ResultsSink); '
+                                          'tệp CSV có sẵn phải cùng định dạng cột.')
+    args = parser.parse_args(argv)
+    for option, value, minimum in (('--repeats', args.repeats, 1), ('--workers', args.workers, 1),
+                                   ('--warmup', args.warmup, 0)):
+        if value < minimum:
+            parser.error(f"{option} phải lớn hơn hoặc bằng {minimum} (nhận được {value})")
+
+    maps = load_maps(args.maps_file)
+    map_numbers = parse_selection(args.maps, len(maps))
+    algorithms = list(SOLVERS) if args.algorithms == 'all' else args.algorithms.split(',')
+    unknown = [name for name in algorithms if name not in SOLVERS]
+    if unknown:
+        parser.error(f"Không có bộ giải '{unknown[0]}'. Có: {', '.join(SOLVERS)}")
+
+    rows = []
+    try:
+        sink = ResultsSink(args.results, batch_size=1000) if args.results else None
+    except ValueError as error:
+        parser.error(str(error))
+    tasks = [(number, maps[number - 1], algorithm, args.timeout, args.repeats, args.warmup, args.bitboard,
+              args.memory, args.profile) for number in map_numbers for algorithm in algorithms]
+    # Mỗi tiến trình chỉ chạy một cặp rồi thoát (maxtasksperchild=1), để bộ nhớ và bộ đệm của cặp trước không ảnh
+    # hưởng cặp sau; multiprocessing.Pool thay cho ProcessPoolExecutor(max_tasks_per_child=...) cần Python 3.11
+    with multiprocessing.get_context('spawn').Pool(args.workers, maxtasksperchild=1) as pool:
+        for row, records in pool.imap_unordered(_run_pair, tasks):
+            rows.append(row)
+            if sink is not None:
+                for record in records:
+                    sink.write(record)
+            print(f"Map {row['map']:>3} {row['algorithm']:<15} {row['status']:<12} {row['time']:.4f}s", flush=True)
+
+    if sink is not None:
+        sink.flush()
+    rows.sort(key=lambda row: (row['map'], algorithms.index(row['algorithm'])))
+    print()
+    print(format_table(rows))
+    if args.profile:
+        print()
+        print(format_profile(rows))
+    if args.output:
+        with open(args.output, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=[key for _, key, _ in COLUMNS], extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+if __name__ == '__main__':
+    main()
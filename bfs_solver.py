@@ -1,47 +1,43 @@
-import time
 import sys
-import csv
-from typing import FrozenSet, List, Tuple, Optional, Set
-from sokoban_common import SokobanState, MOVES
+from typing import Dict, FrozenSet, List, Tuple, Optional, Set, Union, Hashable, Sequence
+from sokoban_common import (SokobanState, BitboardState, ZobristTable, NodePool, DeadlockPruner, PatternDatabase,
+                            CancellationToken, SearchLimits, SolveResult, MemoryMonitor, ResultsSink, PhaseProfiler, SolverBase,
+                            pushed_box, is_pruned, learn_deadlock, probe, MOVES)
 from collections import deque
-from pympler import asizeof
 
-class BFSSolver:
-    def __init__(self, max_iterations: int = 1000000, csv_file: str = 'results.csv'):
+class BFSSolver(SolverBase):
+    def __init__(self, max_iterations: int = 1000000, csv_file: Optional[str] = 'results_v2.csv', push_mode: bool = False,
+                 pruners: Sequence[DeadlockPruner] = (), bidirectional: bool = False,
+                 deadline: Optional[float] = None, cancel_token: Optional[CancellationToken] = None,
+                 memory: str = 'rss', profile: bool = False):
         """
         Khởi tạo bộ giải BFS.
         
         Arguments:
         max_iterations (int): Số vòng lặp tối đa để tìm kiếm.
-        csv_file (str): Đường dẫn tệp CSV lưu kết quả.
+        csv_file (Optional[str]): Tệp kết quả (CSV, hoặc JSON Lines nếu có đuôi .jsonl, xem ResultsSink); None để
+        không ghi.
+        push_mode (bool): Tìm kiếm theo từng cú đẩy hộp thay vì từng bước đi của người chơi.
+        pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc chạy sau mỗi cú đẩy hộp (ví dụ FreezeDeadlockPruner).
+        bidirectional (bool): Tìm kiếm hai chiều: đẩy hộp từ trạng thái ban đầu và kéo hộp từ các cấu hình đích
+        (luôn theo từng cú đẩy, bỏ qua push_mode).
+        deadline (Optional[float]): Thời điểm phải dừng tìm kiếm (theo time.time()), None nếu không giới hạn.
+        cancel_token (Optional[CancellationToken]): Cờ hủy được kiểm tra định kỳ trong vòng lặp tìm kiếm.
+        memory (str): Cách đo bộ nhớ đỉnh của lần giải: 'rss', 'tracemalloc' hoặc 'off' (xem MemoryMonitor).
+        profile (bool): Đo số lần gọi và thời gian của từng pha tìm kiếm (stats['profile'] của kết quả, xem
+        PhaseProfiler).
         """
         self.max_iterations = max_iterations
         self.csv_file = csv_file
-        self._initialize_csv()
-
-    def _initialize_csv(self):
-        """
-        Khởi tạo tệp CSV với tiêu đề nếu tệp không tồn tại hoặc trống.
-        
-        Nếu tệp CSV không tồn tại, phương thức sẽ tạo tệp mới và ghi tiêu đề cột.
-        Nếu tệp đã tồn tại, chỉ thêm tiêu đề nếu tệp trống.
-        """
-        try:
-            with open(self.csv_file, mode='a', newline='') as file:  # Chế độ 'a' cho phép thêm vào file nếu nó tồn tại
-                if file.tell() == 0:  # Kiểm tra nếu file trống
-                    writer = csv.writer(file)
-                    writer.writerow([f"{'Algorithm':<15}"  # Căn chỉnh 'Algorithm' sang trái với độ rộng 15
-                                    f"{'Storage (MB)':>10}"  # Căn chỉnh 'Storage (MB)' sang phải với độ rộng 10
-                                    f"{'States Visited':>15}"  # Căn chỉnh 'States Visited' sang phải với độ rộng 15
-                                    f"{'Time (s)':>10}"])  # Căn chỉnh 'Time (s)' sang phải với độ rộng 10
-        except FileNotFoundError:
-            with open(self.csv_file, mode='w', newline='') as file:  # Chế độ 'w' để tạo mới file và ghi tiêu đề
-                writer = csv.writer(file)
-                writer.writerow([f"{'Algorithm':<15}"  # Căn chỉnh 'Algorithm' sang trái với độ rộng 15
-                                f"{'Storage (MB)':>10}"  # Căn chỉnh 'Storage (MB)' sang phải với độ rộng 10
-                                f"{'States Visited':>15}"  # Căn chỉnh 'States Visited' sang phải với độ rộng 15
-                                f"{'Time (s)':>10}"])  # Căn chỉnh 'Time (s)' sang phải với độ rộng 10
-
+        self.push_mode = push_mode
+        self.pruners = list(pruners)
+        self.bidirectional = bidirectional
+        self.limits = SearchLimits(deadline, cancel_token)
+        self.memory = MemoryMonitor(memory)
+        self.profile = profile
+        self.profiler: Optional[PhaseProfiler] = None  # Bộ đo các pha của lần giải gần nhất
+        self.result: Optional[SolveResult] = None  # Kết quả có cấu trúc của lần giải gần nhất
+        self.results = ResultsSink.shared(csv_file) if csv_file else None  # Tệp kết quả dùng chung
 
     def solve(self, initial_state: SokobanState) -> Optional[List[Tuple[int, int]]]:
         """
@@ -53,92 +49,322 @@ class BFSSolver:
         Returns:
         Optional[List[Tuple[int, int]]]: Một danh sách các bước di chuyển, hoặc None nếu không tìm được lời giải.
         """
+        if self.bidirectional:
+            return self._solve_bidirectional(initial_state)
+        if self.push_mode:
+            return self._solve_pushes(initial_state)
         
-        # Tạo hàng đợi (queue) để lưu trữ các trạng thái và đường đi
-        queue = deque([(initial_state, [])])
-        visited = set()  # Lưu trữ các trạng thái đã thăm
+        level = initial_state.level
+        # Kho nút chỉ lưu nút cha và chỉ số nước đi (trong MOVES); đường đi được dựng lại khi tới đích
+        nodes = NodePool()
+        # Tạo hàng đợi (queue) để lưu trữ các trạng thái và chỉ số nút tương ứng
+        queue = deque([(initial_state, nodes.add(-1, -1))])
+        visited = ZobristTable()  # Lưu trữ các trạng thái đã thăm, khóa bằng giá trị Zobrist
 
         # Bắt đầu tính thời gian
-        start_time = time.time()
+        start_time = self._start('BFS', initial_state)
+        status = SolveResult.NODE_LIMIT  # Lý do dừng nếu vòng lặp chạy hết max_iterations
+        # Hàm của các pha tìm kiếm; khi bật profile chúng được bọc để đếm và đo thời gian (xem PhaseProfiler)
+        profiler = self.profiler
+        popleft = probe(profiler, 'expand', queue.popleft, counted=False)
+        append = probe(profiler, 'expand', queue.append, counted=False)
+        apply_move = probe(profiler, 'successors', type(initial_state).apply_move)
+        seen = probe(profiler, 'duplicates', visited.add)
+        pruned = probe(profiler, 'deadlock', is_pruned)
 
         # Vòng lặp chính của thuật toán BFS
         for iteration in range(self.max_iterations):
+            # Dừng sớm nếu hết thời gian hoặc bị hủy
+            reason = self.limits.stop_reason(iteration)
+            if reason:
+                status = reason
+                break
             if not queue:
                 # Nếu hàng đợi trống, không có giải pháp
-                return None
+                return self._finish(SolveResult.NO_SOLUTION, None, iteration, start_time, visited=len(visited),
+                                    generated=len(nodes), node_bytes=nodes.nbytes)
             
             # Lấy phần tử đầu tiên trong hàng đợi (FIFO)
-            current_state, path = queue.popleft()
+            current_state, node = popleft()
 
             # Kiểm tra nếu trạng thái hiện tại là trạng thái mục tiêu
             if current_state.is_goal():
-                end_time = time.time()
-                # Ghi kết quả vào file CSV
-                self._log_results('BFS', iteration, visited, start_time, end_time)
                 # Trả về đường đi từ trạng thái ban đầu đến mục tiêu
-                return path
+                return self._finish(SolveResult.SOLVED, [MOVES[code] for code in nodes.path(node)], iteration,
+                                    start_time, visited=len(visited), generated=len(nodes), node_bytes=nodes.nbytes)
 
-            # Chuyển trạng thái hiện tại thành một giá trị có thể so sánh (hashable)
-            state_hash = self.state_to_hashable(current_state)
-            if state_hash in visited:
+            # Đánh dấu trạng thái hiện tại là đã thăm; khóa đầy đủ chỉ được so sánh khi trùng giá trị Zobrist
+            if not seen(current_state.zobrist, self.state_to_hashable(current_state)):
                 # Nếu trạng thái đã được thăm, bỏ qua
                 continue
-            
-            # Đánh dấu trạng thái hiện tại là đã thăm
-            visited.add(state_hash)
+            if profiler is not None:
+                profiler.count('expand')  # Một nút thực sự được mở rộng (xem PhaseProfiler)
 
             # Lấy các trạng thái kế tiếp từ trạng thái hiện tại
-            for move in MOVES:
-                next_state = current_state.apply_move(move)
+            for code, move in enumerate(MOVES):
+                next_state = apply_move(current_state, move)
                 if next_state != current_state:
+                    # Nếu nước đi đẩy hộp, bỏ qua trạng thái mà một bộ cắt tỉa báo bế tắc
+                    if self.pruners:
+                        pushed = pushed_box(current_state, next_state, code)
+                        if pushed >= 0 and pruned(self.pruners, level, next_state.player_cell,
+                                                     next_state.box_mask, pushed):
+                            continue
                     # Nếu trạng thái kế tiếp khác trạng thái hiện tại, thêm vào hàng đợi
-                    queue.append((next_state, path + [move]))
+                    append((next_state, nodes.add(node, code)))
+
+        # Nếu không tìm được lời giải sau max_iterations (hoặc bị dừng sớm), ghi kết quả và trả về None
+        return self._finish(status, None, iteration, start_time, visited=len(visited), generated=len(nodes),
+                            node_bytes=nodes.nbytes)
+
+    def _solve_pushes(self, initial_state: SokobanState) -> Optional[List[Tuple[int, int]]]:
+        """
+        Giải bài toán Sokoban bằng BFS trên các cú đẩy hộp (macro move).
+
+        Mỗi nút là một cấu hình hộp cùng vùng người chơi đi tới được; các nút kế tiếp là các cú đẩy hợp lệ.
+        Đường đi bộ giữa các cú đẩy chỉ được dựng lại khi trả về lời giải, nên lời giải tối ưu theo số cú đẩy.
+
+        Arguments:
+        initial_state (SokobanState): Trạng thái ban đầu của trò chơi.
+
+        Returns:
+        Optional[List[Tuple[int, int]]]: Một danh sách các bước di chuyển, hoặc None nếu không tìm được lời giải.
+        """
+        level = initial_state.level
+        start_player, start_boxes = initial_state.player_cell, initial_state.box_mask
+
+        # Kho nút lưu nút cha và mã cú đẩy (ô hộp * 4 + hướng đẩy)
+        nodes = NodePool()
+        # Hàng đợi lưu (mặt nạ hộp, giá trị Zobrist của hộp, ô người chơi, chỉ số nút)
+        start_hash = level.box_hash(start_boxes)
+        queue = deque([(start_boxes, start_hash, start_player, nodes.add(-1, -1))])
+        # Lưu trữ các cặp (cấu hình hộp, ô đại diện vùng người chơi) đã gặp
+        visited = ZobristTable()
+        representative = level.normalize(start_player, start_boxes)
+        visited.add(start_hash ^ level.zobrist_player[representative], (start_boxes, representative))
+
+        start_time = self._start('BFS (push)', initial_state)
+        status = SolveResult.NODE_LIMIT
+        # Hàm của các pha tìm kiếm; khi bật profile chúng được bọc để đếm và đo thời gian (xem PhaseProfiler)
+        profiler = self.profiler
+        popleft = probe(profiler, 'expand', queue.popleft, counted=False)
+        append = probe(profiler, 'expand', queue.append, counted=False)
+        region = probe(profiler, 'successors', level.region)
+        push_successors = probe(profiler, 'successors', level.push_successors)
+        normalize = probe(profiler, 'duplicates', level.normalize)
+        seen = probe(profiler, 'duplicates', visited.add)
+        pruned = probe(profiler, 'deadlock', is_pruned)
+
+        for iteration in range(self.max_iterations):
+            reason = self.limits.stop_reason(iteration)
+            if reason:
+                status = reason
+                break
+            if not queue:
+                return self._finish(SolveResult.NO_SOLUTION, None, iteration, start_time, visited=len(visited),
+                                    generated=len(nodes), node_bytes=nodes.nbytes)
+
+            box_mask, box_hash, player, node = popleft()
+
+            if box_mask == level.target_mask:
+                pushes = [(code >> 2, code & 3) for code in nodes.path(node)]
+                return self._finish(SolveResult.SOLVED, level.moves_for_pushes(start_player, start_boxes, pushes),
+                                    iteration, start_time, visited=len(visited), generated=len(nodes),
+                                    node_bytes=nodes.nbytes)
+
+            if profiler is not None:
+                profiler.count('expand')  # Một nút thực sự được mở rộng (xem PhaseProfiler)
+            _, reach = region(player, box_mask)
 
-        # Nếu không tìm được lời giải sau max_iterations, ghi kết quả và trả về None
-        end_time = time.time()
-        self._log_results('BFS', iteration, visited, start_time, end_time)
-        return None
+            alive = False  # Có nút con nào không bị loại vì bế tắc không
+            for box, direction, next_boxes in push_successors(reach, box_mask):
+                # Sau cú đẩy, người chơi đứng tại ô cũ của hộp; loại trùng ngay khi sinh nút
+                next_hash = box_hash ^ level.zobrist_box[box] ^ level.zobrist_box[level.neighbors[box][direction]]
+                representative = normalize(box, next_boxes)
+                if not seen(next_hash ^ level.zobrist_player[representative], (next_boxes, representative)):
+                    alive = True
+                    continue
+                if self.pruners and pruned(self.pruners, level, box, next_boxes, level.neighbors[box][direction]):
+                    continue
+                alive = True
+                append((next_boxes, next_hash, box, nodes.add(node, box << 2 | direction)))
+            if not alive and self.pruners and node:
+                # Mọi nhánh con đều bế tắc: báo trạng thái này cho các bộ cắt tỉa (ví dụ để học mẫu bế tắc)
+                code = nodes.moves[node]
+                learn_deadlock(self.pruners, level, player, box_mask, level.neighbors[code >> 2][code & 3])
+
+        return self._finish(status, None, iteration, start_time, visited=len(visited), generated=len(nodes),
+                            node_bytes=nodes.nbytes)
+
+    def _solve_bidirectional(self, initial_state: SokobanState) -> Optional[List[Tuple[int, int]]]:
+        """
+        Giải bài toán Sokoban bằng BFS hai chiều trên các cú đẩy hộp.
+
+        Phía xuôi đẩy hộp từ trạng thái ban đầu; phía ngược kéo hộp từ mọi cấu hình đích (hộp nằm trên các mục
+        tiêu, người chơi ở một trong các vùng còn lại). Hai phía dùng chung khóa (mặt nạ hộp, ô đại diện vùng
+        người chơi) và gặp nhau khi một nút mới đã có ở phía kia. Mỗi lượt mở rộng trọn một tầng của phía có
+        hàng đợi nhỏ hơn, nên mỗi phía chỉ đi khoảng nửa độ sâu lời giải và lời giải vẫn tối ưu theo số cú đẩy.
+        Các bộ cắt tỉa chỉ chạy ở phía xuôi: mọi trạng thái của phía ngược đều giải được.
+
+        Arguments:
+        initial_state (SokobanState): Trạng thái ban đầu của trò chơi.
+
+        Returns:
+        Optional[List[Tuple[int, int]]]: Một danh sách các bước di chuyển, hoặc None nếu không tìm được lời giải.
+        """
+        level = initial_state.level
+        neighbors = level.neighbors
+        start_player, start_boxes = initial_state.player_cell, initial_state.box_mask
+        start_time = self._start('BFS (bidir)', initial_state)
+        if start_boxes == level.target_mask:
+            return self._finish(SolveResult.SOLVED, [], 0, start_time)
+
+        # Mỗi phía có kho nút (mã cú đẩy / cú kéo là ô hộp * 4 + hướng) và bảng khóa -> nút đã gặp
+        forward_nodes, backward_nodes = NodePool(), NodePool()
+        forward_seen: Dict[Tuple[int, int], int] = {}
+        backward_seen: Dict[Tuple[int, int], int] = {}
+        # Hàng đợi lưu (mặt nạ hộp, ô người chơi, chỉ số nút) của tầng đang xét
+        node = forward_nodes.add(-1, -1)
+        forward_seen[(start_boxes, level.normalize(start_player, start_boxes))] = node
+        forward_queue = deque([(start_boxes, start_player, node)])
+        backward_queue = deque()
+        for representative in level.goal_regions():
+            node = backward_nodes.add(-1, -1)
+            backward_seen[(level.target_mask, representative)] = node
+            backward_queue.append((level.target_mask, representative, node))
+
+        # Hàm của các pha tìm kiếm; khi bật profile chúng được bọc để đếm và đo thời gian (xem PhaseProfiler)
+        profiler = self.profiler
+        region = probe(profiler, 'successors', level.region)
+        push_successors = probe(profiler, 'successors', level.push_successors)
+        pull_successors = probe(profiler, 'successors', level.pull_successors)
+        normalize = probe(profiler, 'duplicates', level.normalize)
+        pruned = probe(profiler, 'deadlock', is_pruned)
+        iteration = 0
+        best = None  # (tổng số cú đẩy, nút phía xuôi, nút phía ngược) của điểm gặp tốt nhất
+        status = None  # Lý do dừng sớm (hết vòng lặp, hết thời gian, bị hủy)
+
+        while forward_queue and backward_queue and best is None and status is None:
+            forward = len(forward_queue) <= len(backward_queue)
+            queue = forward_queue if forward else backward_queue
+            popleft = probe(profiler, 'expand', queue.popleft, counted=False)
+            append = probe(profiler, 'expand', queue.append, counted=False)
+            # Mở rộng trọn một tầng để lấy điểm gặp có tổng độ sâu nhỏ nhất trong tầng đó
+            for _ in range(len(queue)):
+                status = self.limits.stop_reason(iteration)
+                if iteration >= self.max_iterations:
+                    status = SolveResult.NODE_LIMIT
+                if status:
+                    break
+                iteration += 1
+                box_mask, player, node = popleft()
+                if profiler is not None:
+                    profiler.count('expand')  # Một nút thực sự được mở rộng (xem PhaseProfiler)
+                _, reach = region(player, box_mask)
+                if forward:
+                    alive = False  # Có nút con nào không bị loại vì bế tắc không
+                    for box, direction, next_boxes in push_successors(reach, box_mask):
+                        key = (next_boxes, normalize(box, next_boxes))
+                        if key in forward_seen:
+                            alive = True
+                            continue
+                        other = backward_seen.get(key)
+                        if other is None and self.pruners and pruned(self.pruners, level, box, next_boxes,
+                                                                     neighbors[box][direction]):
+                            forward_seen[key] = -1
+                            continue
+                        alive = True
+                        child = forward_seen[key] = forward_nodes.add(node, box << 2 | direction)
+                        if other is not None:
+                            best = self._meeting(best, forward_nodes, child, backward_nodes, other)
+                        append((next_boxes, box, child))
+                    if not alive and self.pruners and node:
+                        # Mọi nhánh con đều bế tắc: báo trạng thái này cho các bộ cắt tỉa
+                        code = forward_nodes.moves[node]
+                        learn_deadlock(self.pruners, level, player, box_mask, neighbors[code >> 2][code & 3])
+                else:
+                    for box, direction, next_boxes in pull_successors(reach, box_mask):
+                        # Sau cú kéo, người chơi lùi ra sau ô mới của hộp
+                        back = neighbors[neighbors[box][direction]][direction]
+                        key = (next_boxes, normalize(back, next_boxes))
+                        if key in backward_seen:
+                            continue
+                        child = backward_seen[key] = backward_nodes.add(node, box << 2 | direction)
+                        other = forward_seen.get(key)
+                        if other is not None and other >= 0:  # -1: trạng thái đã bị cắt tỉa ở phía xuôi
+                            best = self._meeting(best, forward_nodes, other, backward_nodes, child)
+                        append((next_boxes, back, child))
+
+        stats = {'forward_visited': len(forward_seen), 'backward_visited': len(backward_seen),
+                 'generated': len(forward_nodes) + len(backward_nodes),
+                 'node_bytes': forward_nodes.nbytes + backward_nodes.nbytes}
+        if best is None:
+            return self._finish(status or SolveResult.NO_SOLUTION, None, iteration, start_time, **stats)
+        _, forward_node, backward_node = best
+        pushes = [(code >> 2, code & 3) for code in forward_nodes.path(forward_node)]
+        # Các cú kéo (từ đích về điểm gặp) đảo ngược thành các cú đẩy (từ điểm gặp tới đích)
+        for code in reversed(backward_nodes.path(backward_node)):
+            box, direction = code >> 2, code & 3
+            pushes.append((neighbors[box][direction], direction ^ 1))
+        return self._finish(SolveResult.SOLVED, level.moves_for_pushes(start_player, start_boxes, pushes),
+                            iteration, start_time, **stats)
 
     @staticmethod
-    def state_to_hashable(state: SokobanState) -> Tuple[Tuple[int, int], FrozenSet[Tuple[int, int]]]:
+    def _meeting(best: Optional[Tuple[int, int, int]], forward_nodes: NodePool, forward_node: int,
+                 backward_nodes: NodePool, backward_node: int) -> Tuple[int, int, int]:
         """
-        Chuyển trạng thái của trò chơi thành một kiểu có thể so sánh được để sử dụng trong tập đã thăm.
-        
+        Chọn điểm gặp tốt hơn giữa điểm gặp tốt nhất hiện có và điểm gặp mới của hai phía tìm kiếm.
+
         Arguments:
-        state (SokobanState): Trạng thái của trò chơi cần chuyển đổi.
-        
+        best (Optional[Tuple[int, int, int]]): Điểm gặp tốt nhất hiện có, hoặc None.
+        forward_nodes (NodePool): Kho nút phía xuôi.
+        forward_node (int): Nút phía xuôi tại điểm gặp.
+        backward_nodes (NodePool): Kho nút phía ngược.
+        backward_node (int): Nút phía ngược tại điểm gặp.
+
         Returns:
-        Tuple[Tuple[int, int], FrozenSet[Tuple[int, int]]]: Trạng thái đã được chuyển thành một tuple.
+        Tuple[int, int, int]: (tổng số cú đẩy, nút phía xuôi, nút phía ngược).
         """
-        return (state.player_pos, state.boxes)
+        pushes = len(forward_nodes.path(forward_node)) + len(backward_nodes.path(backward_node))
+        if best is not None and best[0] <= pushes:
+            return best
+        return pushes, forward_node, backward_node
 
-    def _log_results(self, algorithm: str, iteration: int, state: SokobanState, start_time: float, end_time: float):
+    def parameters(self) -> Dict[str, object]:
         """
-        Ghi kết quả giải thuật vào tệp CSV.
+        Tham số của bộ giải, được ghi cùng mỗi dòng kết quả.
 
+        Returns:
+        Dict[str, object]: Tên tham số -> giá trị (bộ cắt tỉa được ghi bằng tên lớp).
+        """
+        return {'max_iterations': self.max_iterations, 'push_mode': self.push_mode,
+                'bidirectional': self.bidirectional, 'pruners': [type(pruner).__name__ for pruner in self.pruners]}
+
+    @staticmethod
+    def state_to_hashable(state: Union[SokobanState, BitboardState]) -> Hashable:
+        """
+        Chuyển trạng thái của trò chơi thành một kiểu có thể so sánh được để sử dụng trong tập đã thăm.
+        
         Arguments:
-            algorithm (str): Tên thuật toán.
-            iteration (int): Số lần lặp.
-            state (SokobanState): Trạng thái cuối cùng của bài toán.
-            start_time (float): Thời điểm bắt đầu.
-            end_time (float): Thời điểm kết thúc.
+        state (SokobanState | BitboardState): Trạng thái của trò chơi cần chuyển đổi.
+        
+        Returns:
+        Hashable: Khóa gọn của trạng thái (xem SokobanState.key).
         """
-        # Sử dụng pympler để đo bộ nhớ của đối tượng state và các đối tượng con
-        storage_used = asizeof.asizeof(state) / (1024 * 1024)  # Chuyển sang MB
-        states_visited = iteration
-        elapsed_time = end_time - start_time
-
-        with open(self.csv_file, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([f"{algorithm:<15}"
-                            f"{storage_used:>10.2f}"
-                            f"{states_visited:>15}"
-                            f"{elapsed_time:>10.4f}"])
+        return state.key()
+
 
 def solve_sokoban_bfs(maze: List[List[int]], 
                       player_pos: Tuple[int, int],
                       boxes: List[Tuple[int, int]], 
-                      targets: List[Tuple[int, int]]) -> Optional[List[Tuple[int, int]]]:
+                      targets: List[Tuple[int, int]],
+                      use_bitboard: bool = False,
+                      push_mode: bool = False,
+                      pruners: Sequence[DeadlockPruner] = (),
+                      use_patterns: bool = False,
+                      bidirectional: bool = False,
+                      deadline: Optional[float] = None,
+                      cancel_token: Optional[CancellationToken] = None) -> Optional[List[Tuple[int, int]]]:
     """
     Giải bài toán Sokoban bằng thuật toán BFS.
     
@@ -147,10 +373,24 @@ def solve_sokoban_bfs(maze: List[List[int]],
     player_pos (Tuple[int, int]): Vị trí ban đầu của người chơi.
     boxes (List[Tuple[int, int]]): Danh sách các hộp trong trò chơi.
     targets (List[Tuple[int, int]]): Danh sách các vị trí mục tiêu của hộp.
+    use_bitboard (bool): Dùng trạng thái dạng bitboard (BitboardState) thay cho SokobanState.
+    push_mode (bool): Tìm kiếm theo từng cú đẩy hộp (số cú đẩy tối ưu) thay vì từng bước đi.
+    pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc chạy sau mỗi cú đẩy hộp.
+    use_patterns (bool): Dùng (và bổ sung) cơ sở dữ liệu mẫu bế tắc lưu cùng thư mục với results_v2.csv.
+    bidirectional (bool): Tìm kiếm hai chiều (đẩy xuôi từ trạng thái ban đầu, kéo ngược từ các cấu hình đích).
+    deadline (Optional[float]): Thời điểm phải dừng tìm kiếm (theo time.time()), None nếu không giới hạn.
+    cancel_token (Optional[CancellationToken]): Cờ hủy; bộ giải tự dừng khi cờ được bật.
     
     Returns:
     Optional[List[Tuple[int, int]]]: Một danh sách các bước di chuyển, hoặc None nếu không tìm được lời giải.
     """
-    initial_state = SokobanState(tuple(tuple(row) for row in maze), player_pos, frozenset(boxes), frozenset(targets))
-    solver = BFSSolver(csv_file='results.csv')  # Chỉ định tệp CSV
+    maze = tuple(tuple(row) for row in maze)
+    if use_bitboard:
+        initial_state = BitboardState.from_tuples(maze, player_pos, boxes, targets)
+    else:
+        initial_state = SokobanState(maze, player_pos, frozenset(boxes), frozenset(targets))
+    if use_patterns:
+        pruners = [PatternDatabase.for_results('results_v2.csv')] + list(pruners)
+    solver = BFSSolver(csv_file='results_v2.csv', push_mode=push_mode, pruners=pruners, bidirectional=bidirectional,
+                       deadline=deadline, cancel_token=cancel_token)  # Chỉ định tệp CSV
     return solver.solve(initial_state)
@@ -1,12 +1,192 @@
 import random
 import time
 import sys
-import csv
-from typing import List, Tuple, Optional
-from sokoban_common import SokobanState, MOVES
-from pympler import asizeof
+import itertools
+import multiprocessing
+import queue
+from collections import deque
+from typing import Dict, Iterator, List, Tuple, Optional, Sequence
+from sokoban_common import (SokobanState, BitboardState, DeadlockPruner, PatternDatabase, CancellationToken,
+                            SearchLimits, SolveResult, MemoryMonitor, ResultsSink, PhaseProfiler, SolverBase, pushed_box,
+                            is_pruned, probe, MOVES)
+
+def luby(index: int) -> int:
+    """
+    Phần tử thứ index (bắt đầu từ 1) của dãy Luby: 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+
+    Arguments:
+        index (int): Vị trí trong dãy, bắt đầu từ 1.
+
+    Returns:
+        int: Giá trị của dãy tại vị trí index.
+    """
+    k = 1
+    while (1 << k) - 1 < index:
+        k += 1
+    while index != (1 << k) - 1:
+        index -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < index:
+            k += 1
+    return 1 << (k - 1)
+
+def restart_budgets(policy: str, unit: int, factor: float = 2.0) -> Iterator[int]:
+    """
+    Sinh số vòng lặp tối đa cho từng lượt leo đồi theo chính sách khởi động lại.
+
+    Arguments:
+        policy (str): 'none' (chỉ khởi động lại khi bị kẹt), 'luby' (unit * luby(i)) hoặc
+            'geometric' (unit * factor^i).
+        unit (int): Số vòng lặp cơ sở của một lượt leo.
+        factor (float): Hệ số tăng của chính sách 'geometric'.
+
+    Returns:
+        Iterator[int]: Dãy vô hạn các số vòng lặp.
+    """
+    if policy == 'none':
+        return itertools.repeat(sys.maxsize)
+    if policy == 'luby':
+        return (unit * luby(i) for i in itertools.count(1))
+    if policy == 'geometric':
+        return (max(1, int(unit * factor ** i)) for i in itertools.count())
+    raise ValueError(f"Chính sách khởi động lại không hợp lệ: {policy}")
+
+class SharedClimbState:
+    """
+    Trạng thái tốt nhất dùng chung giữa các tiến trình leo đồi: điểm số và chuỗi nước đi (mã trong MOVES)
+    từ trạng thái ban đầu tới trạng thái đó, lưu trong bộ nhớ dùng chung của multiprocessing.
+
+    Attributes:
+        capacity (int): Độ dài tối đa của chuỗi nước đi được lưu; đường đi dài hơn không được chia sẻ.
+    """
+    def __init__(self, context, capacity: int):
+        """
+        Khởi tạo vùng nhớ dùng chung.
+
+        Arguments:
+            context: Ngữ cảnh multiprocessing dùng để tạo khóa và mảng dùng chung.
+            capacity (int): Độ dài tối đa của chuỗi nước đi.
+        """
+        self.capacity = capacity
+        self._lock = context.Lock()
+        self._score = context.Value('d', float('-inf'), lock=False)
+        self._length = context.Value('i', -1, lock=False)
+        self._moves = context.Array('b', capacity, lock=False)
+
+    @property
+    def score(self) -> float:
+        """Điểm số tốt nhất đã chia sẻ (âm vô cùng nếu chưa có)."""
+        return self._score.value
+
+    def publish(self, score: float, path: List[Tuple[int, int]]) -> bool:
+        """
+        Chia sẻ một trạng thái nếu nó tốt hơn trạng thái đang lưu.
+
+        Arguments:
+            score (float): Điểm số của trạng thái.
+            path (List[Tuple[int, int]]): Các nước đi từ trạng thái ban đầu tới trạng thái.
+
+        Returns:
+            bool: True nếu trạng thái được lưu.
+        """
+        if score <= self._score.value or len(path) > self.capacity:
+            return False
+        with self._lock:
+            if score <= self._score.value:
+                return False
+            for i, move in enumerate(path):
+                self._moves[i] = MOVES.index(move)
+            self._length.value = len(path)
+            self._score.value = score
+        return True
+
+    def best(self) -> Optional[Tuple[float, List[Tuple[int, int]]]]:
+        """
+        Đọc trạng thái tốt nhất đã chia sẻ.
+
+        Returns:
+            Optional[Tuple[float, List[Tuple[int, int]]]]: (điểm số, các nước đi), hoặc None nếu chưa có.
+        """
+        with self._lock:
+            if self._length.value < 0:
+                return None
+            return self._score.value, [MOVES[code] for code in self._moves[:self._length.value]]
+
+class TabuList:
+    """
+    Bộ nhớ tabu có giới hạn: giữ giá trị băm (Zobrist) của các trạng thái vừa đi qua gần nhất. Khi vượt
+    quá capacity, trạng thái cũ nhất bị quên trước (FIFO).
+
+    Attributes:
+        capacity (int): Số trạng thái tối đa được nhớ; 0 để tắt bộ nhớ tabu.
+    """
+    def __init__(self, capacity: int):
+        """
+        Khởi tạo bộ nhớ tabu.
+
+        Arguments:
+            capacity (int): Số trạng thái tối đa được nhớ.
+        """
+        self.capacity = capacity
+        self._order: deque = deque()
+        self._counts: Dict[int, int] = {}  # Giá trị băm -> số lần xuất hiện trong _order
+
+    def add(self, key: int):
+        """
+        Ghi nhớ một trạng thái.
+
+        Arguments:
+            key (int): Giá trị băm của trạng thái.
+        """
+        if self.capacity <= 0:
+            return
+        self._order.append(key)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        if len(self._order) > self.capacity:
+            oldest = self._order.popleft()
+            if self._counts[oldest] == 1:
+                del self._counts[oldest]
+            else:
+                self._counts[oldest] -= 1
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._counts
 
-class HillClimbingSolver:
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def clear(self):
+        """
+        Quên mọi trạng thái đã nhớ (khi bắt đầu một lượt leo mới).
+        """
+        self._order.clear()
+        self._counts.clear()
+
+def _climb_worker(options: dict, seed: int, state_args: tuple, use_bitboard: bool, shared: SharedClimbState,
+                  cancel_token: CancellationToken, results):
+    """
+    Chạy một bộ giải leo đồi với hạt giống riêng trong tiến trình con và gửi kết quả về tiến trình chính.
+
+    Arguments:
+        options (dict): Tham số khởi tạo HillClimbingSolver.
+        seed (int): Hạt giống ngẫu nhiên của tiến trình.
+        state_args (tuple): (maze, player_pos, boxes, targets) của trạng thái ban đầu.
+        use_bitboard (bool): Dựng lại trạng thái dạng BitboardState thay cho SokobanState.
+        shared (SharedClimbState): Trạng thái tốt nhất dùng chung.
+        cancel_token (CancellationToken): Cờ hủy dùng chung giữa các tiến trình.
+        results (multiprocessing.Queue): Hàng đợi gửi (hạt giống, lời giải, số vòng lặp, bộ nhớ đỉnh (MB)) về tiến
+            trình chính.
+    """
+    maze, player_pos, boxes, targets = state_args
+    if use_bitboard:
+        initial_state = BitboardState.from_tuples(maze, player_pos, boxes, targets)
+    else:
+        initial_state = SokobanState(maze, player_pos, frozenset(boxes), frozenset(targets))
+    solver = HillClimbingSolver(seed=seed, shared=shared, cancel_token=cancel_token, **options)
+    result = solver.run(initial_state)
+    results.put((seed, result.moves, result.iterations, result.stats['peak_mb']))
+
+class HillClimbingSolver(SolverBase):
     """
     Giải quyết bài toán Sokoban sử dụng thuật toán leo đồi (Hill Climbing).
 
@@ -16,48 +196,91 @@ class HillClimbingSolver:
     Attributes:
         max_iterations (int): Số lần lặp tối đa để tìm kiếm lời giải.
         max_sideways (int): Số lần di chuyển ngang (không cải thiện) được phép.
-        csv_file (str): Đường dẫn file CSV để ghi kết quả thực thi.
+        csv_file (Optional[str]): Tệp kết quả (CSV hoặc JSON Lines, xem ResultsSink), None nếu không ghi.
+        distance (str): Thước đo khoảng cách hộp - mục tiêu của hàm đánh giá: 'manhattan' hoặc 'push'
+            (số cú đẩy thực sự theo bảng LevelIndex.push_distances).
+        pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc; nước đi dẫn tới trạng thái bế tắc bị loại khỏi hàng xóm.
+        restart_policy (str): Chính sách khởi động lại ('none', 'luby' hoặc 'geometric', xem restart_budgets).
+        restart_unit (int): Số vòng lặp cơ sở của một lượt leo.
+        restart_factor (float): Hệ số tăng của chính sách 'geometric'.
+        elite_probability (float): Xác suất một lượt leo mới bắt đầu (sau khi đi ngẫu nhiên) từ trạng thái
+            tốt nhất đã biết thay vì từ trạng thái ban đầu.
+        seed (Optional[int]): Hạt giống của bộ sinh số ngẫu nhiên, để kết quả lặp lại được.
+        shared (Optional[SharedClimbState]): Trạng thái tốt nhất dùng chung giữa các tiến trình (xem solve_parallel).
+        tabu_size (int): Số trạng thái gần nhất bị cấm quay lại (TabuList); 0 để tắt.
+        score_stats (dict): Số lần chấm điểm của lần giải gần nhất: tính lại toàn bộ ('full'), sửa theo hộp vừa
+            bị đẩy ('incremental') và dùng lại điểm của trạng thái cha khi chỉ người chơi di chuyển ('reused').
+        limits (SearchLimits): Thời hạn và cờ hủy, được kiểm tra định kỳ trong vòng lặp tìm kiếm.
+        memory (MemoryMonitor): Đo mức tăng bộ nhớ đỉnh của mỗi lần giải (stats['peak_mb'] của kết quả).
+        profile (bool): Đo số lần gọi và thời gian của từng pha tìm kiếm (stats['profile'] của kết quả).
+        profiler (Optional[PhaseProfiler]): Bộ đo của lần giải gần nhất, None nếu không bật profile.
+        result (Optional[SolveResult]): Kết quả có cấu trúc của lần giải gần nhất.
     """
-    def __init__(self, max_iterations: int = 1000, max_sideways: int = 100, csv_file: str = 'results.csv'):
+    def __init__(self, max_iterations: int = 10000, max_sideways: int = 100, csv_file: Optional[str] = 'results_v2.csv',
+                 distance: str = 'manhattan', pruners: Sequence[DeadlockPruner] = (),
+                 deadline: Optional[float] = None, cancel_token: Optional[CancellationToken] = None,
+                 restart_policy: str = 'luby', restart_unit: int = 50, restart_factor: float = 1.5,
+                 elite_probability: float = 0.5, seed: Optional[int] = None,
+                 shared: Optional[SharedClimbState] = None, tabu_size: int = 1000, memory: str = 'rss',
+                 profile: bool = False):
         """
         Khởi tạo bộ giải Hill Climbing.
 
         Arguments:
-            max_iterations (int): Số lần lặp tối đa. Mặc định là 1000.
+            max_iterations (int): Số lần lặp tối đa. Mặc định là 10000.
             max_sideways (int): Số lần di chuyển ngang được phép. Mặc định là 100.
-            csv_file (str): Đường dẫn file CSV ghi kết quả. Mặc định là 'results.csv'.
+            csv_file (Optional[str]): Tệp kết quả (.csv hoặc .jsonl), None để không ghi. Mặc định là 'results_v2.csv'.
+            distance (str): Thước đo khoảng cách ('manhattan' hoặc 'push'). Mặc định là 'manhattan'.
+            pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc. Mặc định là rỗng.
+            deadline (Optional[float]): Thời điểm phải dừng (theo time.time()). Mặc định là None (không giới hạn).
+            cancel_token (Optional[CancellationToken]): Cờ hủy tìm kiếm. Mặc định là None.
+            restart_policy (str): Chính sách khởi động lại. Mặc định là 'luby'.
+            restart_unit (int): Số vòng lặp cơ sở của một lượt leo. Mặc định là 50.
+            restart_factor (float): Hệ số tăng của chính sách 'geometric'. Mặc định là 1.5.
+            elite_probability (float): Xác suất bắt đầu lượt leo từ trạng thái tốt nhất. Mặc định là 0.5.
+            seed (Optional[int]): Hạt giống ngẫu nhiên. Mặc định là None (không cố định).
+            shared (Optional[SharedClimbState]): Trạng thái tốt nhất dùng chung. Mặc định là None.
+            tabu_size (int): Kích thước bộ nhớ tabu. Mặc định là 1000.
+            memory (str): Cách đo bộ nhớ đỉnh ('rss', 'tracemalloc' hoặc 'off'). Mặc định là 'rss'.
+            profile (bool): Đo từng pha tìm kiếm (xem PhaseProfiler). Mặc định là False.
         """
         self.max_iterations = max_iterations
         self.max_sideways = max_sideways
         self.csv_file = csv_file
-        self._initialize_csv()  # Khởi tạo file CSV khi tạo đối tượng
-
-    def _initialize_csv(self):
-        """
-        Khởi tạo file CSV với các tiêu đề cột, đảm bảo không ghi đè dữ liệu hiện có.
-        """
-        try:
-            # Mở file ở chế độ thêm, không ghi đè
-            with open(self.csv_file, mode='a', newline='') as file:
-                if file.tell() == 0:  # Kiểm tra nếu file trống
-                    writer = csv.writer(file)
-                    # Tiêu đề cột được căn chỉnh để dễ đọc
-                    writer.writerow([f"{'Algorithm':<15}"   # Tên thuật toán
-                                     f"{'Storage (MB)':>10}"  # Bộ nhớ sử dụng
-                                     f"{'States Visited':>15}"  # Số trạng thái đã duyệt
-                                     f"{'Time (s)':>10}"])  # Thời gian thực thi
-        except FileNotFoundError:
-            # Nếu file không tồn tại, tạo mới và ghi tiêu đề
-            with open(self.csv_file, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([f"{'Algorithm':<15}"
-                                 f"{'Storage (MB)':>10}"
-                                 f"{'States Visited':>15}"
-                                 f"{'Time (s)':>10}"])
+        self.distance = distance
+        self.pruners = list(pruners)
+        self.deadline = deadline
+        self.restart_policy = restart_policy
+        self.restart_unit = restart_unit
+        self.restart_factor = restart_factor
+        self.elite_probability = elite_probability
+        self.seed = seed
+        self.shared = shared
+        self.tabu_size = tabu_size
+        self.rng = random.Random(seed)
+        self.score_stats = {'full': 0, 'incremental': 0, 'reused': 0}
+        self.limits = SearchLimits(deadline, cancel_token)
+        self.memory = MemoryMonitor(memory)
+        self.profile = profile
+        self.profiler: Optional[PhaseProfiler] = None
+        self._phases = None  # Hàm các pha dùng trong score_neighbors khi bật profile
+        self.result: Optional[SolveResult] = None
+        self.results = ResultsSink.shared(csv_file) if csv_file else None  # Tệp kết quả dùng chung
 
     def solve(self, initial_state: SokobanState) -> Optional[List[Tuple[int, int]]]:
         """
-        Giải quyết bài toán Sokoban bằng thuật toán leo đồi.
+        Giải quyết bài toán Sokoban bằng thuật toán leo đồi có khởi động lại.
+
+        Tìm kiếm gồm nhiều lượt leo; số vòng lặp của mỗi lượt theo chính sách restart_policy. Một lượt kết thúc
+        khi hết số vòng lặp của lượt, khi bị kẹt (không có hàng xóm tốt hơn hay bằng ngoài danh sách tabu) hoặc
+        sau hơn max_sideways nước đi ngang liên tiếp. Lượt mới bắt đầu từ trạng thái ban đầu hoặc (với xác suất
+        elite_probability) từ trạng thái tốt nhất đã biết, kể cả trạng thái do tiến trình khác chia sẻ qua
+        shared, sau một đoạn đi ngẫu nhiên. Đường đi tới điểm xuất phát được giữ lại, nên lời giải luôn bắt đầu
+        từ trạng thái ban đầu.
+
+        Các trạng thái vừa đi qua trong lượt leo hiện tại nằm trong bộ nhớ tabu và không được chọn lại, trừ khi
+        tốt hơn trạng thái tốt nhất đã biết; bộ nhớ tabu được xóa khi bắt đầu lượt leo mới. Khi đường đi quay lại
+        một trạng thái đã đi qua trong lượt leo hiện tại, vòng lặp bị cắt khỏi path.
 
         Arguments:
             initial_state (SokobanState): Trạng thái ban đầu của bản đồ Sokoban.
@@ -66,60 +289,295 @@ class HillClimbingSolver:
             Optional[List[Tuple[int, int]]]: Danh sách các nước đi để giải bài toán, 
             hoặc None nếu không tìm được lời giải.
         """
-        
+        rng = self.rng
+        self.score_stats = {'full': 0, 'incremental': 0, 'reused': 0}
+        # Bắt đầu tính thời gian
+        start_time = self._start('Hill Climbing', initial_state)
+        if initial_state.is_goal():
+            return self._finish(SolveResult.SOLVED, [], 0, start_time, restarts=0)
+
         # Khởi tạo trạng thái hiện tại và đánh giá điểm số ban đầu
         current_state = initial_state
         current_score = self.evaluate_state(current_state)
         path = []
-
-        # Bắt đầu tính thời gian
-        start_time = time.time()
+        # trail[k]: giá trị băm của trạng thái sau base + k nước đi của path (base: độ dài đường đi tới điểm
+        # xuất phát của lượt leo hiện tại); positions: giá trị băm -> k
+        base = 0
+        trail = [current_state.zobrist]
+        positions = {current_state.zobrist: 0}
+        tabu = TabuList(self.tabu_size)
+        tabu.add(current_state.zobrist)
+        # Trạng thái tốt nhất đã gặp qua mọi lượt leo, cùng đường đi tới nó
+        best_state, best_score, best_path = current_state, current_score, []
+        budgets = restart_budgets(self.restart_policy, self.restart_unit, self.restart_factor)
+        climb_left = next(budgets)
+        sideways = 0  # Số nước đi ngang liên tiếp
+        restarts = 0
+        compressed = 0  # Số nước đi bị cắt khỏi path do đi vòng
+        status = SolveResult.NODE_LIMIT  # Lý do dừng nếu vòng lặp chạy hết max_iterations
+        # Hàm của các pha tìm kiếm; khi bật profile chúng được bọc để đếm và đo thời gian (xem PhaseProfiler)
+        is_tabu = probe(self.profiler, 'duplicates', tabu.__contains__)
+        evaluate = probe(self.profiler, 'heuristic', self.evaluate_state)
 
         # Vòng lặp chính của thuật toán leo đồi
         for iteration in range(self.max_iterations):
-            # Kiểm tra nếu trạng thái hiện tại đã đạt được trạng thái mục tiêu
-            if current_state.is_goal():
-                # Nếu là trạng thái mục tiêu, ghi kết quả và trả về các bước đi đã thực hiện
-                end_time = time.time()
-                self._log_results('Hill Climbing', iteration, current_state, start_time, end_time)
-                return path
-
-            # Lấy danh sách các trạng thái kế tiếp từ trạng thái hiện tại
-            neighbors = self.get_neighbors(current_state)
-            if not neighbors:
-                # Nếu không có hàng xóm (trạng thái kế tiếp) nào, trả về None (không có giải pháp)
-                return None
+            # Dừng sớm nếu hết thời gian hoặc bị hủy (ví dụ khi tiến trình khác đã tìm được lời giải)
+            reason = self.limits.stop_reason(iteration)
+            if reason:
+                status = reason
+                break
+            if self.profiler is not None:
+                self.profiler.count('expand')  # Mỗi vòng lặp mở rộng trạng thái hiện tại (xem PhaseProfiler)
+
+            # Lấy danh sách các trạng thái kế tiếp cùng điểm số (mỗi hàng xóm chỉ được chấm điểm một lần),
+            # bỏ các trạng thái trong bộ nhớ tabu trừ khi tốt hơn trạng thái tốt nhất đã biết
+            neighbors = [neighbor for neighbor in self.score_neighbors(current_state, current_score)
+                         if not is_tabu(neighbor[0].zobrist) or neighbor[2] > best_score]
 
             # Lọc ra các trạng thái có điểm số (evaluation score) tốt hơn trạng thái hiện tại
-            better_neighbors = [(neighbor, move) for neighbor, move in neighbors if self.evaluate_state(neighbor) > current_score]
+            better_neighbors = [neighbor for neighbor in neighbors if neighbor[2] > current_score]
 
+            best_neighbor = None
             if better_neighbors:
                 # Nếu có trạng thái nào tốt hơn, chọn ngẫu nhiên một trạng thái tốt nhất
-                best_neighbor = random.choice(better_neighbors)
-            else:
+                best_neighbor = rng.choice(better_neighbors)
+                sideways = 0
+            elif sideways < self.max_sideways:
                 # Nếu không có trạng thái nào tốt hơn, lọc các trạng thái có điểm số bằng điểm số hiện tại
-                best_neighbors = [(neighbor, move) for neighbor, move in neighbors if self.evaluate_state(neighbor) == current_score]
+                best_neighbors = [neighbor for neighbor in neighbors if neighbor[2] == current_score]
                 if best_neighbors:
                     # Nếu có trạng thái nào có điểm số bằng, chọn ngẫu nhiên một trạng thái tốt nhất
-                    best_neighbor = random.choice(best_neighbors)
+                    best_neighbor = rng.choice(best_neighbors)
+                    sideways += 1
+
+            if best_neighbor is not None:
+                # Cập nhật trạng thái hiện tại và điểm số của nó
+                current_state, move, current_score = best_neighbor
+                # Thêm nước đi vào đường đi (path); nếu quay lại trạng thái đã có trên path thì cắt vòng lặp
+                key = current_state.zobrist
+                tabu.add(key)
+                previous = positions.get(key)
+                if previous is None:
+                    path.append(move)
+                    positions[key] = len(trail)
+                    trail.append(key)
                 else:
-                    # Nếu không có hàng xóm nào, reset trạng thái về trạng thái ngẫu nhiên
-                    current_state = self.get_random_state(initial_state)
-                    current_score = self.evaluate_state(current_state)
-                    path = []
+                    compressed += len(path) + 1 - base - previous
+                    for removed in trail[previous + 1:]:
+                        del positions[removed]
+                    del trail[previous + 1:]
+                    del path[base + previous:]
+                climb_left -= 1
+                if current_state.is_goal():
+                    # Nếu là trạng thái mục tiêu, ghi kết quả và trả về các bước đi đã thực hiện
+                    return self._finish(SolveResult.SOLVED, path, iteration + 1, start_time, restarts=restarts,
+                                        compressed=compressed)
+                if current_score > best_score:
+                    best_state, best_score, best_path = current_state, current_score, list(path)
+
+            if best_neighbor is None or climb_left <= 0:
+                # Bị kẹt, đi ngang quá lâu hoặc hết lượt: chia sẻ trạng thái tốt nhất rồi bắt đầu lượt leo mới
+                if self.shared is not None:
+                    self.shared.publish(best_score, best_path)
+                current_state, path = self._restart_state(initial_state, best_state, best_score, best_path)
+                restarts += 1
+                if current_state.is_goal():
+                    # Đoạn đi ngẫu nhiên đã tới đích
+                    return self._finish(SolveResult.SOLVED, path, iteration + 1, start_time, restarts=restarts,
+                                        compressed=compressed)
+                current_score = evaluate(current_state)
+                base = len(path)
+                trail = [current_state.zobrist]
+                positions = {current_state.zobrist: 0}
+                tabu.clear()
+                tabu.add(current_state.zobrist)
+                climb_left = next(budgets)
+                sideways = 0
+
+        # Nếu không tìm được lời giải sau các vòng lặp (hoặc bị dừng sớm), ghi kết quả và trả về None
+        return self._finish(status, None, iteration, start_time, restarts=restarts, compressed=compressed,
+                            best_score=best_score)
+
+    @staticmethod
+    def compress_path(initial_state: SokobanState,
+                      path: List[Tuple[int, int]]) -> Tuple[SokobanState, List[Tuple[int, int]], List[int], Dict[int, int]]:
+        """
+        Đi lại path từ trạng thái ban đầu và cắt mọi vòng lặp (đoạn đường quay lại một trạng thái đã đi qua).
+
+        Arguments:
+            initial_state (SokobanState): Trạng thái ban đầu.
+            path (List[Tuple[int, int]]): Các nước đi từ trạng thái ban đầu.
+
+        Returns:
+            Tuple: (trạng thái cuối, đường đi đã cắt vòng lặp, giá trị băm của trạng thái sau từng nước đi
+            (phần tử đầu là trạng thái ban đầu), ánh xạ giá trị băm -> vị trí trong danh sách đó).
+        """
+        state = initial_state
+        states = [state]
+        moves = []
+        positions = {state.zobrist: 0}
+        for move in path:
+            state = state.apply_move(move)
+            previous = positions.get(state.zobrist)
+            if previous is None:
+                positions[state.zobrist] = len(states)
+                states.append(state)
+                moves.append(move)
+            else:
+                for removed in states[previous + 1:]:
+                    del positions[removed.zobrist]
+                del states[previous + 1:]
+                del moves[previous:]
+        return states[-1], moves, [state.zobrist for state in states], positions
+
+    def _restart_state(self, initial_state: SokobanState, best_state: SokobanState, best_score: float,
+                       best_path: List[Tuple[int, int]]) -> Tuple[SokobanState, List[Tuple[int, int]]]:
+        """
+        Chọn điểm xuất phát của lượt leo mới: trạng thái ban đầu, hoặc (với xác suất elite_probability) trạng
+        thái tốt nhất đã biết (của bộ giải này hay do tiến trình khác chia sẻ), rồi đi ngẫu nhiên vài bước.
+        Các vòng lặp của đoạn đi ngẫu nhiên được cắt bỏ (xem compress_path).
+
+        Arguments:
+            initial_state (SokobanState): Trạng thái ban đầu.
+            best_state (SokobanState): Trạng thái tốt nhất mà bộ giải này đã gặp.
+            best_score (float): Điểm số của best_state.
+            best_path (List[Tuple[int, int]]): Đường đi từ trạng thái ban đầu tới best_state.
+
+        Returns:
+            Tuple[SokobanState, List[Tuple[int, int]]]: Điểm xuất phát và đường đi từ trạng thái ban đầu tới nó.
+        """
+        origin, path = initial_state, []
+        if self.rng.random() < self.elite_probability:
+            origin, path = best_state, list(best_path)
+            shared = self.shared.best() if self.shared is not None else None
+            if shared is not None and shared[0] > best_score:
+                # Đi lại chuỗi nước đi được chia sẻ từ trạng thái ban đầu
+                origin, path = initial_state, shared[1]
+                for move in path:
+                    origin = origin.apply_move(move)
+        state, moves, _, _ = self.compress_path(origin, self.random_walk(origin)[1])
+        return state, path + moves
+
+    def solve_parallel(self, initial_state: SokobanState, workers: Optional[int] = None,
+                       start_method: str = 'spawn') -> Optional[List[Tuple[int, int]]]:
+        """
+        Chạy nhiều bộ giải leo đồi độc lập trong các tiến trình riêng. Tiến trình thứ i dùng hạt giống
+        seed + i (seed = 0 nếu chưa đặt) để kết quả lặp lại được. Các tiến trình chia sẻ trạng thái tốt nhất qua
+        SharedClimbState và cùng dừng ngay khi một tiến trình tới đích.
+
+        Arguments:
+            initial_state (SokobanState): Trạng thái ban đầu của bản đồ Sokoban.
+            workers (Optional[int]): Số tiến trình. Mặc định là số nhân CPU.
+            start_method (str): Cách tạo tiến trình của multiprocessing ('spawn', 'forkserver' hoặc 'fork').
+                Mặc định là 'spawn', như PortfolioSolver: fork một tiến trình nhiều luồng đã nạp SDL là không an toàn.
+
+        Returns:
+            Optional[List[Tuple[int, int]]]: Lời giải của tiến trình tới đích đầu tiên, hoặc None.
+        """
+        workers = workers or multiprocessing.cpu_count()
+        context = multiprocessing.get_context(start_method)
+        stop = CancellationToken(context.Event())
+        shared = SharedClimbState(context, 4 * self.max_iterations)
+        results = context.Queue()
+        options = {'max_iterations': self.max_iterations, 'max_sideways': self.max_sideways,
+                   'csv_file': None, 'distance': self.distance, 'pruners': self.pruners,
+                   'deadline': self.deadline, 'restart_policy': self.restart_policy,
+                   'restart_unit': self.restart_unit, 'restart_factor': self.restart_factor,
+                   'elite_probability': self.elite_probability, 'tabu_size': self.tabu_size,
+                   'memory': self.memory.mode}
+        state_args = (initial_state.maze, initial_state.player_pos, list(initial_state.boxes),
+                      list(initial_state.targets))
+        base_seed = self.seed or 0
+        processes = [context.Process(target=_climb_worker,
+                                     args=(options, base_seed + i, state_args, isinstance(initial_state, BitboardState),
+                                           shared, stop, results), daemon=True)
+                     for i in range(workers)]
+        start_time = time.time()
+        for process in processes:
+            process.start()
+
+        moves, winner, iterations = None, None, 0
+        finished = set()  # Chỉ số các tiến trình đã gửi kết quả hoặc đã kết thúc bất thường
+        peak_mb = 0.0  # Tổng bộ nhớ đỉnh của các tiến trình đã gửi kết quả
+        status = SolveResult.NODE_LIMIT
+        try:
+            while len(finished) < workers:
+                reason = self.limits.stop_reason(0)
+                if reason:
+                    status = reason
+                    break
+                try:
+                    seed, solution, used, peak = results.get(timeout=0.05)
+                except queue.Empty:
+                    # Tiến trình kết thúc bất thường không gửi kết quả
+                    finished.update(index for index, process in enumerate(processes)
+                                    if process.exitcode not in (None, 0))
                     continue
+                finished.add(seed - base_seed)
+                iterations += used
+                peak_mb += peak or 0.0
+                if solution is not None:
+                    moves, winner, status = solution, seed, SolveResult.SOLVED
+                    break
+        finally:
+            # Báo các tiến trình còn lại dừng và dừng hẳn chúng
+            stop.cancel()
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in processes:
+                process.join()
+
+        self.result = SolveResult(status, moves, iterations, time.time() - start_time,
+                                  {'workers': workers, 'winner_seed': winner, 'best_score': shared.score,
+                                   'peak_mb': peak_mb})
+        # Các tiến trình con không ghi tệp kết quả; lần giải song song được ghi thành một dòng
+        if self.results is not None:
+            self.results.record('Hill Climbing (parallel)', initial_state, dict(self.parameters(), workers=workers),
+                                self.result)
+        return moves
+
+    def parameters(self) -> Dict[str, object]:
+        """
+        Tham số của bộ giải, được ghi cùng mỗi dòng kết quả.
 
-            # Cập nhật trạng thái hiện tại và điểm số của nó
-            current_state = best_neighbor[0]
-            current_score = self.evaluate_state(current_state)
-            # Thêm nước đi vào đường đi (path)
-            path.append(best_neighbor[1])
+        Returns:
+            Dict[str, object]: Tên tham số -> giá trị (bộ cắt tỉa được ghi bằng tên lớp).
+        """
+        return {'max_iterations': self.max_iterations, 'max_sideways': self.max_sideways, 'distance': self.distance,
+                'pruners': [type(pruner).__name__ for pruner in self.pruners], 'restart_policy': self.restart_policy,
+                'restart_unit': self.restart_unit, 'restart_factor': self.restart_factor,
+                'elite_probability': self.elite_probability, 'seed': self.seed, 'tabu_size': self.tabu_size}
 
-        # Nếu không tìm được lời giải sau các vòng lặp, ghi kết quả và trả về None
-        end_time = time.time()
-        self._log_results('Hill Climbing', iteration, current_state, start_time, end_time)
-        return None
+    def _start(self, algorithm: str, initial_state: SokobanState) -> float:
+        """
+        Bắt đầu một lần giải (xem SolverBase._start); khi bật profile, chuẩn bị các hàm đã bọc cho score_neighbors.
 
+        Arguments:
+            algorithm (str): Tên thuật toán ghi vào tệp kết quả.
+            initial_state (SokobanState): Trạng thái ban đầu.
+
+        Returns:
+            float: Thời điểm bắt đầu (theo time.time()).
+        """
+        start_time = super()._start(algorithm, initial_state)
+        self._phases = None
+        if self.profiler is not None:
+            self._phases = (self.profiler.wrap('successors', type(initial_state).apply_move),
+                            self.profiler.wrap('deadlock', is_pruned),
+                            self.profiler.wrap('heuristic', self.evaluate_state))
+        return start_time
+
+    def _collect_stats(self, stats: Dict[str, object]):
+        """
+        Thêm số lần chấm điểm (score_stats) vào số liệu của lần giải; số nút sinh ra là số hàng xóm đã chấm điểm.
+
+        Arguments:
+            stats (Dict[str, object]): Số liệu của lần giải, được sửa tại chỗ.
+        """
+        stats.update(self.score_stats)
+        stats['generated'] = sum(self.score_stats.values())
+        self._phases = None
 
     def evaluate_state(self, state: SokobanState) -> float:
         """
@@ -129,18 +587,82 @@ class HillClimbingSolver:
             state (SokobanState): Trạng thái cần đánh giá.
 
         Returns:
-            float: Điểm số của trạng thái. Điểm càng cao, trạng thái càng gần đích.
+            float: Điểm số của trạng thái. Điểm càng cao, trạng thái càng gần đích
+            (âm vô cùng nếu có hộp không thể đẩy tới mục tiêu nào khi dùng thước đo 'push').
         """
         if state.is_goal():
             return float('inf')  # Trạng thái đích có điểm vô cùng
 
-        score = 0
-        for box in state.boxes:
-            # Tìm khoảng cách ngắn nhất từ hộp tới các mục tiêu
-            min_distance = min(abs(box[0] - target[0]) + abs(box[1] - target[1]) for target in state.targets)
-            score -= min_distance  # Điểm số giảm khi khoảng cách tới mục tiêu xa
+        self.score_stats['full'] += 1
+        # Điểm số giảm theo tổng khoảng cách từ mỗi hộp tới mục tiêu gần nhất (tra bảng theo ô)
+        level = state.level
+        terms = self.box_terms(level)
+        return -sum(terms[cell] for cell in level.cells_of(state.box_mask))
 
-        return score
+    def box_terms(self, level) -> List[float]:
+        """
+        Bảng khoảng cách từ mỗi ô tới mục tiêu gần nhất theo thước đo self.distance: khoảng cách Manhattan,
+        hoặc số cú đẩy ít nhất có tính tường ('push', vô cùng nếu không đẩy tới được mục tiêu nào).
+        Bảng được tính một lần cho mỗi bản đồ và lưu trong LevelIndex.cache.
+
+        Arguments:
+            level (LevelIndex): Chỉ mục của bản đồ.
+
+        Returns:
+            List[float]: Khoảng cách theo chỉ số ô.
+        """
+        cache = level.cache('hill_climbing_terms')
+        terms = cache.get(self.distance)
+        if terms is None:
+            if self.distance == 'push':
+                terms = [float(value) for value in level.push_distances.min(axis=1)]
+            else:
+                terms = [min(abs(x - target_x) + abs(y - target_y) for target_x, target_y in level.target_positions)
+                         for x, y in level.cells]
+            cache[self.distance] = terms
+        return terms
+
+    def score_neighbors(self, state: SokobanState,
+                        score: float) -> List[Tuple[SokobanState, Tuple[int, int], float]]:
+        """
+        Sinh các trạng thái liền kề kèm điểm số, tính tăng dần từ điểm số của trạng thái hiện tại: nước đi không
+        đẩy hộp giữ nguyên điểm số, nước đẩy hộp chỉ thay khoảng cách của hộp vừa bị đẩy.
+
+        Arguments:
+            state (SokobanState): Trạng thái hiện tại.
+            score (float): Điểm số của trạng thái hiện tại (kết quả của evaluate_state).
+
+        Returns:
+            List[Tuple[SokobanState, Tuple[int, int], float]]: Các trạng thái mới, nước đi và điểm số tương ứng.
+        """
+        level = state.level
+        terms = self.box_terms(level)
+        # Khi bật profile, sinh trạng thái, cắt tỉa và chấm điểm từ đầu được đo qua các hàm đã bọc
+        apply_move, pruned, evaluate = self._phases or (type(state).apply_move, is_pruned, self.evaluate_state)
+        neighbors = []
+        for code, move in enumerate(MOVES):
+            new_state = apply_move(state, move)
+            if new_state == state:
+                continue
+            pushed = pushed_box(state, new_state, code)
+            if pushed < 0:
+                # Chỉ người chơi di chuyển: điểm số không đổi
+                self.score_stats['reused'] += 1
+                neighbors.append((new_state, move, score))
+                continue
+            # Bỏ qua nước đẩy hộp dẫn tới trạng thái bế tắc
+            if self.pruners and pruned(self.pruners, level, new_state.player_cell, new_state.box_mask, pushed):
+                continue
+            if new_state.is_goal():
+                new_score = float('inf')
+            elif score == float('-inf'):
+                new_score = evaluate(new_state)  # Không thể sửa tăng dần từ điểm vô cùng
+            else:
+                # Hộp đi từ ô người chơi vừa bước vào sang ô pushed
+                self.score_stats['incremental'] += 1
+                new_score = score + terms[new_state.player_cell] - terms[pushed]
+            neighbors.append((new_state, move, new_score))
+        return neighbors
 
     def get_neighbors(self, state: SokobanState) -> List[Tuple[SokobanState, Tuple[int, int]]]:
         """
@@ -153,9 +675,15 @@ class HillClimbingSolver:
             List[Tuple[SokobanState, Tuple[int, int]]]: Danh sách các trạng thái mới và nước đi tương ứng.
         """
         neighbors = []
-        for move in MOVES:
+        for code, move in enumerate(MOVES):
             new_state = state.apply_move(move)
             if new_state != state:
+                # Bỏ qua nước đẩy hộp dẫn tới trạng thái bế tắc
+                if self.pruners:
+                    pushed = pushed_box(state, new_state, code)
+                    if pushed >= 0 and is_pruned(self.pruners, state.level, new_state.player_cell,
+                                                 new_state.box_mask, pushed):
+                        continue
                 neighbors.append((new_state, move))
         return neighbors
 
@@ -169,43 +697,43 @@ class HillClimbingSolver:
         Returns:
             SokobanState: Trạng thái ngẫu nhiên.
         """
-        current_state = initial_state
-        for _ in range(random.randint(1, 20)):
-            neighbors = self.get_neighbors(current_state)
-            if neighbors:
-                current_state = random.choice(neighbors)[0]
-            else:
-                break
-        return current_state
+        return self.random_walk(initial_state)[0]
 
-    def _log_results(self, algorithm: str, iteration: int, state: SokobanState, start_time: float, end_time: float):
+    def random_walk(self, initial_state: SokobanState) -> Tuple[SokobanState, List[Tuple[int, int]]]:
         """
-        Ghi kết quả giải thuật vào tệp CSV.
+        Đi ngẫu nhiên từ 1 đến 20 bước từ một trạng thái, dùng bộ sinh số ngẫu nhiên của bộ giải.
 
         Arguments:
-            algorithm (str): Tên thuật toán.
-            iteration (int): Số lần lặp.
-            state (SokobanState): Trạng thái cuối cùng của bài toán.
-            start_time (float): Thời điểm bắt đầu.
-            end_time (float): Thời điểm kết thúc.
-        """
-        # Sử dụng pympler để đo bộ nhớ của đối tượng state và các đối tượng con
-        storage_used = asizeof.asizeof(state) / (1024 * 1024)  # Chuyển sang MB
-        states_visited = iteration
-        elapsed_time = end_time - start_time
+            initial_state (SokobanState): Trạng thái xuất phát.
 
-        with open(self.csv_file, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([f"{algorithm:<15}"
-                            f"{storage_used:>10.2f}"
-                            f"{states_visited:>15}"
-                            f"{elapsed_time:>10.4f}"])
+        Returns:
+            Tuple[SokobanState, List[Tuple[int, int]]]: Trạng thái cuối và các nước đi đã thực hiện.
+        """
+        current_state = initial_state
+        moves = []
+        for _ in range(self.rng.randint(1, 20)):
+            neighbors = self.get_neighbors(current_state)
+            if neighbors:
+                current_state, move = self.rng.choice(neighbors)
+                moves.append(move)
+            else:
+                break
+        return current_state, moves
 
 
 def solve_sokoban_hillclimbing(maze: List[List[int]], 
                                player_pos: Tuple[int, int],
                                boxes: List[Tuple[int, int]], 
-                               targets: List[Tuple[int, int]]) -> Optional[List[Tuple[int, int]]]:
+                               targets: List[Tuple[int, int]],
+                               use_bitboard: bool = False,
+                               distance: str = 'manhattan',
+                               pruners: Sequence[DeadlockPruner] = (),
+                               use_patterns: bool = False,
+                               deadline: Optional[float] = None,
+                               cancel_token: Optional[CancellationToken] = None,
+                               restart_policy: str = 'luby',
+                               seed: Optional[int] = None,
+                               workers: int = 1) -> Optional[List[Tuple[int, int]]]:
     """
     Hàm chính để giải bài toán Sokoban bằng thuật toán leo đồi.
 
@@ -214,11 +742,29 @@ def solve_sokoban_hillclimbing(maze: List[List[int]],
         player_pos (Tuple[int, int]): Vị trí ban đầu của người chơi.
         boxes (List[Tuple[int, int]]): Danh sách vị trí các hộp.
         targets (List[Tuple[int, int]]): Danh sách các vị trí đích.
+        use_bitboard (bool): Dùng trạng thái dạng bitboard (BitboardState) thay cho SokobanState.
+        distance (str): Thước đo khoảng cách của hàm đánh giá: 'manhattan' hoặc 'push' (có tính tường).
+        pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc chạy sau mỗi cú đẩy hộp.
+        use_patterns (bool): Dùng (và bổ sung) cơ sở dữ liệu mẫu bế tắc lưu cùng thư mục với results_v2.csv.
+        deadline (Optional[float]): Thời điểm phải dừng tìm kiếm (theo time.time()), None nếu không giới hạn.
+        cancel_token (Optional[CancellationToken]): Cờ hủy; bộ giải tự dừng khi cờ được bật.
+        restart_policy (str): Chính sách khởi động lại: 'none', 'luby' hoặc 'geometric'.
+        seed (Optional[int]): Hạt giống ngẫu nhiên (với nhiều tiến trình, tiến trình thứ i dùng seed + i).
+        workers (int): Số tiến trình leo đồi chạy song song; 1 để chạy trong tiến trình hiện tại.
 
     Returns:
         Optional[List[Tuple[int, int]]]: Danh sách các nước đi để giải bài toán, 
         hoặc None nếu không tìm được lời giải.
     """
-    initial_state = SokobanState(tuple(tuple(row) for row in maze), player_pos, frozenset(boxes), frozenset(targets))
-    solver = HillClimbingSolver(csv_file='results.csv')
+    maze = tuple(tuple(row) for row in maze)
+    if use_bitboard:
+        initial_state = BitboardState.from_tuples(maze, player_pos, boxes, targets)
+    else:
+        initial_state = SokobanState(maze, player_pos, frozenset(boxes), frozenset(targets))
+    if use_patterns:
+        pruners = [PatternDatabase.for_results('results_v2.csv')] + list(pruners)
+    solver = HillClimbingSolver(csv_file='results_v2.csv', distance=distance, pruners=pruners, deadline=deadline,
+                                cancel_token=cancel_token, restart_policy=restart_policy, seed=seed)
+    if workers > 1:
+        return solver.solve_parallel(initial_state, workers)
     return solver.solve(initial_state)
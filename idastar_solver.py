@@ -0,0 +1,269 @@
+from array import array
+from typing import Dict, List, Tuple, Optional, Sequence
+from sokoban_common import (SokobanState, BitboardState, Assignment, DeadlockPruner, PatternDatabase,
+                            CancellationToken, SearchLimits, SolveResult, MemoryMonitor, ResultsSink, PhaseProfiler,
+                            SolverBase, is_pruned, probe)
+
+class IDAStarSolver(SolverBase):
+    """
+    Lớp giải quyết bài toán Sokoban sử dụng thuật toán IDA* (A* lặp sâu dần).
+
+    Thuật toán tìm kiếm theo chiều sâu trên các cú đẩy hộp, cắt các nhánh có f = g + h vượt ngưỡng và tăng
+    ngưỡng lên giá trị f nhỏ nhất bị cắt sau mỗi vòng. Thay cho hàng đợi ưu tiên và tập explored không giới hạn
+    của A*, các trạng thái đã gặp được nhớ trong một bảng chuyển vị (transposition table) có kích thước cố định,
+    nên bộ nhớ không tăng theo kích thước bản đồ. Lời giải tối ưu theo số cú đẩy (với heuristic chấp nhận được).
+
+    Attributes:
+        max_iterations (int): Số nút mở rộng tối đa (cộng dồn qua mọi vòng).
+        csv_file (Optional[str]): Tệp kết quả (CSV hoặc JSON Lines, xem ResultsSink), None nếu không ghi.
+        table_bits (int): Bảng chuyển vị có 2^table_bits ô.
+        distance (str): Thước đo khoảng cách hộp - mục tiêu của heuristic ('manhattan' hoặc 'push').
+        pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc chạy sau mỗi cú đẩy hộp.
+        limits (SearchLimits): Thời hạn và cờ hủy, được kiểm tra định kỳ trong vòng lặp tìm kiếm.
+        memory (MemoryMonitor): Đo mức tăng bộ nhớ đỉnh của mỗi lần giải (stats['peak_mb'] của kết quả).
+        profile (bool): Đo số lần gọi và thời gian của từng pha tìm kiếm (stats['profile'] của kết quả).
+        profiler (Optional[PhaseProfiler]): Bộ đo của lần giải gần nhất, None nếu không bật profile.
+        result (Optional[SolveResult]): Kết quả có cấu trúc của lần giải gần nhất.
+    """
+    def __init__(self, max_iterations: int = 1000000, csv_file: Optional[str] = 'results_v2.csv', table_bits: int = 20,
+                 distance: str = 'manhattan', pruners: Sequence[DeadlockPruner] = (),
+                 deadline: Optional[float] = None, cancel_token: Optional[CancellationToken] = None,
+                 memory: str = 'rss', profile: bool = False):
+        """
+        Khởi tạo bộ giải IDA* Sokoban.
+
+        Arguments:
+            max_iterations (int): Số nút mở rộng tối đa. Mặc định là 1.000.000.
+            csv_file (Optional[str]): Tệp kết quả (.csv hoặc .jsonl), None để không ghi. Mặc định là 'results_v2.csv'.
+            table_bits (int): Số bit chỉ số của bảng chuyển vị (2^20 ô, khoảng 16 MB). Mặc định là 20.
+            distance (str): Thước đo khoảng cách của heuristic ('manhattan' hoặc 'push'). Mặc định là 'manhattan'.
+            pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc. Mặc định là rỗng.
+            deadline (Optional[float]): Thời điểm phải dừng (theo time.time()). Mặc định là None (không giới hạn).
+            cancel_token (Optional[CancellationToken]): Cờ hủy tìm kiếm. Mặc định là None.
+            memory (str): Cách đo bộ nhớ đỉnh ('rss', 'tracemalloc' hoặc 'off'). Mặc định là 'rss'.
+            profile (bool): Đo từng pha tìm kiếm (xem PhaseProfiler). Mặc định là False.
+        """
+        self.max_iterations = max_iterations
+        self.csv_file = csv_file
+        self.table_bits = table_bits
+        self.distance = distance
+        self.pruners = list(pruners)
+        self.limits = SearchLimits(deadline, cancel_token)
+        self.memory = MemoryMonitor(memory)
+        self.profile = profile
+        self.profiler: Optional[PhaseProfiler] = None
+        self.result: Optional[SolveResult] = None
+        self.results = ResultsSink.shared(csv_file) if csv_file else None  # Tệp kết quả dùng chung
+
+    def solve(self, initial_state: SokobanState) -> Optional[List[Tuple[int, int]]]:
+        """
+        Giải quyết bài toán Sokoban bằng thuật toán IDA* trên các cú đẩy hộp.
+
+        Arguments:
+            initial_state (SokobanState): Trạng thái ban đầu của bản đồ Sokoban.
+
+        Returns:
+            Optional[List[Tuple[int, int]]]: Danh sách các nước đi để giải quyết bài toán,
+            hoặc None nếu không tìm thấy giải pháp.
+        """
+        level = initial_state.level
+        start_player, start_boxes = initial_state.player_cell, initial_state.box_mask
+        start_time = self._start('IDA*', initial_state)
+        if start_boxes == level.target_mask:
+            return self._finish(SolveResult.SOLVED, [], 0, start_time)
+
+        # Bảng chuyển vị kích thước cố định: giá trị Zobrist đầy đủ, độ sâu g và vòng (tuổi) ghi nhận.
+        # Một ô bị thay khi còn trống, thuộc vòng cũ, cùng trạng thái, hoặc đang giữ trạng thái sâu hơn.
+        size = 1 << self.table_bits
+        slot_mask = size - 1
+        hashes = array('Q', [0]) * size
+        depths = array('i', [0]) * size
+        ages = array('i', [0]) * size
+        table = (hashes, depths, ages)
+
+        assignment = level.matching(start_boxes, self.distance)
+        threshold = assignment.cost
+        expansions = 0
+        generated = 0  # Số nút con được sinh ra (cộng dồn qua mọi vòng)
+        age = 0
+        # Hàm của các pha tìm kiếm dùng trong _expand; khi bật profile chúng được bọc để đếm và đo thời gian
+        profiler = self.profiler
+        phases = (probe(profiler, 'expand', list.sort), probe(profiler, 'successors', level.region),
+                  probe(profiler, 'successors', level.push_successors), probe(profiler, 'duplicates', level.normalize),
+                  probe(profiler, 'heuristic', self._child_assignment), probe(profiler, 'deadlock', is_pruned))
+
+        root_key = level.box_hash(start_boxes) ^ level.zobrist_player[level.normalize(start_player, start_boxes)]
+        while threshold != float('inf'):
+            age += 1
+            slot = root_key & slot_mask
+            hashes[slot], depths[slot], ages[slot] = root_key, 0, age
+            next_threshold = float('inf')
+            # Ngăn xếp các khung: (danh sách nút con đã sắp theo f, vị trí nút con kế tiếp);
+            # pushes giữ chuỗi cú đẩy của đường đi hiện tại
+            root_children, exceeded = self._expand(level, start_boxes, start_player, level.box_hash(start_boxes),
+                                                   0, assignment, threshold, table, age, phases)
+            next_threshold = min(next_threshold, exceeded)
+            generated += len(root_children)
+            stack = [[root_children, 0]]
+            pushes = []
+            while stack:
+                frame = stack[-1]
+                children, index = frame
+                if index == len(children):
+                    stack.pop()
+                    if pushes:
+                        pushes.pop()
+                    continue
+                frame[1] = index + 1
+                _, g, box, direction, next_boxes, next_hash, key, next_assignment = children[index]
+
+                # Ghi nhận trạng thái vào bảng chuyển vị khi bắt đầu duyệt nhánh
+                slot = key & slot_mask
+                if hashes[slot] == key and ages[slot] == age and depths[slot] <= g:
+                    continue  # Đã gặp trong vòng này ở độ sâu không lớn hơn (ví dụ qua một nhánh anh em)
+                if hashes[slot] == key or ages[slot] != age or depths[slot] >= g:
+                    hashes[slot], depths[slot], ages[slot] = key, g, age
+
+                pushes.append((box, direction))
+                if next_boxes == level.target_mask:
+                    return self._finish(SolveResult.SOLVED, level.moves_for_pushes(start_player, start_boxes, pushes),
+                                        expansions, start_time, threshold=threshold, generated=generated)
+
+                expansions += 1
+                # Dừng khi hết số nút mở rộng, hết thời gian hoặc bị hủy
+                reason = self.limits.stop_reason(expansions)
+                if expansions >= self.max_iterations:
+                    reason = SolveResult.NODE_LIMIT
+                if reason:
+                    return self._finish(reason, None, expansions, start_time, threshold=threshold,
+                                        generated=generated)
+                grandchildren, exceeded = self._expand(level, next_boxes, box, next_hash, g, next_assignment,
+                                                       threshold, table, age, phases)
+                next_threshold = min(next_threshold, exceeded)
+                generated += len(grandchildren)
+                stack.append([grandchildren, 0])
+            threshold = next_threshold
+
+        # Không còn nhánh nào bị cắt: bài toán không có lời giải
+        return self._finish(SolveResult.NO_SOLUTION, None, expansions, start_time, threshold=threshold,
+                            generated=generated)
+
+    def parameters(self) -> Dict[str, object]:
+        """
+        Tham số của bộ giải, được ghi cùng mỗi dòng kết quả.
+
+        Returns:
+            Dict[str, object]: Tên tham số -> giá trị (bộ cắt tỉa được ghi bằng tên lớp).
+        """
+        return {'max_iterations': self.max_iterations, 'table_bits': self.table_bits, 'distance': self.distance,
+                'pruners': [type(pruner).__name__ for pruner in self.pruners]}
+
+    def _expand(self, level, box_mask: int, player: int, box_hash: int, g: int, assignment: Assignment,
+                threshold: float, table: tuple, age: int, phases: tuple) -> Tuple[list, float]:
+        """
+        Sinh các nút con (các cú đẩy) của một nút, bỏ các nút đã có trong bảng chuyển vị ở độ sâu không lớn hơn,
+        các nút bị bộ cắt tỉa loại và các nút có f vượt ngưỡng.
+
+        Arguments:
+            level (LevelIndex): Chỉ mục của bản đồ.
+            box_mask (int): Mặt nạ bit các ô có hộp.
+            player (int): Ô người chơi.
+            box_hash (int): Giá trị Zobrist của các hộp.
+            g (int): Số cú đẩy từ trạng thái ban đầu.
+            assignment (Assignment): Phép ghép hộp - mục tiêu của nút.
+            threshold (float): Ngưỡng f của vòng hiện tại.
+            table (tuple): Bảng chuyển vị (giá trị băm, độ sâu, tuổi).
+            age (int): Số thứ tự của vòng hiện tại.
+            phases (tuple): Hàm sắp xếp, tính vùng, sinh cú đẩy, chuẩn hóa vị trí người chơi, tính phép ghép và cắt
+                tỉa (có thể đã được bọc bởi PhaseProfiler).
+
+        Returns:
+            Tuple[list, float]: Các nút con (f, g, ô hộp, hướng, mặt nạ hộp mới, giá trị Zobrist của hộp,
+            khóa Zobrist đầy đủ, phép ghép) sắp theo f tăng dần, và giá trị f nhỏ nhất vượt ngưỡng.
+        """
+        hashes, depths, ages = table
+        order, region, push_successors, normalize, child_assignment, pruned = phases
+        slot_mask = len(hashes) - 1
+        _, reach = region(player, box_mask)
+        children = []
+        exceeded = float('inf')
+        next_g = g + 1
+        for box, direction, next_boxes in push_successors(reach, box_mask):
+            destination = level.neighbors[box][direction]
+            next_hash = box_hash ^ level.zobrist_box[box] ^ level.zobrist_box[destination]
+            key = next_hash ^ level.zobrist_player[normalize(box, next_boxes)]
+            slot = key & slot_mask
+            if hashes[slot] == key and ages[slot] == age and depths[slot] <= next_g:
+                continue
+            if self.pruners and pruned(self.pruners, level, box, next_boxes, destination):
+                continue
+            next_assignment = child_assignment(level, assignment, next_boxes, box, destination)
+            f = next_g + next_assignment.cost
+            if f > threshold:
+                exceeded = min(exceeded, f)
+                continue
+            children.append((f, next_g, box, direction, next_boxes, next_hash, key, next_assignment))
+        order(children, key=lambda child: child[0])
+        return children, exceeded
+
+    def _child_assignment(self, level, assignment: Assignment, box_mask: int, old_cell: int, new_cell: int) -> Assignment:
+        """
+        Lấy phép ghép của nút con sau một cú đẩy từ bộ nhớ đệm heuristic, hoặc sửa từ phép ghép của nút cha.
+
+        Arguments:
+            level (LevelIndex): Chỉ mục của bản đồ.
+            assignment (Assignment): Phép ghép của nút cha.
+            box_mask (int): Mặt nạ bit các ô có hộp của nút con.
+            old_cell (int): Ô cũ của hộp bị đẩy.
+            new_cell (int): Ô mới của hộp bị đẩy.
+
+        Returns:
+            Assignment: Phép ghép tối ưu của nút con.
+        """
+        key = (self.distance, box_mask)
+        next_assignment = level.heuristic_cache.get(key)
+        if next_assignment is None:
+            next_assignment = assignment.moved(old_cell, new_cell)
+            level.heuristic_cache.put(key, next_assignment)
+        return next_assignment
+
+
+def solve_sokoban_idastar(maze: List[List[int]],
+                          player_pos: Tuple[int, int],
+                          boxes: List[Tuple[int, int]],
+                          targets: List[Tuple[int, int]],
+                          use_bitboard: bool = False,
+                          distance: str = 'manhattan',
+                          pruners: Sequence[DeadlockPruner] = (),
+                          use_patterns: bool = False,
+                          deadline: Optional[float] = None,
+                          cancel_token: Optional[CancellationToken] = None) -> Optional[List[Tuple[int, int]]]:
+    """
+    Hàm giải quyết bài toán Sokoban sử dụng thuật toán IDA*.
+
+    Arguments:
+        maze (List[List[int]]): Bản đồ trò chơi, với 1 là tường, 0 là ô trống.
+        player_pos (Tuple[int, int]): Vị trí ban đầu của người chơi.
+        boxes (List[Tuple[int, int]]): Danh sách vị trí các hộp.
+        targets (List[Tuple[int, int]]): Danh sách vị trí đích của các hộp.
+        use_bitboard (bool): Dùng trạng thái dạng bitboard (BitboardState) thay cho SokobanState.
+        distance (str): Thước đo khoảng cách của heuristic: 'manhattan' hoặc 'push' (có tính tường).
+        pruners (Sequence[DeadlockPruner]): Các bộ cắt tỉa bế tắc chạy sau mỗi cú đẩy hộp.
+        use_patterns (bool): Dùng (và bổ sung) cơ sở dữ liệu mẫu bế tắc lưu cùng thư mục với results_v2.csv.
+        deadline (Optional[float]): Thời điểm phải dừng tìm kiếm (theo time.time()), None nếu không giới hạn.
+        cancel_token (Optional[CancellationToken]): Cờ hủy; bộ giải tự dừng khi cờ được bật.
+
+    Returns:
+        Optional[List[Tuple[int, int]]]: Danh sách các nước đi để giải quyết bài toán,
+        hoặc None nếu không tìm thấy giải pháp.
+    """
+    maze = tuple(tuple(row) for row in maze)
+    if use_bitboard:
+        initial_state = BitboardState.from_tuples(maze, player_pos, boxes, targets)
+    else:
+        initial_state = SokobanState(maze, player_pos, frozenset(boxes), frozenset(targets))
+    if use_patterns:
+        pruners = [PatternDatabase.for_results('results_v2.csv')] + list(pruners)
+    solver = IDAStarSolver(csv_file='results_v2.csv', distance=distance, pruners=pruners, deadline=deadline,
+                           cancel_token=cancel_token)
+    return solver.solve(initial_state)
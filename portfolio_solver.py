@@ -0,0 +1,215 @@
+import time
+import multiprocessing
+import queue
+from typing import Dict, Iterator, List, Tuple, Optional, Sequence
+from sokoban_common import SokobanState, BitboardState, CancellationToken, SolveResult, ResultsSink
+from astar_solver import solve_sokoban_astar, solve_sokoban_astar_anytime
+from bfs_solver import solve_sokoban_bfs
+from hill_climbing_solver import solve_sokoban_hillclimbing
+from idastar_solver import solve_sokoban_idastar
+
+# Các bộ giải của danh mục: tên -> (hàm giải dạng solve_sokoban_*, tham số thêm)
+PORTFOLIO = {
+    'astar': (solve_sokoban_astar, {}),
+    'astar_anytime': (solve_sokoban_astar_anytime, {}),
+    'bfs': (solve_sokoban_bfs, {'bidirectional': True}),
+    'hillclimbing': (solve_sokoban_hillclimbing, {}),
+    'idastar': (solve_sokoban_idastar, {'distance': 'push'}),
+}
+
+def _run_worker(name: str, maze, player_pos, boxes, targets, deadline: Optional[float], results):
+    """
+    Chạy một bộ giải của danh mục trong tiến trình con và gửi kết quả về tiến trình chính.
+
+    Mỗi lời giải được gửi dưới dạng (tên, lời giải, thời gian, đã xong). Bộ giải anytime gửi từng lời giải
+    tốt hơn ngay khi tìm được; cuối cùng luôn có một thông điệp đã xong (lời giải None). Dòng kết quả của bộ giải
+    được ghi ra tệp trước thông điệp đó, vì tiến trình con thoát mà không chạy atexit.
+
+    Arguments:
+        name (str): Tên bộ giải trong PORTFOLIO.
+        maze, player_pos, boxes, targets: Dữ liệu bản đồ như các hàm solve_sokoban_*.
+        deadline (Optional[float]): Thời điểm bộ giải phải tự dừng (theo time.time()).
+        results (multiprocessing.Queue): Hàng đợi gửi kết quả về tiến trình chính.
+    """
+    solver_func, options = PORTFOLIO[name]
+    start_time = time.time()
+    solution = solver_func(maze, player_pos, boxes, targets, deadline=deadline, **options)
+    if isinstance(solution, Iterator):
+        for improved in solution:
+            results.put((name, improved.moves, time.time() - start_time, False))
+        solution = None
+    ResultsSink.flush_all()
+    results.put((name, solution, time.time() - start_time, True))
+
+class PortfolioSolver:
+    """
+    Bộ giải danh mục: chạy song song nhiều bộ giải, mỗi bộ giải trong một tiến trình riêng (không dùng chung GIL
+    với giao diện), trên cùng một trạng thái ban đầu.
+
+    Ở chế độ mặc định, lời giải hợp lệ đầu tiên thắng và các tiến trình còn lại bị dừng ngay. Với wait_for_best,
+    bộ giải chờ tới thời hạn (hoặc tới khi mọi tiến trình kết thúc) và chọn lời giải ít nước đi nhất.
+
+    Attributes:
+        algorithms (Sequence[str]): Tên các bộ giải trong PORTFOLIO được chạy.
+        wait_for_best (bool): Chờ lời giải ngắn nhất thay vì lấy lời giải đầu tiên.
+        deadline (Optional[float]): Thời điểm phải dừng (theo time.time()), None nếu không giới hạn.
+        cancel_token (Optional[CancellationToken]): Cờ hủy; khi được bật, mọi tiến trình bị dừng.
+        start_method (str): Cách tạo tiến trình của multiprocessing ('spawn', 'forkserver' hoặc 'fork').
+        result (Optional[SolveResult]): Kết quả có cấu trúc của lần giải gần nhất.
+    """
+    poll_interval = 0.05  # Chu kỳ (giây) kiểm tra hàng đợi kết quả, thời hạn và cờ hủy
+
+    def __init__(self, algorithms: Optional[Sequence[str]] = None, wait_for_best: bool = False,
+                 deadline: Optional[float] = None, cancel_token: Optional[CancellationToken] = None,
+                 start_method: str = 'spawn'):
+        """
+        Khởi tạo bộ giải danh mục.
+
+        Arguments:
+            algorithms (Optional[Sequence[str]]): Tên các bộ giải được chạy. Mặc định là mọi bộ giải trong PORTFOLIO.
+            wait_for_best (bool): Chờ lời giải ngắn nhất tới thời hạn. Mặc định là False.
+            deadline (Optional[float]): Thời điểm phải dừng. Mặc định là None (không giới hạn).
+            cancel_token (Optional[CancellationToken]): Cờ hủy tìm kiếm. Mặc định là None.
+            start_method (str): Cách tạo tiến trình. Mặc định là 'spawn': bộ giải được gọi từ luồng giải của giao
+                diện pygame, và fork một tiến trình nhiều luồng đã nạp SDL là không an toàn.
+        """
+        self.algorithms = list(PORTFOLIO) if algorithms is None else list(algorithms)
+        self.wait_for_best = wait_for_best
+        self.deadline = deadline
+        self.cancel_token = cancel_token
+        self.start_method = start_method
+        self.result: Optional[SolveResult] = None
+
+    def solve(self, initial_state: SokobanState) -> Optional[List[Tuple[int, int]]]:
+        """
+        Giải bài toán Sokoban bằng cách chạy song song các bộ giải của danh mục.
+
+        Arguments:
+            initial_state (SokobanState): Trạng thái ban đầu của bản đồ Sokoban.
+
+        Returns:
+            Optional[List[Tuple[int, int]]]: Danh sách các nước đi để giải quyết bài toán,
+            hoặc None nếu không bộ giải nào tìm được lời giải hợp lệ.
+        """
+        context = multiprocessing.get_context(self.start_method)
+        results = context.Queue()
+        args = (initial_state.maze, initial_state.player_pos, list(initial_state.boxes), list(initial_state.targets))
+        workers = {name: context.Process(target=_run_worker, args=(name,) + args + (self.deadline, results),
+                                         daemon=True)
+                   for name in self.algorithms}
+        start_time = time.time()
+        for worker in workers.values():
+            worker.start()
+
+        best = None  # (số nước đi, tên bộ giải, lời giải)
+        solutions: Dict[str, int] = {}  # Tên bộ giải -> số nước đi của lời giải hợp lệ ngắn nhất
+        finished = set()
+        status = SolveResult.NO_SOLUTION
+        try:
+            while len(finished) < len(workers):
+                if self.cancel_token is not None and self.cancel_token.cancelled:
+                    status = SolveResult.CANCELLED
+                    break
+                if self.deadline is not None and time.time() >= self.deadline:
+                    status = SolveResult.TIMEOUT
+                    break
+                try:
+                    name, moves, elapsed, done = results.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    # Tiến trình kết thúc bất thường (ví dụ lỗi) không gửi thông điệp đã xong
+                    finished.update(name for name, worker in workers.items()
+                                    if worker.exitcode not in (None, 0))
+                    continue
+                if done:
+                    finished.add(name)
+                if moves is None or not self.is_valid_solution(initial_state, moves):
+                    continue
+                solutions[name] = min(len(moves), solutions.get(name, len(moves)))
+                if best is None or len(moves) < best[0]:
+                    best = (len(moves), name, moves)
+                if not self.wait_for_best:
+                    break
+        finally:
+            # Dừng ngay các tiến trình còn chạy
+            for worker in workers.values():
+                if worker.is_alive():
+                    worker.terminate()
+            for worker in workers.values():
+                worker.join()
+
+        stats = {'winner': best and best[1], 'solutions': solutions, 'solution_count': len(solutions),
+                 'finished': sorted(finished)}
+        if best is not None:
+            status = SolveResult.SOLVED
+        moves = best and best[2]
+        # Bản thân bộ giải danh mục không mở rộng nút nào; số bộ giải có lời giải nằm trong stats
+        self.result = SolveResult(status, moves, 0, time.time() - start_time, stats)
+        return moves
+
+    def run(self, initial_state: SokobanState) -> SolveResult:
+        """
+        Giải bài toán và trả về kết quả có cấu trúc thay vì chỉ danh sách nước đi.
+
+        Arguments:
+            initial_state (SokobanState): Trạng thái ban đầu của bản đồ Sokoban.
+
+        Returns:
+            SolveResult: Lý do kết thúc, lời giải nếu có và số liệu (bộ giải thắng, độ dài lời giải của từng
+            bộ giải, số bộ giải có lời giải, các bộ giải đã chạy xong).
+        """
+        self.solve(initial_state)
+        return self.result
+
+    @staticmethod
+    def is_valid_solution(state: SokobanState, solution: List[Tuple[int, int]]) -> bool:
+        """
+        Kiểm tra một lời giải bằng cách đi lại từng nước từ trạng thái ban đầu.
+
+        Arguments:
+            state (SokobanState): Trạng thái ban đầu.
+            solution (List[Tuple[int, int]]): Danh sách các nước đi.
+
+        Returns:
+            bool: True nếu mọi nước đi hợp lệ và trạng thái cuối là trạng thái đích.
+        """
+        for move in solution:
+            next_state = state.apply_move(move)
+            if next_state == state:
+                return False
+            state = next_state
+        return state.is_goal()
+
+def solve_sokoban_portfolio(maze: List[List[int]],
+                            player_pos: Tuple[int, int],
+                            boxes: List[Tuple[int, int]],
+                            targets: List[Tuple[int, int]],
+                            algorithms: Optional[Sequence[str]] = None,
+                            wait_for_best: bool = False,
+                            use_bitboard: bool = False,
+                            deadline: Optional[float] = None,
+                            cancel_token: Optional[CancellationToken] = None) -> Optional[List[Tuple[int, int]]]:
+    """
+    Hàm giải bài toán Sokoban bằng danh mục các bộ giải chạy song song trong nhiều tiến trình.
+
+    Arguments:
+        maze (List[List[int]]): Bản đồ trò chơi, với 1 là tường, 0 là ô trống.
+        player_pos (Tuple[int, int]): Vị trí ban đầu của người chơi.
+        boxes (List[Tuple[int, int]]): Danh sách vị trí các hộp.
+        targets (List[Tuple[int, int]]): Danh sách vị trí đích của các hộp.
+        algorithms (Optional[Sequence[str]]): Tên các bộ giải trong PORTFOLIO, None để chạy tất cả.
+        wait_for_best (bool): Chờ tới thời hạn và lấy lời giải ngắn nhất thay vì lời giải đầu tiên.
+        use_bitboard (bool): Dùng trạng thái dạng bitboard (BitboardState) thay cho SokobanState.
+        deadline (Optional[float]): Thời điểm phải dừng tìm kiếm (theo time.time()), None nếu không giới hạn.
+        cancel_token (Optional[CancellationToken]): Cờ hủy; mọi tiến trình bị dừng khi cờ được bật.
+
+    Returns:
+        Optional[List[Tuple[int, int]]]: Danh sách các nước đi để giải quyết bài toán,
+        hoặc None nếu không tìm thấy giải pháp.
+    """
+    maze = tuple(tuple(row) for row in maze)
+    if use_bitboard:
+        initial_state = BitboardState.from_tuples(maze, player_pos, boxes, targets)
+    else:
+        initial_state = SokobanState(maze, player_pos, frozenset(boxes), frozenset(targets))
+    solver = PortfolioSolver(algorithms, wait_for_best, deadline, cancel_token)
+    return solver.solve(initial_state)
@@ -1,9 +1,20 @@
-from typing import List, Tuple, Set, Dict, FrozenSet
-from dataclasses import dataclass
+from typing import List, Tuple, Set, Dict, FrozenSet, Iterable, Callable, Hashable, Optional, Sequence
+from collections import deque, OrderedDict
+from array import array
+from dataclasses import dataclass, field
+import atexit
+import csv
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
 import numpy as np
 from scipy.optimize import linear_sum_assignment
 
-MOVES = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # Left, Right, Up, Down
+MOVES = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # Left, Right, Up, Down (hướng ngược của MOVES[d] là MOVES[d ^ 1])
 
 @dataclass(frozen=True)
 class SokobanState:
@@ -17,60 +28,38 @@ class SokobanState:
         player_pos -- Vị trí của người chơi trên bản đồ.
         boxes -- Tập hợp các tọa độ của các hộp.
         targets -- Tập hợp các tọa độ của các mục tiêu.
-        _zone_map -- Bản đồ vùng để giúp phát hiện các khu vực thùng không thể di chuyển (mặc định là None).
-        _deadlock_cache -- Bộ nhớ đệm để kiểm tra các khu vực thùng không thể di chuyển (mặc định là None).
+        level -- Dữ liệu tĩnh của bản đồ (LevelIndex) dùng chung cho mọi trạng thái (mặc định là None,
+                 khi đó được lấy từ bộ nhớ đệm theo bản đồ).
+        zobrist -- Giá trị băm Zobrist 64-bit của trạng thái (mặc định là None, khi đó được tính từ đầu;
+                   apply_move cập nhật nó trong O(1)).
     """
     maze: Tuple[Tuple[int, ...], ...]
     player_pos: Tuple[int, int]
     boxes: FrozenSet[Tuple[int, int]]
     targets: FrozenSet[Tuple[int, int]]
-    _zone_map: Dict[Tuple[int, int], int] = None
-    _deadlock_cache: Dict[Tuple[int, int], bool] = None
+    level: 'LevelIndex' = field(default=None, compare=False, repr=False)
+    zobrist: int = field(default=None, compare=False, repr=False)
 
     def __post_init__(self):
         """
         Summary:
-            Khởi tạo các thuộc tính bổ sung như _zone_map và _deadlock_cache nếu chúng chưa được thiết lập.
+            Gắn chỉ mục của bản đồ nếu chưa được truyền vào. Bản đồ chỉ được tiền xử lý một lần,
+            các trạng thái sau chỉ giữ tham chiếu tới nó. Tính giá trị Zobrist nếu chưa có.
         """
-        if self._zone_map is None:
-            object.__setattr__(self, '_zone_map', self._create_zone_map())  # Tạo bản đồ vùng
-        if self._deadlock_cache is None:
-            object.__setattr__(self, '_deadlock_cache', {})  # Khởi tạo bộ nhớ đệm cho khu vực thùng không thể di chuyển
+        if self.level is None:
+            object.__setattr__(self, 'level', LevelIndex.for_maze(self.maze, self.targets))
+        if self.zobrist is None:
+            object.__setattr__(self, 'zobrist', self.level.zobrist(self.player_cell, self.box_mask))
 
-    def _create_zone_map(self) -> Dict[Tuple[int, int], int]:
-        """
-        Summary:
-            Tạo bản đồ phân vùng cho các ô trên bản đồ để hỗ trợ phát hiện các khu vực thùng không thể di chuyển.
-
-        Returns:
-            zone_map -- Bản đồ phân vùng, gán mỗi ô vào một vùng riêng.
-        """
-        zone_map = {}
-        current_zone = 0
-        for y in range(len(self.maze)):
-            for x in range(len(self.maze[0])):
-                if (x, y) not in zone_map and self.maze[y][x] != 1:
-                    self._flood_fill(x, y, current_zone, zone_map)
-                    current_zone += 1
-        return zone_map
-
-    def _flood_fill(self, x: int, y: int, zone: int, zone_map: Dict[Tuple[int, int], int]):
-        """
-        Summary:
-            Áp dụng thuật toán tô màu (flood fill) để gán vùng cho các ô trống.
+    @property
+    def player_cell(self) -> int:
+        """Chỉ số ô (trong LevelIndex) của người chơi."""
+        return self.level.cell_index[self.player_pos]
 
-        Arguments:
-            x, y -- Tọa độ hiện tại.
-            zone -- Mã vùng hiện tại.
-            zone_map -- Bản đồ vùng để cập nhật.
-        """
-        if not (0 <= x < len(self.maze[0]) and 0 <= y < len(self.maze)):
-            return
-        if self.maze[y][x] == 1 or (x, y) in zone_map:
-            return
-        zone_map[(x, y)] = zone
-        for dx, dy in MOVES:
-            self._flood_fill(x + dx, y + dy, zone, zone_map)
+    @property
+    def box_mask(self) -> int:
+        """Mặt nạ bit (trong LevelIndex) của các hộp."""
+        return self.level.to_mask(self.boxes)
 
     def is_goal(self) -> bool:
         """
@@ -168,27 +157,36 @@ class SokobanState:
         if not self._is_valid_move(new_x, new_y):
             return self  # Trả về trạng thái hiện tại nếu nước đi không hợp lệ
         
-        new_boxes = set(self.boxes)  # Sao chép tập hợp các hộp
+        # Cập nhật giá trị Zobrist: bỏ ô cũ của người chơi, thêm ô mới
+        level = self.level
+        new_cell = level.cell_index[(new_x, new_y)]
+        zobrist = self.zobrist ^ level.zobrist_player[level.cell_index[self.player_pos]] ^ level.zobrist_player[new_cell]
+
+        new_boxes = self.boxes
         if (new_x, new_y) in new_boxes:
             # Nếu có hộp tại vị trí mới, đẩy hộp đến vị trí mới
             box_new_x, box_new_y = new_x + move[0], new_y + move[1]
+            new_boxes = set(new_boxes)  # Sao chép tập hợp các hộp
             new_boxes.remove((new_x, new_y))
             new_boxes.add((box_new_x, box_new_y))
+            new_boxes = frozenset(new_boxes)
+            zobrist ^= level.zobrist_box[new_cell] ^ level.zobrist_box[level.cell_index[(box_new_x, box_new_y)]]
         
         # Trả về trạng thái mới sau khi di chuyển người chơi và hộp (nếu có)
         return SokobanState(
             self.maze,
             (new_x, new_y),
-            frozenset(new_boxes),
+            new_boxes,
             self.targets,
-            self._zone_map,
-            self._deadlock_cache
+            self.level,
+            zobrist
         )
 
     def _is_deadlock_position(self, x: int, y: int) -> bool:
         """
         Summary:
-            Kiểm tra xem vị trí (x, y) có phải là khu vực thùng không thể di chuyển hay không.
+            Kiểm tra xem vị trí (x, y) có phải là khu vực thùng không thể di chuyển hay không
+            (tra bảng ô bế tắc đã tính sẵn của bản đồ).
 
         Arguments:
             x, y -- Tọa độ cần kiểm tra.
@@ -196,154 +194,2374 @@ class SokobanState:
         Returns:
             bool -- True nếu là khu vực thùng không thể di chuyển, False nếu không.
         """
-        if (x, y) in self._deadlock_cache:
-            return self._deadlock_cache[(x, y)]  # Kiểm tra bộ nhớ đệm
+        return self.level.is_dead_position(x, y)
+
+    def heuristic(self, distance: str = 'manhattan') -> float:
+        """
+        Summary:
+            Tính toán chi phí heuristic cho trạng thái hiện tại, bao gồm khoảng cách Manhattan từ các hộp đến mục tiêu,
+            và các yếu tố khu vực thùng không thể di chuyển.
+
+        Arguments:
+            distance -- Thước đo khoảng cách hộp - mục tiêu: 'manhattan' (mặc định) hoặc 'push'
+                (số cú đẩy thực sự, có tính tường; vô cùng nếu không thể đẩy tới mục tiêu).
+
+        Returns:
+            float -- Chi phí heuristic của trạng thái hiện tại.
+        """
+        if self.is_goal():
+            return 0  # Nếu đã đạt được trạng thái mục tiêu, chi phí heuristic bằng 0
+        
+        # Tính toán tổng chi phí dựa trên phép ghép tối ưu giữa các hộp và mục tiêu
+        # (lấy từ bộ nhớ đệm heuristic của bản đồ nếu cấu hình hộp đã gặp)
+        boxes = list(self.boxes)
+        total_cost = self.level.matching(self.box_mask, distance).cost
+
+        # Tính khoảng cách từ người chơi đến hộp chưa khớp
+        min_dist_to_unmatched_box = min(
+            abs(self.player_pos[0] - box[0]) + abs(self.player_pos[1] - box[1])
+            for box in boxes
+        )
+
+        return total_cost + min_dist_to_unmatched_box  # Trả về chi phí heuristic tổng cộng
+
+
+    def key(self) -> Tuple[Tuple[int, int], FrozenSet[Tuple[int, int]]]:
+        """
+        Summary:
+            Trả về khóa gọn (vị trí người chơi, các hộp) dùng cho tập trạng thái đã thăm.
+
+        Returns:
+            Tuple -- Khóa có thể băm của trạng thái.
+        """
+        return (self.player_pos, self.boxes)
+
+    def __hash__(self) -> int:
+        return self.zobrist
+
+    def __eq__(self, other: 'SokobanState') -> bool:
+        return (self.player_pos == other.player_pos and 
+                self.boxes == other.boxes)
+
+
+class LevelIndex:
+    """
+    Summary:
+        Dữ liệu tĩnh của một bản đồ, được tính một lần và dùng chung cho mọi trạng thái của bản đồ đó:
+        mặt nạ tường, đánh số các ô không phải tường, bảng ô kề, mã vùng, tập mục tiêu và bảng ô bế tắc
+        (tính bằng phân tích kéo ngược từ các mục tiêu).
+        Mọi phép tính đều dùng vòng lặp (không đệ quy) nên không bị giới hạn độ sâu đệ quy trên bản đồ lớn.
+
+    Arguments:
+        maze -- Bản đồ trò chơi dưới dạng ma trận 2D (0: trống, 1: tường).
+        targets -- Tập hợp các tọa độ của các mục tiêu.
+    """
+    _cache: Dict[Tuple[Tuple[Tuple[int, ...], ...], FrozenSet[Tuple[int, int]]], 'LevelIndex'] = {}
+    _cache_limit = 64
+    region_cache_limit = 100000  # Số vùng người chơi tối đa được nhớ cho mỗi bản đồ
+    heuristic_cache_limit = 100000  # Số cấu hình hộp tối đa trong bộ nhớ đệm heuristic của mỗi bản đồ
+    zobrist_seed = 20240607  # Hạt giống cố định để giá trị băm giống nhau giữa các lần chạy
+    unreachable_cost = 10 ** 6  # Chi phí thay cho khoảng cách vô cùng trong phép ghép (lớn hơn mọi tổng hữu hạn)
+
+    def __init__(self, maze: Tuple[Tuple[int, ...], ...], targets: Iterable[Tuple[int, int]]):
+        self.maze = maze
+        self.height = len(maze)
+        self.width = max((len(row) for row in maze), default=0)
+        self.targets = frozenset(targets)
 
-        # Kiểm tra các loại khu vực thùng không thể di chuyển
-        is_deadlock = (self._is_corner_deadlock(x, y) or 
-                    self._is_line_deadlock(x, y) or 
-                    self._is_zone_deadlock(x, y))
+        # Mặt nạ tường trên toàn lưới (bit y * width + x), ô ngoài hàng ngắn được coi là tường
+        self.wall_mask = 0
+        self.cells: List[Tuple[int, int]] = []  # Chỉ số ô -> tọa độ (x, y)
+        self.cell_index: Dict[Tuple[int, int], int] = {}  # Tọa độ (x, y) -> chỉ số ô
+        for y in range(self.height):
+            row = maze[y]
+            for x in range(self.width):
+                if x >= len(row) or row[x] == 1:
+                    self.wall_mask |= 1 << (y * self.width + x)
+                else:
+                    self.cell_index[(x, y)] = len(self.cells)
+                    self.cells.append((x, y))
 
-        self._deadlock_cache[(x, y)] = is_deadlock  # Lưu kết quả vào bộ nhớ đệm
-        return is_deadlock
+        # Bit của từng ô trên lưới có thêm một cột đệm (stride = width + 1) để phép dịch bit không tràn sang hàng khác
+        self.stride = self.width + 1
+        self.grid_bits: List[int] = [1 << (y * self.stride + x) for x, y in self.cells]
+        self.grid_cells: Dict[int, int] = {bit.bit_length() - 1: i for i, bit in enumerate(self.grid_bits)}
+        self.floor_grid = sum(self.grid_bits)
 
-    def _is_corner_deadlock(self, x: int, y: int) -> bool:
+        # neighbors[i][d]: chỉ số ô kề theo hướng MOVES[d], -1 nếu là tường hoặc ngoài bản đồ
+        self.neighbors: List[Tuple[int, ...]] = [
+            tuple(self.cell_index.get((x + dx, y + dy), -1) for dx, dy in MOVES)
+            for x, y in self.cells
+        ]
+        self.target_mask = self.to_mask(self.targets)
+        self.target_cells: List[int] = self.cells_of(self.target_mask)
+        self.target_positions: List[Tuple[int, int]] = [self.cells[t] for t in self.target_cells]
+
+        self.zones: List[int] = self._compute_zones()
+        self.dead: List[bool] = self._compute_dead_cells()
+        self.dead_mask = 0
+        for i, dead in enumerate(self.dead):
+            if dead:
+                self.dead_mask |= 1 << i
+        self._cost_rows: Dict[str, Dict[int, List[float]]] = {'manhattan': {}, 'push': {}}
+        self._push_distances = None
+
+        # Bảng Zobrist: một khóa ngẫu nhiên 64-bit cho mỗi ô khi có hộp và khi có người chơi
+        rng = random.Random(self.zobrist_seed)
+        self.zobrist_box: List[int] = [rng.getrandbits(64) for _ in self.cells]
+        self.zobrist_player: List[int] = [rng.getrandbits(64) for _ in self.cells]
+        self._region_cache: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        # Phép ghép theo cấu hình hộp, dùng chung cho mọi lần giải trên bản đồ này
+        self.heuristic_cache = HeuristicCache(self.heuristic_cache_limit)
+        self._caches: Dict[str, dict] = {}
+
+    @classmethod
+    def for_maze(cls, maze: Tuple[Tuple[int, ...], ...], targets: Iterable[Tuple[int, int]]) -> 'LevelIndex':
         """
         Summary:
-            Kiểm tra xem vị trí (x, y) có phải là góc khu vực thùng không thể di chuyển hay không.
+            Lấy (hoặc tạo mới) chỉ mục của bản đồ, để mỗi bản đồ chỉ được tiền xử lý một lần.
 
         Arguments:
-            x, y -- Tọa độ cần kiểm tra.
+            maze -- Bản đồ trò chơi dưới dạng tuple 2D.
+            targets -- Tập hợp các tọa độ của các mục tiêu.
 
         Returns:
-            bool -- True nếu là góc khu vực thùng không thể di chuyển, False nếu không.
+            LevelIndex -- Chỉ mục dùng chung của bản đồ.
         """
-        if (x, y) in self.targets:  # Nếu đã là mục tiêu thì không phải bế tắc
-            return False
+        key = (maze, frozenset(targets))
+        level = cls._cache.get(key)
+        if level is None:
+            if len(cls._cache) >= cls._cache_limit:
+                cls._cache.pop(next(iter(cls._cache)))  # Bỏ bản đồ cũ nhất
+            level = cls._cache[key] = cls(maze, key[1])
+        return level
+
+    def cache(self, name: str) -> dict:
+        """
+        Summary:
+            Bộ nhớ đệm có tên gắn với bản đồ, để các thành phần khác (ví dụ các bộ cắt tỉa bế tắc)
+            ghi nhớ kết quả theo từng bản đồ mà không phải tự quản lý khóa bản đồ.
 
-        # Kiểm tra nếu có tường ở cả hai hướng ngang và dọc
-        horizontal_wall = (not self._is_within_bounds(x-1, y) or self.maze[y][x-1] == 1 or
-                        not self._is_within_bounds(x+1, y) or self.maze[y][x+1] == 1)
-        vertical_wall = (not self._is_within_bounds(x, y-1) or self.maze[y-1][x] == 1 or
-                        not self._is_within_bounds(x, y+1) or self.maze[y+1][x] == 1)
+        Arguments:
+            name -- Tên bộ nhớ đệm.
 
-        return horizontal_wall and vertical_wall  # Nếu có tường ở cả hai chiều thì bị bế tắc
+        Returns:
+            dict -- Từ điển dùng chung cho tên đó trên bản đồ này.
+        """
+        cache = self._caches.get(name)
+        if cache is None:
+            cache = self._caches[name] = {}
+        return cache
 
-    def _is_line_deadlock(self, x: int, y: int) -> bool:
+    def window_cells(self, radius: int) -> List[Tuple[int, ...]]:
         """
         Summary:
-            Kiểm tra xem vị trí (x, y) có phải là một khu vực thùng không thể di chuyển theo hướng dòng hay không.
+            Các ô trong cửa sổ (2 * radius + 1)^2 quanh từng ô, theo thứ tự hàng, tính một lần cho mỗi bản đồ.
 
         Arguments:
-            x, y -- Tọa độ cần kiểm tra.
+            radius -- Bán kính cửa sổ.
 
         Returns:
-            bool -- True nếu là khu vực thùng không thể di chuyển theo dòng, False nếu không.
+            List[Tuple[int, ...]] -- windows[i][k] là chỉ số ô ở vị trí k của cửa sổ quanh ô i, -1 nếu là tường.
         """
-        if (x, y) in self.targets:  # Nếu là mục tiêu, không phải bế tắc
-            return False
+        cache = self.cache('window_cells')
+        windows = cache.get(radius)
+        if windows is None:
+            offsets = [(dx, dy) for dy in range(-radius, radius + 1) for dx in range(-radius, radius + 1)]
+            windows = [tuple(self.cell_index.get((x + dx, y + dy), -1) for dx, dy in offsets) for x, y in self.cells]
+            cache[radius] = windows
+        return windows
 
-        # Kiểm tra khu vực thùng không thể di chuyển theo cả hai hướng ngang và dọc
-        for axis in ['horizontal', 'vertical']:
-            if self._check_line_deadlock(x, y, axis):
-                return True  # Nếu có bế tắc theo bất kỳ chiều nào, trả về True
-        
-        return False  # Nếu không có bế tắc, trả về False
+    def window_masks(self, radius: int) -> List[int]:
+        """
+        Summary:
+            Mặt nạ bit các ô trong cửa sổ quanh từng ô (xem window_cells).
+
+        Arguments:
+            radius -- Bán kính cửa sổ.
+
+        Returns:
+            List[int] -- windows[i] là mặt nạ bit các ô cách ô i không quá radius theo mỗi chiều.
+        """
+        cache = self.cache('window_masks')
+        masks = cache.get(radius)
+        if masks is None:
+            masks = [sum(1 << cell for cell in window if cell >= 0) for window in self.window_cells(radius)]
+            cache[radius] = masks
+        return masks
+
+    @property
+    def cell_count(self) -> int:
+        return len(self.cells)
 
-    def _check_line_deadlock(self, x: int, y: int, axis: str) -> bool:
+    def is_wall(self, x: int, y: int) -> bool:
         """
         Summary:
-            Kiểm tra xem có khu vực thùng không thể di chuyển trong một dòng hay không (theo hướng ngang hoặc dọc).
+            Kiểm tra ô (x, y) có phải tường hoặc nằm ngoài bản đồ hay không.
 
         Arguments:
             x, y -- Tọa độ cần kiểm tra.
-            axis -- Chọn giữa 'horizontal' hoặc 'vertical'.
 
         Returns:
-            bool -- True nếu có khu vực thùng không thể di chuyển, False nếu không.
+            bool -- True nếu là tường hoặc ngoài bản đồ.
         """
-        # Kiểm tra nếu có thể di chuyển theo chiều ngang hoặc dọc
-        if axis == 'horizontal':
-            if not self._is_within_bounds(x, y-1) or self.maze[y-1][x] != 1 or not self._is_within_bounds(x, y+1) or self.maze[y+1][x] != 1:
-                return False
-            directions = [(-1, 0), (1, 0)]  # Hướng di chuyển ngang
-        else:  # vertical
-            if not self._is_within_bounds(x-1, y) or self.maze[y][x-1] != 1 or not self._is_within_bounds(x+1, y) or self.maze[y][x+1] != 1:
-                return False
-            directions = [(0, -1), (0, 1)]  # Hướng di chuyển dọc
-
-        # Duyệt qua từng hướng để kiểm tra nếu có tường hoặc không có lối thoát
-        for dx, dy in directions:
-            blocked = True
-            cx, cy = x, y
-            while True:
-                cx, cy = cx + dx, cy + dy
-                if not self._is_within_bounds(cx, cy) or self.maze[cy][cx] == 1:  # Nếu gặp tường hoặc ra ngoài phạm vi
-                    break
-                if (cx, cy) in self.targets:  # Nếu gặp mục tiêu, không bị bế tắc
-                    blocked = False
-                    break
-            if not blocked:  # Nếu không bị chặn, không phải bế tắc
-                return False
-        return True  # Nếu gặp chướng ngại vật, trả về True
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return True
+        return bool((self.wall_mask >> (y * self.width + x)) & 1)
 
-    def _is_zone_deadlock(self, x: int, y: int) -> bool:
+    def is_dead_position(self, x: int, y: int) -> bool:
         """
         Summary:
-            Kiểm tra xem khu vực của vị trí (x, y) có phải là một khu vực thùng không thể di chuyển hay không.
+            Tra bảng ô bế tắc: hộp đặt tại (x, y) không thể đưa tới mục tiêu. Tường và ô ngoài bản đồ
+            cũng được coi là bế tắc.
 
         Arguments:
             x, y -- Tọa độ cần kiểm tra.
 
         Returns:
-            bool -- True nếu khu vực thùng không thể di chuyển, False nếu không.
+            bool -- True nếu là ô bế tắc.
+        """
+        cell = self.cell_index.get((x, y))
+        return cell is None or self.dead[cell]
+
+    def _compute_zones(self) -> List[int]:
         """
-        if (x, y) not in self._zone_map:
-            return True  # Nếu không có vùng, thì coi như bế tắc
+        Summary:
+            Gán mã vùng cho các ô không phải tường bằng BFS (thay cho flood fill đệ quy).
 
-        box_zone = self._zone_map[(x, y)]  # Lấy vùng của thùng
-        return not any(self._zone_map.get(target, -1) == box_zone for target in self.targets)  # Kiểm tra nếu có mục tiêu trong cùng vùng
+        Returns:
+            List[int] -- Mã vùng của từng ô.
+        """
+        zones = [-1] * len(self.cells)
+        current_zone = 0
+        for start in range(len(self.cells)):
+            if zones[start] != -1:
+                continue
+            zones[start] = current_zone
+            queue = deque([start])
+            while queue:
+                cell = queue.popleft()
+                for neighbor in self.neighbors[cell]:
+                    if neighbor >= 0 and zones[neighbor] == -1:
+                        zones[neighbor] = current_zone
+                        queue.append(neighbor)
+            current_zone += 1
+        return zones
 
-    def heuristic(self) -> float:
+    def _compute_dead_cells(self) -> List[bool]:
         """
         Summary:
-            Tính toán chi phí heuristic cho trạng thái hiện tại, bao gồm khoảng cách Manhattan từ các hộp đến mục tiêu,
-            và các yếu tố khu vực thùng không thể di chuyển.
+            Tìm các ô bế tắc đơn bằng cách kéo ngược một hộp ảo từ mọi mục tiêu. Một ô là "sống" nếu từ đó
+            hộp có thể được đẩy tới một mục tiêu nào đó (khi không có hộp khác cản), mọi ô còn lại là bế tắc.
+            Kết quả đầy đủ và chính xác với bế tắc đơn, chỉ tính một lần cho mỗi bản đồ.
 
         Returns:
-            float -- Chi phí heuristic của trạng thái hiện tại.
+            List[bool] -- dead[i] là True nếu hộp tại ô i không bao giờ tới được mục tiêu.
         """
-        if self.is_goal():
-            return 0  # Nếu đã đạt được trạng thái mục tiêu, chi phí heuristic bằng 0
-        
-        # Tính toán chi phí giữa các hộp và mục tiêu
-        boxes = list(self.boxes)
-        targets = list(self.targets)
-        cost_matrix = np.zeros((len(boxes), len(targets)))
+        neighbors = self.neighbors
+        live = [False] * len(self.cells)
+        queue = deque(self.target_cells)
+        for target in self.target_cells:
+            live[target] = True
+        while queue:
+            cell = queue.popleft()
+            for direction in range(len(MOVES)):
+                # Hộp ở ô cell có thể đến từ ô phía sau (ngược hướng đẩy) nếu người chơi đứng được sau nó nữa
+                back = direction ^ 1
+                previous = neighbors[cell][back]
+                if previous < 0 or live[previous]:
+                    continue
+                if neighbors[previous][back] >= 0:
+                    live[previous] = True
+                    queue.append(previous)
+        return [not alive for alive in live]
+
+    def box_hash(self, box_mask: int) -> int:
+        """
+        Summary:
+            Phần Zobrist của cấu hình hộp (XOR khóa của mọi ô có hộp).
+
+        Arguments:
+            box_mask -- Mặt nạ bit các ô có hộp.
+
+        Returns:
+            int -- Giá trị băm 64-bit.
+        """
+        value = 0
+        for box in self.cells_of(box_mask):
+            value ^= self.zobrist_box[box]
+        return value
+
+    def zobrist(self, player: int, box_mask: int) -> int:
+        """
+        Summary:
+            Giá trị Zobrist đầy đủ của trạng thái, dùng khi tạo trạng thái gốc. Các trạng thái con
+            được cập nhật tăng dần bằng phép XOR trong apply_move.
+
+        Arguments:
+            player -- Chỉ số ô của người chơi.
+            box_mask -- Mặt nạ bit các ô có hộp.
+
+        Returns:
+            int -- Giá trị băm 64-bit.
+        """
+        return self.box_hash(box_mask) ^ self.zobrist_player[player]
+
+    def to_mask(self, positions: Iterable[Tuple[int, int]]) -> int:
+        """
+        Summary:
+            Chuyển một tập tọa độ (x, y) thành mặt nạ bit trên các ô không phải tường.
+
+        Arguments:
+            positions -- Các tọa độ cần chuyển.
+
+        Returns:
+            int -- Mặt nạ bit, bit i bật nếu ô i nằm trong tập.
+        """
+        mask = 0
+        for pos in positions:
+            mask |= 1 << self.cell_index[pos]
+        return mask
+
+    def cells_of(self, mask: int) -> List[int]:
+        """
+        Summary:
+            Liệt kê chỉ số các ô có bit bật trong mặt nạ.
+
+        Arguments:
+            mask -- Mặt nạ bit.
+
+        Returns:
+            List[int] -- Danh sách chỉ số ô theo thứ tự tăng dần.
+        """
+        result = []
+        while mask:
+            low = mask & -mask
+            result.append(low.bit_length() - 1)
+            mask ^= low
+        return result
+
+    def to_positions(self, mask: int) -> FrozenSet[Tuple[int, int]]:
+        """
+        Summary:
+            Chuyển mặt nạ bit về tập tọa độ (x, y).
+
+        Arguments:
+            mask -- Mặt nạ bit.
+
+        Returns:
+            FrozenSet[Tuple[int, int]] -- Tập tọa độ tương ứng.
+        """
+        cells = self.cells
+        return frozenset(cells[i] for i in self.cells_of(mask))
+
+    def reachable(self, player: int, box_mask: int) -> int:
+        """
+        Summary:
+            Tìm vùng người chơi đi tới được (không đẩy hộp) từ ô player. Vùng được loang song song trên
+            mặt nạ bit của lưới (mỗi vòng lặp mở rộng cả biên theo bốn hướng bằng phép dịch bit).
+
+        Arguments:
+            player -- Chỉ số ô của người chơi.
+            box_mask -- Mặt nạ bit các ô có hộp.
+
+        Returns:
+            int -- Mặt nạ bit trên lưới (xem grid_bits) của các ô đi tới được.
+        """
+        grid_bits = self.grid_bits
+        free = self.floor_grid
+        for box in self.cells_of(box_mask):
+            free ^= grid_bits[box]
+        stride = self.stride
+        reach = frontier = grid_bits[player]
+        free ^= reach
+        while frontier:
+            frontier = ((frontier << 1) | (frontier >> 1) | (frontier << stride) | (frontier >> stride)) & free
+            free ^= frontier
+            reach |= frontier
+        return reach
+
+    def region(self, player: int, box_mask: int) -> Tuple[int, int]:
+        """
+        Summary:
+            Vùng người chơi đi tới được kèm ô đại diện chuẩn của vùng (ô có chỉ số nhỏ nhất).
+            Hai vị trí người chơi trong cùng một vùng (với cùng cấu hình hộp) cho cùng ô đại diện.
+            Kết quả được nhớ theo (mặt nạ hộp, ô người chơi).
+
+        Arguments:
+            player -- Chỉ số ô của người chơi.
+            box_mask -- Mặt nạ bit các ô có hộp.
+
+        Returns:
+            Tuple[int, int] -- (ô đại diện, vùng đi tới được như reachable).
+        """
+        key = (box_mask, player)
+        cached = self._region_cache.get(key)
+        if cached is None:
+            reach = self.reachable(player, box_mask)
+            # Thứ tự đánh số ô giữ nguyên thứ tự trên lưới, nên bit thấp nhất cho ô có chỉ số nhỏ nhất
+            cached = (self.grid_cells[(reach & -reach).bit_length() - 1], reach)
+            if len(self._region_cache) >= self.region_cache_limit:
+                self._region_cache.clear()
+            self._region_cache[key] = cached
+        return cached
+
+    def normalize(self, player: int, box_mask: int) -> int:
+        """
+        Summary:
+            Thay vị trí người chơi bằng ô đại diện chuẩn của vùng mà người chơi đi tới được.
+
+        Arguments:
+            player -- Chỉ số ô của người chơi.
+            box_mask -- Mặt nạ bit các ô có hộp.
+
+        Returns:
+            int -- Ô đại diện của vùng.
+        """
+        return self.region(player, box_mask)[0]
+
+    def push_successors(self, reach: int, box_mask: int) -> List[Tuple[int, int, int]]:
+        """
+        Summary:
+            Liệt kê các cú đẩy hộp hợp lệ khi người chơi ở trong vùng reach. Không đẩy hộp vào ô bế tắc.
+
+        Arguments:
+            reach -- Vùng người chơi đi tới được (kết quả của reachable).
+            box_mask -- Mặt nạ bit các ô có hộp.
+
+        Returns:
+            List[Tuple[int, int, int]] -- Các bộ (ô hộp, hướng đẩy, mặt nạ hộp mới).
+        """
+        neighbors = self.neighbors
+        dead = self.dead
+        grid_bits = self.grid_bits
+        successors = []
+        for box in self.cells_of(box_mask):
+            around = neighbors[box]
+            for direction in range(len(MOVES)):
+                stand = around[direction ^ 1]  # Người chơi phải đứng phía sau hộp
+                if stand < 0 or not reach & grid_bits[stand]:
+                    continue
+                dest = around[direction]
+                if dest < 0 or (box_mask >> dest) & 1 or dead[dest]:
+                    continue
+                successors.append((box, direction, box_mask ^ (1 << box) ^ (1 << dest)))
+        return successors
+
+    def pull_successors(self, reach: int, box_mask: int) -> List[Tuple[int, int, int]]:
+        """
+        Summary:
+            Liệt kê các cú kéo hộp hợp lệ khi người chơi ở trong vùng reach (phép ngược của cú đẩy, dùng khi
+            tìm kiếm ngược từ cấu hình đích). Kéo hộp theo hướng d: người chơi đứng ở ô kề hộp theo hướng d,
+            lùi thêm một ô theo hướng d và hộp đi theo vào ô người chơi vừa đứng.
+
+        Arguments:
+            reach -- Vùng người chơi đi tới được (kết quả của reachable).
+            box_mask -- Mặt nạ bit các ô có hộp.
+
+        Returns:
+            List[Tuple[int, int, int]] -- Các bộ (ô hộp, hướng kéo, mặt nạ hộp mới). Sau cú kéo, người chơi
+            đứng tại neighbors[neighbors[ô hộp][hướng]][hướng].
+        """
+        neighbors = self.neighbors
+        grid_bits = self.grid_bits
+        successors = []
+        for box in self.cells_of(box_mask):
+            for direction in range(len(MOVES)):
+                dest = neighbors[box][direction]  # Ô người chơi đứng trước khi kéo, cũng là ô mới của hộp
+                if dest < 0 or not reach & grid_bits[dest]:
+                    continue
+                back = neighbors[dest][direction]  # Ô người chơi lùi vào
+                if back < 0 or (box_mask >> back) & 1:
+                    continue
+                successors.append((box, direction, box_mask ^ (1 << box) ^ (1 << dest)))
+        return successors
+
+    def goal_regions(self) -> List[int]:
+        """
+        Summary:
+            Ô đại diện của từng vùng người chơi khi mọi hộp đã nằm trên mục tiêu. Mỗi vùng là một trạng thái
+            đích riêng của tìm kiếm ngược, vì cú đẩy cuối cùng có thể để người chơi ở bất kỳ vùng nào.
+
+        Returns:
+            List[int] -- Các ô đại diện, theo thứ tự tăng dần.
+        """
+        representatives = []
+        covered = 0
+        for cell in range(len(self.cells)):
+            if (self.target_mask >> cell) & 1 or covered & self.grid_bits[cell]:
+                continue
+            representative, reach = self.region(cell, self.target_mask)
+            covered |= reach
+            representatives.append(representative)
+        return representatives
+
+    def walk_path(self, start: int, goal: int, box_mask: int) -> List[Tuple[int, int]]:
+        """
+        Summary:
+            Tìm đường đi ngắn nhất (không đẩy hộp) của người chơi giữa hai ô.
+
+        Arguments:
+            start -- Ô xuất phát.
+            goal -- Ô đích.
+            box_mask -- Mặt nạ bit các ô có hộp (vật cản).
+
+        Returns:
+            List[Tuple[int, int]] -- Danh sách các nước đi, rỗng nếu start == goal.
+        """
+        parent = {start: None}
+        queue = deque([start])
+        while queue and goal not in parent:
+            cell = queue.popleft()
+            for direction, neighbor in enumerate(self.neighbors[cell]):
+                if neighbor >= 0 and neighbor not in parent and not (box_mask >> neighbor) & 1:
+                    parent[neighbor] = (cell, direction)
+                    queue.append(neighbor)
+        moves = []
+        cell = goal
+        while parent[cell] is not None:
+            cell, direction = parent[cell]
+            moves.append(MOVES[direction])
+        moves.reverse()
+        return moves
 
-        for i, box in enumerate(boxes):
-            for j, target in enumerate(targets):
-                manhattan_dist = abs(box[0] - target[0]) + abs(box[1] - target[1])  # Tính khoảng cách Manhattan
-                deadlock_penalty = 1000 if self._is_deadlock_position(box[0], box[1]) else 0  # Phạt nếu khu vực thùng không thể di chuyển
-                zone_penalty = 500 if self._zone_map.get(box) != self._zone_map.get(target) else 0  # Phạt nếu không ở trong cùng vùng
-                cost_matrix[i][j] = manhattan_dist + deadlock_penalty + zone_penalty  # Tổng chi phí
+    def moves_for_pushes(self, player: int, box_mask: int, pushes: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Summary:
+            Dựng lại danh sách nước đi đầy đủ từ chuỗi cú đẩy: chèn đường đi bộ tới sau hộp trước mỗi cú đẩy.
+
+        Arguments:
+            player -- Ô ban đầu của người chơi.
+            box_mask -- Mặt nạ bit ban đầu của các hộp.
+            pushes -- Chuỗi các cú đẩy (ô hộp, hướng đẩy).
+
+        Returns:
+            List[Tuple[int, int]] -- Danh sách các nước đi (dx, dy).
+        """
+        moves = []
+        for box, direction in pushes:
+            moves.extend(self.walk_path(player, self.neighbors[box][direction ^ 1], box_mask))
+            moves.append(MOVES[direction])
+            box_mask ^= (1 << box) | (1 << self.neighbors[box][direction])
+            player = box
+        return moves
+
+    @property
+    def push_distances(self) -> np.ndarray:
+        """
+        Summary:
+            Bảng số cú đẩy ít nhất để đưa một hộp (khi không có hộp khác cản) từ mỗi ô tới mỗi mục tiêu,
+            tính bằng BFS kéo ngược từ từng mục tiêu và chỉ tính một lần cho mỗi bản đồ.
+            Các cặp không thể đẩy tới được có giá trị vô cùng.
+
+        Returns:
+            np.ndarray -- Mảng kích thước (số ô, số mục tiêu), cột theo thứ tự self.target_cells.
+        """
+        if self._push_distances is None:
+            neighbors = self.neighbors
+            table = np.full((len(self.cells), len(self.target_cells)), np.inf)
+            for column, target in enumerate(self.target_cells):
+                distance = [-1] * len(self.cells)
+                distance[target] = 0
+                queue = deque([target])
+                while queue:
+                    cell = queue.popleft()
+                    for direction in range(len(MOVES)):
+                        # Kéo hộp từ ô cell về ô previous; người chơi cần đứng được phía sau ô previous
+                        back = direction ^ 1
+                        previous = neighbors[cell][back]
+                        if previous < 0 or distance[previous] >= 0 or neighbors[previous][back] < 0:
+                            continue
+                        distance[previous] = distance[cell] + 1
+                        queue.append(previous)
+                for cell, value in enumerate(distance):
+                    if value >= 0:
+                        table[cell, column] = value
+            self._push_distances = table
+        return self._push_distances
+
+    def box_cost_row(self, cell: int, distance: str = 'manhattan') -> List[float]:
+        """
+        Summary:
+            Chi phí heuristic từ một hộp tại ô cell tới từng mục tiêu, được tính một lần cho mỗi ô.
+            Với 'manhattan': khoảng cách Manhattan + các hình phạt; với 'push': số cú đẩy trong bảng push_distances,
+            cặp không tới được mang chi phí unreachable_cost.
 
-        # Tính toán tổng chi phí dựa trên phép ghép tối ưu
+        Arguments:
+            cell -- Chỉ số ô của hộp.
+            distance -- Thước đo khoảng cách ('manhattan' hoặc 'push').
+
+        Returns:
+            List[float] -- Chi phí tới từng mục tiêu, theo thứ tự self.target_cells.
+        """
+        rows = self._cost_rows[distance]
+        row = rows.get(cell)
+        if row is None and distance == 'push':
+            row = [int(value) if value != np.inf else self.unreachable_cost for value in self.push_distances[cell]]
+            rows[cell] = row
+        elif row is None:
+            x, y = self.cells[cell]
+            deadlock_penalty = 1000 if self.dead[cell] else 0  # Phạt nếu khu vực thùng không thể di chuyển
+            row = [abs(x - tx) + abs(y - ty) + deadlock_penalty +
+                   (500 if self.zones[cell] != self.zones[t] else 0)  # Phạt nếu không ở trong cùng vùng
+                   for t, (tx, ty) in zip(self.target_cells, self.target_positions)]
+            rows[cell] = row
+        return row
+
+    def assignment_cost(self, box_cells: List[int], distance: str = 'manhattan') -> float:
+        """
+        Summary:
+            Tổng chi phí của phép ghép tối ưu giữa các hộp và các mục tiêu.
+
+        Arguments:
+            box_cells -- Chỉ số ô của các hộp.
+            distance -- Thước đo khoảng cách ('manhattan' hoặc 'push').
+
+        Returns:
+            float -- Tổng chi phí ghép tối ưu; vô cùng nếu không có cách ghép mà mọi hộp đều tới được mục tiêu của nó.
+        """
+        cost_matrix = np.array([self.box_cost_row(cell, distance) for cell in box_cells])
         row_ind, col_ind = linear_sum_assignment(cost_matrix)
-        total_cost = cost_matrix[row_ind, col_ind].sum()
+        total = cost_matrix[row_ind, col_ind].sum()
+        return float('inf') if total >= self.unreachable_cost else total
 
-        # Tính khoảng cách từ người chơi đến hộp chưa khớp
-        min_dist_to_unmatched_box = min(
-            abs(self.player_pos[0] - box[0]) + abs(self.player_pos[1] - box[1])
-            for box in boxes
-        )
+    def matching(self, box_mask: int, distance: str = 'manhattan') -> 'Assignment':
+        """
+        Summary:
+            Phép ghép tối ưu của một cấu hình hộp, lấy từ bộ nhớ đệm heuristic hoặc giải từ đầu rồi lưu lại.
 
-        return total_cost + min_dist_to_unmatched_box  # Trả về chi phí heuristic tổng cộng
+        Arguments:
+            box_mask -- Mặt nạ bit các ô có hộp.
+            distance -- Thước đo khoảng cách ('manhattan' hoặc 'push').
 
+        Returns:
+            Assignment -- Phép ghép tối ưu của cấu hình hộp.
+        """
+        key = (distance, box_mask)
+        assignment = self.heuristic_cache.get(key)
+        if assignment is None:
+            assignment = Assignment.solve(self, self.cells_of(box_mask), distance)
+            self.heuristic_cache.put(key, assignment)
+        return assignment
 
-    def __hash__(self) -> int:
-        return hash((self.player_pos, self.boxes))
 
-    def __eq__(self, other: 'SokobanState') -> bool:
-        return (self.player_pos == other.player_pos and 
-                self.boxes == other.boxes)
+class Assignment:
+    """
+    Summary:
+        Phép ghép tối ưu giữa các hộp và các mục tiêu kèm theo các thế vị (biến đối ngẫu) của thuật toán Hungary,
+        để khi chỉ một hộp di chuyển có thể sửa lại phép ghép bằng một lần tăng luồng (O(n^2))
+        thay vì giải lại từ đầu (O(n^3)). Đối tượng không bị thay đổi sau khi tạo nên có thể dùng chung giữa các nút.
+        Yêu cầu số hộp không vượt quá số mục tiêu; khi ít hộp hơn mục tiêu, moved giải lại từ đầu.
+
+    Arguments:
+        level -- Chỉ mục của bản đồ (cung cấp các hàng chi phí box_cost_row).
+        distance -- Thước đo khoảng cách của các hàng chi phí ('manhattan' hoặc 'push').
+        boxes -- Chỉ số ô của các hộp, theo thứ tự hàng.
+        rows -- Hàng chi phí tương ứng với từng hộp.
+        u, v -- Thế vị của hàng và cột (đánh số từ 1, phần tử 0 là phụ).
+        match -- match[j] là hàng (đánh số từ 1) được ghép với cột j, 0 nếu cột còn trống.
+        cost -- Tổng chi phí của phép ghép (vô cùng nếu phải dùng một cặp hộp - mục tiêu không tới được).
+    """
+    __slots__ = ('level', 'distance', 'boxes', 'rows', 'u', 'v', 'match', 'cost')
+
+    @classmethod
+    def solve(cls, level: 'LevelIndex', box_cells: List[int], distance: str = 'manhattan') -> 'Assignment':
+        """
+        Summary:
+            Giải phép ghép tối ưu từ đầu bằng thuật toán Hungary (thêm lần lượt từng hàng).
+
+        Arguments:
+            level -- Chỉ mục của bản đồ.
+            box_cells -- Chỉ số ô của các hộp.
+            distance -- Thước đo khoảng cách ('manhattan' hoặc 'push').
+
+        Returns:
+            Assignment -- Phép ghép tối ưu.
+        """
+        assignment = cls.__new__(cls)
+        assignment.level = level
+        assignment.distance = distance
+        assignment.boxes = list(box_cells)
+        assignment.rows = [level.box_cost_row(cell, distance) for cell in box_cells]
+        columns = len(level.target_cells)
+        assignment.u = [0] * (len(box_cells) + 1)
+        assignment.v = [0] * (columns + 1)
+        assignment.match = [0] * (columns + 1)
+        for row in range(1, len(box_cells) + 1):
+            assignment._augment(row)
+        assignment._update_cost()
+        return assignment
+
+    def moved(self, old_cell: int, new_cell: int) -> 'Assignment':
+        """
+        Summary:
+            Trả về phép ghép tối ưu sau khi hộp tại old_cell chuyển sang new_cell: chỉ hàng chi phí của hộp đó
+            được thay, hàng được gỡ khỏi phép ghép rồi ghép lại bằng một lần tăng luồng. Các thế vị của
+            những hàng khác vẫn khả thi vì chi phí của chúng không đổi. Khi ít hộp hơn mục tiêu, cột vừa được gỡ
+            giữ thế vị âm trong khi các cột trống phải có thế vị 0 để phép ghép tối ưu, nên phép ghép được giải lại.
+
+        Arguments:
+            old_cell -- Ô cũ của hộp.
+            new_cell -- Ô mới của hộp.
+
+        Returns:
+            Assignment -- Phép ghép mới (đối tượng hiện tại không bị thay đổi).
+        """
+        if len(self.boxes) < len(self.v) - 1:
+            boxes = self.boxes[:]
+            boxes[boxes.index(old_cell)] = new_cell
+            return Assignment.solve(self.level, boxes, self.distance)
+        assignment = Assignment.__new__(Assignment)
+        assignment.level = self.level
+        assignment.distance = self.distance
+        assignment.boxes = self.boxes[:]
+        assignment.rows = self.rows[:]
+        assignment.u = self.u[:]
+        assignment.v = self.v[:]
+        assignment.match = match = self.match[:]
+        index = assignment.boxes.index(old_cell)
+        assignment.boxes[index] = new_cell
+        assignment.rows[index] = self.level.box_cost_row(new_cell, self.distance)
+        match[match.index(index + 1, 1)] = 0
+        assignment._augment(index + 1)
+        assignment._update_cost()
+        return assignment
+
+    def _augment(self, row: int):
+        """
+        Summary:
+            Ghép thêm hàng row (đánh số từ 1, đang chưa được ghép) theo đường tăng ngắn nhất, cập nhật thế vị.
+
+        Arguments:
+            row -- Hàng cần ghép.
+        """
+        rows, u, v, match = self.rows, self.u, self.v, self.match
+        columns = len(v) - 1
+        inf = float('inf')
+        min_reduced = [inf] * (columns + 1)
+        way = [0] * (columns + 1)
+        used = [False] * (columns + 1)
+        match[0] = row
+        column = 0
+        while True:
+            used[column] = True
+            current = match[column]
+            costs, potential = rows[current - 1], u[current]
+            delta, next_column = inf, 0
+            for j in range(1, columns + 1):
+                if not used[j]:
+                    reduced = costs[j - 1] - potential - v[j]
+                    if reduced < min_reduced[j]:
+                        min_reduced[j] = reduced
+                        way[j] = column
+                    if min_reduced[j] < delta:
+                        delta, next_column = min_reduced[j], j
+            for j in range(columns + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_reduced[j] -= delta
+            column = next_column
+            if match[column] == 0:
+                break
+        # Đảo các cạnh dọc theo đường tăng
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+        match[0] = 0
+
+    def _update_cost(self):
+        """Tính lại tổng chi phí từ phép ghép hiện tại."""
+        rows, match = self.rows, self.match
+        cost = sum(rows[match[j] - 1][j - 1] for j in range(1, len(match)) if match[j])
+        self.cost = float('inf') if cost >= self.level.unreachable_cost else cost
+
+    def player_distance(self, player: int) -> int:
+        """
+        Summary:
+            Khoảng cách Manhattan nhỏ nhất từ người chơi tới một hộp (thành phần của heuristic phụ thuộc người chơi).
+
+        Arguments:
+            player -- Chỉ số ô của người chơi.
+
+        Returns:
+            int -- Khoảng cách nhỏ nhất.
+        """
+        cells = self.level.cells
+        px, py = cells[player]
+        return min(abs(px - cells[box][0]) + abs(py - cells[box][1]) for box in self.boxes)
+
+
+@dataclass(frozen=True)
+class BitboardState:
+    """
+    Summary:
+        Biểu diễn gọn của trạng thái Sokoban: người chơi là chỉ số ô, các hộp là một số nguyên mặt nạ bit
+        trên các ô không phải tường. Dữ liệu tĩnh của bản đồ nằm trong LevelIndex dùng chung.
+        Có cùng giao diện với SokobanState nên các bộ giải dùng được trực tiếp.
+
+    Arguments:
+        level -- Chỉ mục của bản đồ.
+        player -- Chỉ số ô của người chơi.
+        box_mask -- Mặt nạ bit các ô có hộp.
+        zobrist -- Giá trị băm Zobrist 64-bit (mặc định là None, khi đó được tính từ đầu).
+    """
+    level: LevelIndex
+    player: int
+    box_mask: int
+    zobrist: int = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self):
+        """
+        Summary:
+            Tính giá trị Zobrist nếu chưa được truyền vào.
+        """
+        if self.zobrist is None:
+            object.__setattr__(self, 'zobrist', self.level.zobrist(self.player, self.box_mask))
+
+    @classmethod
+    def from_tuples(cls, maze: Tuple[Tuple[int, ...], ...], player_pos: Tuple[int, int],
+                    boxes: Iterable[Tuple[int, int]], targets: Iterable[Tuple[int, int]]) -> 'BitboardState':
+        """
+        Summary:
+            Tạo trạng thái bitboard từ dạng tuple (bản đồ, người chơi, hộp, mục tiêu).
+
+        Returns:
+            BitboardState -- Trạng thái tương ứng.
+        """
+        level = LevelIndex.for_maze(maze, targets)
+        return cls(level, level.cell_index[player_pos], level.to_mask(boxes))
+
+    @classmethod
+    def from_state(cls, state: SokobanState) -> 'BitboardState':
+        """
+        Summary:
+            Chuyển một SokobanState sang dạng bitboard.
+
+        Arguments:
+            state -- Trạng thái dạng tuple.
+
+        Returns:
+            BitboardState -- Trạng thái tương ứng.
+        """
+        return cls.from_tuples(state.maze, state.player_pos, state.boxes, state.targets)
+
+    def to_state(self) -> SokobanState:
+        """
+        Summary:
+            Chuyển ngược về SokobanState (dạng tuple) để dùng với giao diện đồ họa.
+
+        Returns:
+            SokobanState -- Trạng thái tương ứng.
+        """
+        return SokobanState(self.level.maze, self.player_pos, self.boxes, self.level.targets)
+
+    @property
+    def maze(self) -> Tuple[Tuple[int, ...], ...]:
+        return self.level.maze
+
+    @property
+    def targets(self) -> FrozenSet[Tuple[int, int]]:
+        return self.level.targets
+
+    @property
+    def player_pos(self) -> Tuple[int, int]:
+        return self.level.cells[self.player]
+
+    @property
+    def boxes(self) -> FrozenSet[Tuple[int, int]]:
+        return self.level.to_positions(self.box_mask)
+
+    @property
+    def player_cell(self) -> int:
+        return self.player
+
+    def is_goal(self) -> bool:
+        """
+        Summary:
+            Kiểm tra tất cả các hộp đã nằm trên mục tiêu.
+
+        Returns:
+            bool -- True nếu là trạng thái đích.
+        """
+        return self.box_mask == self.level.target_mask
+
+    def _move_target(self, direction: int) -> Tuple[int, int]:
+        """
+        Summary:
+            Tính ô người chơi đi tới và ô hộp bị đẩy tới (nếu có) theo hướng MOVES[direction].
+
+        Arguments:
+            direction -- Chỉ số hướng trong MOVES.
+
+        Returns:
+            Tuple[int, int] -- (ô mới của người chơi, ô mới của hộp); -1 nếu nước đi không hợp lệ,
+            ô mới của hộp là -1 nếu không đẩy hộp nào.
+        """
+        neighbors = self.level.neighbors
+        new_player = neighbors[self.player][direction]
+        if new_player < 0:
+            return -1, -1
+        if not (self.box_mask >> new_player) & 1:
+            return new_player, -1
+        new_box = neighbors[new_player][direction]
+        if (new_box < 0 or (self.box_mask >> new_box) & 1 or
+                (self.level.dead_mask >> new_box) & 1):
+            return -1, -1
+        return new_player, new_box
+
+    def get_possible_moves(self) -> List[Tuple[int, int]]:
+        """
+        Summary:
+            Lấy danh sách các nước đi hợp lệ từ trạng thái hiện tại.
+
+        Returns:
+            List[Tuple[int, int]] -- Danh sách các nước đi hợp lệ.
+        """
+        return [move for direction, move in enumerate(MOVES) if self._move_target(direction)[0] >= 0]
+
+    def apply_move(self, move: Tuple[int, int]) -> 'BitboardState':
+        """
+        Summary:
+            Áp dụng một nước đi và trả về trạng thái mới (hoặc chính nó nếu nước đi không hợp lệ).
+
+        Arguments:
+            move -- Hướng di chuyển (dx, dy).
+
+        Returns:
+            BitboardState -- Trạng thái mới.
+        """
+        new_player, new_box = self._move_target(MOVES.index(move))
+        if new_player < 0:
+            return self  # Trả về trạng thái hiện tại nếu nước đi không hợp lệ
+        level = self.level
+        box_mask = self.box_mask
+        zobrist = self.zobrist ^ level.zobrist_player[self.player] ^ level.zobrist_player[new_player]
+        if new_box >= 0:
+            box_mask ^= (1 << new_player) | (1 << new_box)  # Nhấc hộp khỏi ô cũ và đặt vào ô mới
+            zobrist ^= level.zobrist_box[new_player] ^ level.zobrist_box[new_box]
+        return BitboardState(level, new_player, box_mask, zobrist)
+
+    def heuristic(self, distance: str = 'manhattan') -> float:
+        """
+        Summary:
+            Heuristic giống SokobanState.heuristic nhưng dùng các hàng chi phí đã tính sẵn của bản đồ.
+
+        Arguments:
+            distance -- Thước đo khoảng cách hộp - mục tiêu ('manhattan' hoặc 'push').
+
+        Returns:
+            float -- Chi phí heuristic của trạng thái hiện tại.
+        """
+        if self.is_goal():
+            return 0
+        level = self.level
+        box_cells = level.cells_of(self.box_mask)
+        px, py = self.player_pos
+        min_dist_to_unmatched_box = min(abs(px - level.cells[b][0]) + abs(py - level.cells[b][1]) for b in box_cells)
+        return level.matching(self.box_mask, distance).cost + min_dist_to_unmatched_box
+
+    def key(self) -> Tuple[int, int]:
+        """
+        Summary:
+            Trả về khóa gọn (ô người chơi, mặt nạ hộp) dùng cho tập trạng thái đã thăm.
+
+        Returns:
+            Tuple[int, int] -- Khóa có thể băm của trạng thái.
+        """
+        return (self.player, self.box_mask)
+
+    def __hash__(self) -> int:
+        return self.zobrist
+
+    def __eq__(self, other: 'BitboardState') -> bool:
+        return self.player == other.player and self.box_mask == other.box_mask
+
+
+class ZobristTable:
+    """
+    Summary:
+        Tập trạng thái đã thăm (bảng chuyển vị) khóa bằng giá trị Zobrist 64-bit. Khóa đầy đủ chỉ được
+        so sánh khi hai trạng thái có cùng giá trị băm; các khóa trùng băm nhưng khác nhau được giữ riêng.
+    """
+    def __init__(self):
+        self._entries: Dict[int, Hashable] = {}
+        self._overflow: Set[Hashable] = set()
+        self.collisions = 0
+
+    def add(self, zobrist: int, key: Hashable) -> bool:
+        """
+        Summary:
+            Thêm một trạng thái vào bảng.
+
+        Arguments:
+            zobrist -- Giá trị Zobrist của trạng thái.
+            key -- Khóa đầy đủ của trạng thái (chỉ dùng khi trùng băm).
+
+        Returns:
+            bool -- True nếu trạng thái chưa có trong bảng, False nếu đã thăm.
+        """
+        stored = self._entries.get(zobrist)
+        if stored is None:
+            self._entries[zobrist] = key
+            return True
+        if stored == key or key in self._overflow:
+            return False
+        self.collisions += 1
+        self._overflow.add(key)
+        return True
+
+    def contains(self, zobrist: int, key: Hashable) -> bool:
+        """
+        Summary:
+            Kiểm tra trạng thái đã có trong bảng hay chưa.
+
+        Arguments:
+            zobrist -- Giá trị Zobrist của trạng thái.
+            key -- Khóa đầy đủ của trạng thái.
+
+        Returns:
+            bool -- True nếu đã thăm.
+        """
+        stored = self._entries.get(zobrist)
+        return stored is not None and (stored == key or key in self._overflow)
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._overflow)
+
+
+class NodePool:
+    """
+    Summary:
+        Kho nút tìm kiếm gọn: mỗi nút chỉ lưu chỉ số nút cha và mã nước đi tạo ra nó, trong hai mảng song song.
+        Đường đi chỉ được dựng lại một lần khi tìm thấy đích, thay vì sao chép danh sách nước đi cho mọi nút con.
+    """
+    def __init__(self):
+        self.parents = array('i')  # Chỉ số nút cha, -1 với nút gốc
+        self.moves = array('i')  # Mã nước đi (do bộ giải quy định), -1 với nút gốc
+
+    def add(self, parent: int, move: int) -> int:
+        """
+        Summary:
+            Thêm một nút mới.
+
+        Arguments:
+            parent -- Chỉ số nút cha (-1 với nút gốc).
+            move -- Mã nước đi tạo ra nút.
+
+        Returns:
+            int -- Chỉ số của nút mới.
+        """
+        self.parents.append(parent)
+        self.moves.append(move)
+        return len(self.parents) - 1
+
+    def path(self, node: int) -> List[int]:
+        """
+        Summary:
+            Dựng lại chuỗi mã nước đi từ nút gốc tới nút node.
+
+        Arguments:
+            node -- Chỉ số nút cuối.
+
+        Returns:
+            List[int] -- Các mã nước đi theo thứ tự từ gốc.
+        """
+        codes = []
+        parents, moves = self.parents, self.moves
+        while parents[node] >= 0:
+            codes.append(moves[node])
+            node = parents[node]
+        codes.reverse()
+        return codes
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    @property
+    def nbytes(self) -> int:
+        """Số byte bộ nhớ dùng cho hai mảng."""
+        return (len(self.parents) * self.parents.itemsize + len(self.moves) * self.moves.itemsize)
+
+
+class HeuristicCache:
+    """
+    Summary:
+        Bộ nhớ đệm có giới hạn (loại bỏ mục ít dùng gần đây nhất - LRU) ánh xạ cấu hình hộp sang phép ghép
+        hộp - mục tiêu, kèm số lần trúng, trượt và bị loại bỏ để chọn kích thước phù hợp.
+
+    Arguments:
+        capacity -- Số mục tối đa.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: 'OrderedDict[Hashable, object]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable):
+        """
+        Summary:
+            Tra cứu một mục và đánh dấu là vừa được dùng.
+
+        Arguments:
+            key -- Khóa của cấu hình hộp.
+
+        Returns:
+            Giá trị đã lưu, hoặc None nếu chưa có.
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value):
+        """
+        Summary:
+            Lưu một mục, loại bỏ mục ít dùng gần đây nhất nếu vượt quá sức chứa.
+
+        Arguments:
+            key -- Khóa của cấu hình hộp.
+            value -- Giá trị cần lưu.
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Summary:
+            Trả về các số liệu thống kê của bộ nhớ đệm.
+
+        Returns:
+            Dict[str, int] -- Số lần trúng, trượt, bị loại bỏ, số mục hiện có và sức chứa.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._entries), 'capacity': self.capacity}
+
+    def clear(self):
+        """Xóa mọi mục và đặt lại các bộ đếm."""
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CancellationToken:
+    """
+    Summary:
+        Cờ hủy dùng chung giữa nơi gọi (ví dụ luồng giao diện) và bộ giải đang chạy ở luồng khác.
+        Bộ giải chỉ đọc cờ định kỳ (xem SearchLimits) và tự dừng, trả về kết quả với trạng thái 'cancelled'.
+
+    Arguments:
+        event -- Đối tượng Event dùng làm cờ (mặc định là threading.Event mới). Truyền multiprocessing.Event
+            để hủy các bộ giải chạy ở tiến trình khác.
+    """
+    def __init__(self, event=None):
+        self._event = threading.Event() if event is None else event
+
+    def cancel(self):
+        """Yêu cầu bộ giải dừng sớm."""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """True nếu đã có yêu cầu hủy."""
+        return self._event.is_set()
+
+
+class SearchLimits:
+    """
+    Summary:
+        Các giới hạn của một lần giải ngoài số vòng lặp tối đa: thời hạn và cờ hủy. Vòng lặp chính của bộ giải
+        gọi stop_reason mỗi vòng; giới hạn chỉ thực sự được kiểm tra sau mỗi check_interval vòng.
+
+    Arguments:
+        deadline -- Thời điểm phải dừng (theo time.time()), None nếu không giới hạn.
+        cancel_token -- Cờ hủy, None nếu không thể hủy.
+    """
+    check_interval = 64
+
+    def __init__(self, deadline: Optional[float] = None, cancel_token: Optional[CancellationToken] = None):
+        self.deadline = deadline
+        self.cancel_token = cancel_token
+
+    def stop_reason(self, iteration: int) -> Optional[str]:
+        """
+        Summary:
+            Kiểm tra (định kỳ) xem bộ giải có phải dừng không.
+
+        Arguments:
+            iteration -- Số vòng lặp hoặc số nút đã mở rộng của bộ giải.
+
+        Returns:
+            Optional[str] -- SolveResult.CANCELLED hoặc SolveResult.TIMEOUT nếu phải dừng, None nếu được chạy tiếp.
+        """
+        if iteration % self.check_interval:
+            return None
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            return SolveResult.CANCELLED
+        if self.deadline is not None and time.time() >= self.deadline:
+            return SolveResult.TIMEOUT
+        return None
+
+
+
+def process_rss() -> Optional[int]:
+    """
+    Summary:
+        Đọc bộ nhớ thường trú (RSS) hiện tại của tiến trình từ /proc/self/statm (Linux).
+
+    Returns:
+        Optional[int] -- Số byte, hoặc None nếu hệ điều hành không cung cấp /proc.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * MemoryMonitor.page_size
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryMonitor:
+    """
+    Summary:
+        Đo mức tăng bộ nhớ đỉnh của một lần giải (từ start tới stop), thay cho việc duyệt toàn bộ cấu trúc
+        tìm kiếm bằng pympler. Ở chế độ 'rss', một luồng nền đọc RSS của tiến trình sau mỗi interval giây và
+        giữ giá trị lớn nhất, nên gần như không làm chậm vòng lặp tìm kiếm. Chế độ 'tracemalloc' đếm chính xác
+        mọi cấp phát của Python nhưng làm tìm kiếm chậm đi đáng kể. Nếu không đọc được RSS (ví dụ trên Windows),
+        chế độ 'rss' dùng tracemalloc.
+
+    Arguments:
+        mode -- 'rss' (mặc định), 'tracemalloc' hoặc 'off' (không đo, peak_mb là None).
+        interval -- Chu kỳ lấy mẫu RSS (giây).
+    """
+    modes = ('rss', 'tracemalloc', 'off')
+    page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def __init__(self, mode: str = 'rss', interval: float = 0.01):
+        if mode not in self.modes:
+            raise ValueError(f"Chế độ đo bộ nhớ không hợp lệ: {mode!r} (có {', '.join(self.modes)})")
+        if mode == 'rss' and process_rss() is None:
+            mode = 'tracemalloc'
+        self.mode = mode
+        self.interval = interval
+        self.peak_mb: Optional[float] = None  # Kết quả của lần đo gần nhất
+        self._running = False
+        self._baseline = self._peak = 0
+        self._started_tracing = False
+        self._stop_event: Optional[threading.Event] = None
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self):
+        """Bắt đầu đo (gọi lại start khi đang đo sẽ bắt đầu lần đo mới)."""
+        if self._running:
+            self.stop()
+        self.peak_mb = None
+        self._running = True
+        if self.mode == 'tracemalloc':
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            self._baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        elif self.mode == 'rss':
+            self._baseline = self._peak = process_rss()
+            self._stop_event = threading.Event()
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+
+    def _sample(self):
+        """Vòng lặp của luồng nền: đọc RSS sau mỗi interval giây cho tới khi stop được gọi."""
+        while not self._stop_event.wait(self.interval):
+            self._peak = max(self._peak, process_rss() or 0)
+
+    def stop(self) -> Optional[float]:
+        """
+        Summary:
+            Kết thúc lần đo. Gọi nhiều lần chỉ kết thúc một lần và trả về cùng kết quả.
+
+        Returns:
+            Optional[float] -- Mức tăng bộ nhớ đỉnh (MB) so với lúc start, None ở chế độ 'off' hoặc khi chưa start.
+        """
+        if not self._running:
+            return self.peak_mb
+        self._running = False
+        if self.mode == 'tracemalloc':
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+        elif self.mode == 'rss':
+            self._stop_event.set()
+            self._sampler.join()
+            # Mẫu cuối: các cấu trúc tìm kiếm vẫn còn sống lúc bộ giải gọi stop
+            peak = max(self._peak, process_rss() or 0)
+        else:
+            return None
+        self.peak_mb = max(peak - self._baseline, 0) / (1024 * 1024)
+        return self.peak_mb
+
+
+class PhaseProfiler:
+    """
+    Summary:
+        Bộ đếm số lần gọi và đồng hồ cộng dồn (time.perf_counter) cho từng pha của vòng lặp tìm kiếm:
+        'expand' (mở rộng nút: số lần là số nút thực sự được mở rộng, thời gian là thời gian lấy nút ra và đưa nút
+        vào danh sách mở), 'successors' (sinh trạng thái kế tiếp),
+        'duplicates' (kiểm tra trạng thái đã gặp), 'heuristic' (tính heuristic / hàm đánh giá) và
+        'deadlock' (kiểm tra và cắt tỉa bế tắc). Bộ giải lấy hàm của mỗi pha qua probe trước vòng lặp; khi không
+        bật đo, probe trả về chính hàm gốc nên vòng lặp không tốn thêm gì. Khi bật, mỗi lần gọi tốn thêm hai lần
+        đọc đồng hồ, nên tổng thời gian các pha hơi lớn hơn thời gian thực của chúng. Thao tác trên danh sách mở
+        được bọc với counted=False; bộ giải gọi count('expand') một lần cho mỗi nút thực sự được mở rộng (sau khi
+        bỏ các mục cũ hoặc trùng lặp).
+    """
+    phases = ('expand', 'successors', 'duplicates', 'heuristic', 'deadlock')
+
+    def __init__(self):
+        self.calls = dict.fromkeys(self.phases, 0)
+        self.times = dict.fromkeys(self.phases, 0.0)
+
+    def wrap(self, phase: str, func: Callable, counted: bool = True) -> Callable:
+        """
+        Summary:
+            Bọc một hàm để thời gian (và số lần gọi, nếu counted) của mỗi lần gọi được tính vào pha phase.
+
+        Arguments:
+            phase -- Tên pha (một trong phases).
+            func -- Hàm cần đo.
+            counted -- Đếm mỗi lần gọi vào số lần của pha; False khi số lần được đếm riêng bằng count.
+
+        Returns:
+            Callable -- Hàm có cùng kết quả với func.
+        """
+        calls, times, clock = self.calls, self.times, time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            result = func(*args, **kwargs)
+            times[phase] += clock() - start
+            calls[phase] += 1
+            return result
+
+        def timed_only(*args, **kwargs):
+            start = clock()
+            result = func(*args, **kwargs)
+            times[phase] += clock() - start
+            return result
+        return timed if counted else timed_only
+
+    def count(self, phase: str):
+        """
+        Summary:
+            Tăng số lần của pha phase thêm một mà không đo thời gian (ví dụ một nút được mở rộng).
+
+        Arguments:
+            phase -- Tên pha (một trong phases).
+        """
+        self.calls[phase] += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summary:
+            Số liệu đã đo, để lưu vào stats['profile'] của SolveResult.
+
+        Returns:
+            Dict[str, Dict[str, float]] -- Tên pha -> {'calls': số lần gọi, 'time': tổng thời gian (giây)}.
+        """
+        return {phase: {'calls': self.calls[phase], 'time': self.times[phase]} for phase in self.phases}
+
+
+def probe(profiler: Optional[PhaseProfiler], phase: str, func: Callable, counted: bool = True) -> Callable:
+    """
+    Summary:
+        Lấy hàm của một pha tìm kiếm: hàm gốc nếu không đo, hoặc hàm đã bọc bởi profiler.
+
+    Arguments:
+        profiler -- Bộ đo của lần giải, None nếu không bật đo.
+        phase -- Tên pha (xem PhaseProfiler.phases).
+        func -- Hàm gốc.
+        counted -- Đếm mỗi lần gọi vào số lần của pha (xem PhaseProfiler.wrap).
+
+    Returns:
+        Callable -- func, hoặc profiler.wrap(phase, func, counted).
+    """
+    return func if profiler is None else profiler.wrap(phase, func, counted)
+
+
+@dataclass
+class SolveResult:
+    """
+    Summary:
+        Kết quả có cấu trúc của một lần giải: lý do kết thúc, lời giải (nếu có) và các số liệu thu được
+        tới lúc dừng, kể cả khi bị hủy hoặc hết thời gian.
+
+    Arguments:
+        status -- Lý do kết thúc: SOLVED, NO_SOLUTION, NODE_LIMIT, TIMEOUT hoặc CANCELLED.
+        moves -- Danh sách các nước đi, None nếu không có lời giải.
+        iterations -- Số vòng lặp (hoặc nút mở rộng) đã thực hiện.
+        elapsed -- Thời gian chạy (giây).
+        stats -- Số liệu riêng của bộ giải (ví dụ số trạng thái đã thăm).
+    """
+    SOLVED = 'solved'
+    NO_SOLUTION = 'no_solution'  # Đã duyệt hết không gian tìm kiếm (hoặc thuật toán bị kẹt)
+    NODE_LIMIT = 'node_limit'  # Hết số vòng lặp tối đa
+    TIMEOUT = 'timeout'
+    CANCELLED = 'cancelled'
+
+    status: str
+    moves: Optional[List[Tuple[int, int]]] = None
+    iterations: int = 0
+    elapsed: float = 0.0
+    stats: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def solved(self) -> bool:
+        """True nếu có lời giải."""
+        return self.moves is not None
+
+
+
+def map_hash(state) -> str:
+    """
+    Summary:
+        Mã ngắn, ổn định giữa các lần chạy, của một bản đồ cùng vị trí ban đầu của người chơi và các hộp.
+
+    Arguments:
+        state -- Trạng thái ban đầu (SokobanState hoặc BitboardState).
+
+    Returns:
+        str -- 12 ký tự hex đầu của SHA-1.
+    """
+    text = '|'.join([''.join(str(cell) for cell in row) for row in state.maze] +
+                    [repr(state.player_pos), repr(sorted(state.boxes)), repr(sorted(state.targets))])
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+class ResultsSink:
+    """
+    Summary:
+        Tệp kết quả dùng chung của các bộ giải. Mỗi lần giải là một dòng với các cột thật (columns), ghi dạng CSV
+        hoặc JSON Lines (tệp có đuôi .jsonl). Các dòng được giữ trong bộ đệm và ghi theo lô batch_size dòng với
+        một lần mở tệp cho cả lô; phần còn lại được ghi khi gọi flush / flush_all hoặc khi trình thông dịch thoát.
+        Tệp CSV đã có với tiêu đề khác (ví dụ results.csv theo định dạng cột cố định cũ) không bao giờ bị ghi vào
+        hay đổi tên ngầm: ResultsSink báo lỗi ngay khi tạo, trừ khi được yêu cầu chuyển tệp cũ sang chỗ khác
+        (migrate=True, xem migrate_legacy). Các bộ giải mặc định ghi vào tệp mới results_v2.csv.
+        Tiến trình con tạo bằng fork không ghi lại các dòng của tiến trình cha còn trong bộ đệm.
+
+    Arguments:
+        path -- Đường dẫn tệp kết quả.
+        batch_size -- Số dòng tối đa trong bộ đệm trước khi ghi ra tệp.
+        migrate -- Đổi tên tệp CSV có tiêu đề khác thành <tên>.legacy.csv thay vì báo lỗi.
+    """
+    columns = ('timestamp', 'map', 'algorithm', 'status', 'parameters', 'expansions', 'generated', 'time',
+               'peak_mb', 'node_bytes', 'length')
+    _shared: Dict[str, 'ResultsSink'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: str, batch_size: int = 100, migrate: bool = False):
+        self.path = path
+        self.format = 'jsonl' if path.endswith('.jsonl') else 'csv'
+        self.batch_size = batch_size
+        if self.format == 'csv' and not self.compatible(path):
+            if not migrate:
+                raise ValueError(f"Tệp kết quả {path!r} có định dạng cột khác; hãy chọn tệp khác "
+                                 f"(mặc định là results_v2.csv) hoặc chuyển tệp cũ bằng ResultsSink.migrate_legacy")
+            self.migrate_legacy(path)
+        self._rows: List[Dict[str, object]] = []
+        self._lock = threading.Lock()  # Giao diện giải ở luồng riêng
+        self._pid = os.getpid()  # Tiến trình sở hữu bộ đệm
+
+    @classmethod
+    def shared(cls, path: str) -> 'ResultsSink':
+        """
+        Summary:
+            Lấy tệp kết quả dùng chung cho một đường dẫn, để mọi bộ giải trong tiến trình ghi qua cùng một bộ đệm.
+
+        Arguments:
+            path -- Đường dẫn tệp kết quả.
+
+        Returns:
+            ResultsSink -- Tệp kết quả của đường dẫn.
+        """
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            sink = cls._shared.get(key)
+            if sink is None:
+                sink = cls._shared[key] = cls(path)
+            return sink
+
+    @classmethod
+    def flush_all(cls):
+        """Ghi bộ đệm của mọi tệp kết quả dùng chung (gọi trước khi tiến trình con thoát bằng os._exit)."""
+        for sink in list(cls._shared.values()):
+            sink.flush()
+
+    @staticmethod
+    def row(algorithm: str, initial_state, parameters: Dict[str, object], result: 'SolveResult') -> Dict[str, object]:
+        """
+        Summary:
+            Tạo một dòng kết quả từ kết quả có cấu trúc của một lần giải.
+
+        Arguments:
+            algorithm -- Tên thuật toán (hoặc cấu hình).
+            initial_state -- Trạng thái ban đầu của lần giải.
+            parameters -- Tham số của bộ giải.
+            result -- Kết quả của lần giải.
+
+        Returns:
+            Dict[str, object] -- Dòng kết quả với các khóa trong columns.
+        """
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'map': map_hash(initial_state),
+            'algorithm': algorithm,
+            'status': result.status,
+            'parameters': parameters,
+            'expansions': result.iterations,
+            'generated': result.stats.get('generated'),
+            'time': round(result.elapsed, 6),
+            'peak_mb': None if result.stats.get('peak_mb') is None else round(result.stats['peak_mb'], 3),
+            'node_bytes': result.stats.get('node_bytes'),  # Bộ nhớ của kho nút (NodePool.nbytes) nếu bộ giải dùng
+            'length': None if result.moves is None else len(result.moves),
+        }
+
+    def record(self, algorithm: str, initial_state, parameters: Dict[str, object], result: 'SolveResult'):
+        """
+        Summary:
+            Ghi (vào bộ đệm) dòng kết quả của một lần giải, xem row.
+        """
+        self.write(self.row(algorithm, initial_state, parameters, result))
+
+    def write(self, row: Dict[str, object]):
+        """
+        Summary:
+            Thêm một dòng vào bộ đệm; ghi cả lô ra tệp khi bộ đệm đủ batch_size dòng.
+
+        Arguments:
+            row -- Dòng kết quả với các khóa trong columns.
+        """
+        with self._lock:
+            self._discard_inherited()
+            self._rows.append(row)
+            if len(self._rows) >= self.batch_size:
+                self._write_rows()
+
+    def flush(self):
+        """Ghi mọi dòng còn trong bộ đệm ra tệp."""
+        with self._lock:
+            self._discard_inherited()
+            self._write_rows()
+
+    def _discard_inherited(self):
+        """Bỏ các dòng thừa hưởng từ tiến trình cha khi được gọi trong tiến trình con tạo bằng fork (đã giữ khóa)."""
+        if self._pid != os.getpid():
+            self._rows, self._pid = [], os.getpid()
+
+    def _write_rows(self):
+        """Ghi bộ đệm ra tệp (đã giữ khóa)."""
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        with open(self.path, mode='a', newline='', encoding='utf-8') as file:
+            if self.format == 'jsonl':
+                file.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+                return
+            writer = csv.DictWriter(file, fieldnames=self.columns)
+            if file.tell() == 0:
+                writer.writeheader()
+            writer.writerows(dict(row, parameters=json.dumps(row['parameters'], sort_keys=True)) for row in rows)
+
+    @classmethod
+    def compatible(cls, path: str) -> bool:
+        """
+        Summary:
+            Kiểm tra tệp CSV có thể ghi thêm dòng kết quả không: tệp chưa có, rỗng, hoặc có tiêu đề đúng columns.
+
+        Arguments:
+            path -- Đường dẫn tệp CSV.
+
+        Returns:
+            bool -- True nếu ghi thêm được mà không trộn hai định dạng.
+        """
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            return True
+        with open(path, newline='', encoding='utf-8', errors='replace') as file:
+            header = next(csv.reader(file), [])
+        return tuple(header) == cls.columns
+
+    @classmethod
+    def migrate_legacy(cls, path: str) -> Optional[str]:
+        """
+        Summary:
+            Chuyển tệp CSV theo định dạng khác sang <tên>.legacy.csv (hoặc .legacyN.csv nếu tên đã có), để đường
+            dẫn cũ ghi được định dạng mới. Chỉ được gọi khi người dùng yêu cầu rõ ràng.
+
+        Arguments:
+            path -- Đường dẫn tệp CSV.
+
+        Returns:
+            Optional[str] -- Tên mới của tệp cũ, None nếu không cần chuyển.
+        """
+        if cls.compatible(path):
+            return None
+        base, extension = os.path.splitext(path)
+        legacy, number = f"{base}.legacy{extension}", 1
+        while os.path.exists(legacy):
+            legacy, number = f"{base}.legacy{number}{extension}", number + 1
+        os.replace(path, legacy)
+        return legacy
+
+
+atexit.register(ResultsSink.flush_all)
+
+
+class SolverBase:
+    """
+    Summary:
+        Phần chung của các bộ giải: bắt đầu một lần giải (_start), lưu kết quả có cấu trúc và ghi dòng kết quả
+        (_finish), và run. Lớp con đặt các thuộc tính memory (MemoryMonitor), profile, results (ResultsSink hoặc
+        None) trong hàm khởi tạo, cài đặt solve và parameters, và có thể thêm số liệu riêng qua _collect_stats.
+    """
+    profile = False
+    profiler: Optional[PhaseProfiler] = None  # Bộ đo các pha của lần giải gần nhất, None nếu không bật profile
+    result: Optional[SolveResult] = None  # Kết quả có cấu trúc của lần giải gần nhất
+    results: Optional[ResultsSink] = None  # Tệp kết quả dùng chung, None nếu không ghi
+
+    def run(self, initial_state) -> SolveResult:
+        """
+        Summary:
+            Giải bài toán và trả về kết quả có cấu trúc thay vì chỉ danh sách nước đi.
+
+        Arguments:
+            initial_state -- Trạng thái ban đầu (SokobanState hoặc BitboardState).
+
+        Returns:
+            SolveResult -- Lý do kết thúc, lời giải nếu có và số liệu thu được tới lúc dừng.
+        """
+        self.solve(initial_state)
+        return self.result
+
+    def parameters(self) -> Dict[str, object]:
+        """
+        Summary:
+            Tham số của bộ giải, được ghi cùng mỗi dòng kết quả.
+
+        Returns:
+            Dict[str, object] -- Tên tham số -> giá trị.
+        """
+        return {}
+
+    def _start(self, algorithm: str, initial_state) -> float:
+        """
+        Summary:
+            Bắt đầu một lần giải: ghi nhớ tên thuật toán và trạng thái ban đầu cho dòng kết quả, tạo bộ đo các pha
+            (nếu bật profile) và bắt đầu đo bộ nhớ.
+
+        Arguments:
+            algorithm -- Tên thuật toán ghi vào tệp kết quả.
+            initial_state -- Trạng thái ban đầu.
+
+        Returns:
+            float -- Thời điểm bắt đầu (theo time.time()).
+        """
+        self._algorithm, self._initial_state = algorithm, initial_state
+        self.profiler = PhaseProfiler() if self.profile else None
+        self.memory.start()
+        return time.time()
+
+    def _collect_stats(self, stats: Dict[str, object]):
+        """
+        Summary:
+            Thêm số liệu riêng của bộ giải vào stats khi kết thúc một lần giải (mặc định không thêm gì).
+
+        Arguments:
+            stats -- Số liệu của lần giải, được sửa tại chỗ.
+        """
+
+    def _finish(self, status: str, moves: Optional[List[Tuple[int, int]]], iteration: int, start_time: float,
+                **stats) -> Optional[List[Tuple[int, int]]]:
+        """
+        Summary:
+            Lưu kết quả có cấu trúc của lần giải vào self.result, ghi dòng kết quả và trả về lời giải.
+
+        Arguments:
+            status -- Lý do kết thúc (xem SolveResult).
+            moves -- Lời giải, hoặc None.
+            iteration -- Số vòng lặp (hoặc nút mở rộng) đã thực hiện.
+            start_time -- Thời điểm bắt đầu (kết quả của _start).
+            stats -- Số liệu riêng của lần giải.
+
+        Returns:
+            Optional[List[Tuple[int, int]]] -- Chính moves.
+        """
+        self._collect_stats(stats)
+        stats['peak_mb'] = self.memory.stop()
+        if self.profiler is not None:
+            stats['profile'] = self.profiler.stats()
+        self.result = SolveResult(status, moves, iteration, time.time() - start_time, stats)
+        if self.results is not None:
+            self.results.record(self._algorithm, self._initial_state, self.parameters(), self.result)
+        return moves
+
+
+def pushed_box(parent, child, direction: int) -> int:
+    """
+    Summary:
+        Xác định hộp bị đẩy bởi một nước đi từng bước: nếu giá trị Zobrist chỉ thay đổi ở phần người chơi
+        thì không có hộp nào di chuyển; nếu không, hộp ở ô người chơi vừa bước vào đã bị đẩy theo hướng direction.
+
+    Arguments:
+        parent -- Trạng thái trước nước đi (SokobanState hoặc BitboardState).
+        child -- Trạng thái sau nước đi.
+        direction -- Chỉ số hướng đi trong MOVES.
+
+    Returns:
+        int -- Ô mới của hộp bị đẩy, hoặc -1 nếu nước đi không đẩy hộp.
+    """
+    level = parent.level
+    player = child.player_cell
+    if parent.zobrist ^ child.zobrist == level.zobrist_player[parent.player_cell] ^ level.zobrist_player[player]:
+        return -1
+    return level.neighbors[player][direction]
+
+
+class DeadlockPruner:
+    """
+    Summary:
+        Giao diện chung của các bộ cắt tỉa bế tắc động, được gọi sau mỗi cú đẩy hộp. Các bộ giải nhận một
+        danh sách bộ cắt tỉa (tham số pruners) và bỏ qua trạng thái nếu một bộ bất kỳ báo bế tắc.
+        Lớp con cài đặt is_deadlock; prune đếm số lần kiểm tra và số trạng thái bị cắt.
+    """
+    name = 'pruner'
+
+    def __init__(self):
+        self.checks = 0
+        self.pruned = 0
+
+    def prune(self, level: 'LevelIndex', player: int, box_mask: int, pushed: int) -> bool:
+        """
+        Summary:
+            Kiểm tra trạng thái sau một cú đẩy và cập nhật các bộ đếm.
+
+        Arguments:
+            level -- Chỉ mục của bản đồ.
+            player -- Ô người chơi sau cú đẩy (ô cũ của hộp).
+            box_mask -- Mặt nạ bit các ô có hộp sau cú đẩy.
+            pushed -- Ô mới của hộp vừa bị đẩy.
+
+        Returns:
+            bool -- True nếu trạng thái chắc chắn bế tắc và cần bỏ qua.
+        """
+        self.checks += 1
+        if self.is_deadlock(level, player, box_mask, pushed):
+            self.pruned += 1
+            return True
+        return False
+
+    def is_deadlock(self, level: 'LevelIndex', player: int, box_mask: int, pushed: int) -> bool:
+        raise NotImplementedError
+
+    def learn(self, level: 'LevelIndex', player: int, box_mask: int, pushed: int):
+        """
+        Summary:
+            Được gọi khi tìm kiếm biết trạng thái là bế tắc nhờ nguồn khác (bộ cắt tỉa khác, hoặc mọi nhánh con
+            đều bế tắc). Mặc định không làm gì; các bộ cắt tỉa có thể học thêm mẫu bế tắc ở đây.
+
+        Arguments:
+            level -- Chỉ mục của bản đồ.
+            player -- Ô người chơi sau cú đẩy.
+            box_mask -- Mặt nạ bit các ô có hộp sau cú đẩy.
+            pushed -- Ô mới của hộp vừa bị đẩy.
+        """
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Summary:
+            Trả về các số liệu thống kê của bộ cắt tỉa.
+
+        Returns:
+            Dict[str, int] -- Số lần kiểm tra và số trạng thái bị cắt.
+        """
+        return {'checks': self.checks, 'pruned': self.pruned}
+
+
+def is_pruned(pruners: Sequence[DeadlockPruner], level: 'LevelIndex', player: int, box_mask: int, pushed: int) -> bool:
+    """
+    Summary:
+        Chạy lần lượt các bộ cắt tỉa, dừng ở bộ đầu tiên báo bế tắc.
+
+    Arguments:
+        pruners -- Danh sách bộ cắt tỉa.
+        level -- Chỉ mục của bản đồ.
+        player -- Ô người chơi sau cú đẩy.
+        box_mask -- Mặt nạ bit các ô có hộp sau cú đẩy.
+        pushed -- Ô mới của hộp vừa bị đẩy.
+
+    Returns:
+        bool -- True nếu trạng thái bị cắt.
+    """
+    for pruner in pruners:
+        if pruner.prune(level, player, box_mask, pushed):
+            for other in pruners:
+                if other is not pruner:
+                    other.learn(level, player, box_mask, pushed)
+            return True
+    return False
+
+
+def learn_deadlock(pruners: Sequence[DeadlockPruner], level: 'LevelIndex', player: int, box_mask: int, pushed: int):
+    """
+    Summary:
+        Báo cho các bộ cắt tỉa một trạng thái đã được chứng minh bế tắc (ví dụ mọi nhánh con đều bị loại).
+
+    Arguments:
+        pruners -- Danh sách bộ cắt tỉa.
+        level -- Chỉ mục của bản đồ.
+        player -- Ô người chơi sau cú đẩy.
+        box_mask -- Mặt nạ bit các ô có hộp sau cú đẩy.
+        pushed -- Ô mới của hộp vừa bị đẩy.
+    """
+    for pruner in pruners:
+        pruner.learn(level, player, box_mask, pushed)
+
+
+class FreezeDeadlockPruner(DeadlockPruner):
+    """
+    Summary:
+        Phát hiện bế tắc đóng băng (freeze deadlock): hộp vừa bị đẩy cùng các hộp kề nó bị khóa cả theo chiều
+        ngang lẫn chiều dọc bởi tường, ô bế tắc hoặc lẫn nhau, và trong nhóm đó có hộp không nằm trên mục tiêu.
+        Chỉ xét các hộp trong cửa sổ (2 * window_radius + 1)^2 quanh hộp vừa đẩy (hộp ngoài cửa sổ được coi
+        như không có, nên kết quả vẫn an toàn), và kết quả được ghi nhớ theo (ô hộp, mẫu hộp trong cửa sổ)
+        trong bộ nhớ đệm của bản đồ.
+    """
+    name = 'freeze'
+    window_radius = 2
+    memo_limit = 200000  # Số mẫu tối đa được ghi nhớ cho mỗi bản đồ
+
+    def __init__(self):
+        super().__init__()
+        self.memo_hits = 0
+
+    def is_deadlock(self, level: 'LevelIndex', player: int, box_mask: int, pushed: int) -> bool:
+        if level.dead[pushed]:
+            return True
+        local = box_mask & level.window_masks(self.window_radius)[pushed]
+        memo = level.cache(self.name)
+        key = (pushed, local)
+        result = memo.get(key)
+        if result is None:
+            group = self._frozen(level, pushed, local, 0)
+            result = group is not None and bool(group & ~level.target_mask)
+            if len(memo) >= self.memo_limit:
+                memo.clear()
+            memo[key] = result
+        else:
+            self.memo_hits += 1
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats['memo_hits'] = self.memo_hits
+        return stats
+
+    def _frozen(self, level: 'LevelIndex', cell: int, box_mask: int, assumed: int) -> Optional[int]:
+        """
+        Summary:
+            Kiểm tra hộp tại ô cell có bị khóa theo cả hai chiều không. Các hộp đang được xét ở tầng trên
+            (assumed) được coi như tường để tránh lặp vô hạn.
+
+        Arguments:
+            level -- Chỉ mục của bản đồ.
+            cell -- Ô của hộp cần kiểm tra.
+            box_mask -- Mặt nạ bit các hộp được xét.
+            assumed -- Mặt nạ bit các hộp được coi như tường.
+
+        Returns:
+            Optional[int] -- Mặt nạ bit nhóm hộp bị khóa (gồm cả cell) nếu hộp bị khóa, None nếu không.
+        """
+        assumed |= 1 << cell
+        group = 1 << cell
+        for axis in (0, 2):  # Chiều dọc (MOVES[0], MOVES[1]) và chiều ngang (MOVES[2], MOVES[3])
+            blocked = self._blocked(level, cell, axis, box_mask, assumed)
+            if blocked is None:
+                return None
+            group |= blocked
+        return group
+
+    def _blocked(self, level: 'LevelIndex', cell: int, axis: int, box_mask: int, assumed: int) -> Optional[int]:
+        """
+        Summary:
+            Kiểm tra hộp tại ô cell có bị khóa theo một chiều không: một bên là tường (hoặc hộp giả định là tường),
+            hai bên đều là ô bế tắc, hoặc một bên là hộp cũng bị khóa.
+
+        Arguments:
+            level -- Chỉ mục của bản đồ.
+            cell -- Ô của hộp cần kiểm tra.
+            axis -- Chỉ số hướng đầu tiên của chiều (0: dọc, 2: ngang).
+            box_mask -- Mặt nạ bit các hộp được xét.
+            assumed -- Mặt nạ bit các hộp được coi như tường.
+
+        Returns:
+            Optional[int] -- Mặt nạ bit các hộp khác góp phần khóa (0 nếu bị khóa bởi tường), None nếu không bị khóa.
+        """
+        first, second = level.neighbors[cell][axis], level.neighbors[cell][axis + 1]
+        if first < 0 or second < 0 or (assumed >> first) & 1 or (assumed >> second) & 1:
+            return 0
+        if level.dead[first] and level.dead[second]:
+            return 0
+        for side in (first, second):
+            if (box_mask >> side) & 1:
+                group = self._frozen(level, side, box_mask, assumed)
+                if group is not None:
+                    return group
+        return None
+
+
+class CorralPruner(DeadlockPruner):
+    """
+    Summary:
+        Cắt tỉa theo vùng bị bao (corral): sau mỗi cú đẩy, tìm vùng ô trống kề hộp vừa đẩy mà người chơi không
+        tới được. Các hộp bao quanh vùng đó được thử giải riêng trong một tìm kiếm phụ có giới hạn số nút,
+        trong đó mọi hộp khác bị bỏ đi (bài toán được nới lỏng). Nếu tìm kiếm phụ duyệt hết mà không đưa được
+        các hộp bao quanh lên mục tiêu thì trạng thái gốc chắc chắn bế tắc. Hết giới hạn nút, hoặc người chơi
+        vào được trong vùng, đều được coi là không bế tắc nên việc cắt tỉa luôn an toàn.
+        Kết quả được ghi nhớ theo (mặt nạ hộp bao quanh, ô đại diện vùng người chơi) trong bộ nhớ đệm của bản đồ.
+
+    Arguments:
+        max_nodes -- Số nút tối đa của mỗi tìm kiếm phụ.
+    """
+    name = 'corral'
+    memo_limit = 100000  # Số vùng bị bao tối đa được ghi nhớ cho mỗi bản đồ
+
+    def __init__(self, max_nodes: int = 2000):
+        super().__init__()
+        self.max_nodes = max_nodes
+        self.corrals = 0  # Số lần tìm thấy vùng bị bao
+        self.sub_searches = 0  # Số tìm kiếm phụ đã chạy
+        self.memo_hits = 0
+        self.budget_exhausted = 0  # Số tìm kiếm phụ dừng vì hết giới hạn nút
+
+    def is_deadlock(self, level: 'LevelIndex', player: int, box_mask: int, pushed: int) -> bool:
+        reach = level.reachable(player, box_mask)
+        grid_bits = level.grid_bits
+        free = level.floor_grid & ~reach
+        for box in level.cells_of(box_mask):
+            free &= ~grid_bits[box]
+        # Các ô trống kề hộp vừa đẩy mà người chơi không tới được là hạt giống của vùng bị bao
+        seeds = 0
+        for neighbor in level.neighbors[pushed]:
+            if neighbor >= 0 and free & grid_bits[neighbor]:
+                seeds |= grid_bits[neighbor]
+        if not seeds:
+            return False
+        self.corrals += 1
+
+        # Loang vùng bị bao trên mặt nạ lưới rồi lấy các hộp kề vùng
+        stride = level.stride
+        corral = frontier = seeds
+        free ^= seeds
+        while frontier:
+            frontier = ((frontier << 1) | (frontier >> 1) | (frontier << stride) | (frontier >> stride)) & free
+            free ^= frontier
+            corral |= frontier
+        border = (corral << 1) | (corral >> 1) | (corral << stride) | (corral >> stride)
+        corral_boxes = 0
+        for box in level.cells_of(box_mask):
+            if border & grid_bits[box]:
+                corral_boxes |= 1 << box
+
+        representative = self._representative(level, level.reachable(player, corral_boxes))
+        memo = level.cache(self.name)
+        key = (corral_boxes, representative)
+        result = memo.get(key)
+        if result is None:
+            result = self._unsolvable(level, player, corral_boxes, corral)
+            if len(memo) >= self.memo_limit:
+                memo.clear()
+            memo[key] = result
+        else:
+            self.memo_hits += 1
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats.update(corrals=self.corrals, sub_searches=self.sub_searches, memo_hits=self.memo_hits,
+                     budget_exhausted=self.budget_exhausted)
+        return stats
+
+    @staticmethod
+    def _representative(level: 'LevelIndex', reach: int) -> int:
+        """Ô đại diện (ô có chỉ số nhỏ nhất) của vùng reach, giống LevelIndex.region."""
+        return level.grid_cells[(reach & -reach).bit_length() - 1]
+
+    def _unsolvable(self, level: 'LevelIndex', player: int, box_mask: int, corral: int) -> bool:
+        """
+        Summary:
+            Tìm kiếm phụ theo chiều rộng trên các cú đẩy, chỉ với các hộp bao quanh vùng bị bao.
+
+        Arguments:
+            level -- Chỉ mục của bản đồ.
+            player -- Ô người chơi.
+            box_mask -- Mặt nạ bit các hộp bao quanh vùng.
+            corral -- Mặt nạ lưới của vùng bị bao.
+
+        Returns:
+            bool -- True nếu đã duyệt hết mà không có cấu hình nào đưa mọi hộp lên mục tiêu.
+        """
+        self.sub_searches += 1
+        target_mask = level.target_mask
+        queue = deque([(box_mask, player)])
+        seen = set()
+        while queue:
+            if len(seen) >= self.max_nodes:
+                self.budget_exhausted += 1
+                return False
+            boxes, player = queue.popleft()
+            if boxes & ~target_mask == 0:
+                return False
+            reach = level.reachable(player, boxes)
+            if reach & corral:
+                return False  # Người chơi đã vào được vùng bị bao
+            key = (boxes, self._representative(level, reach))
+            if key in seen:
+                continue
+            seen.add(key)
+            for box, _, next_boxes in level.push_successors(reach, boxes):
+                queue.append((next_boxes, box))
+        return True
+
+
+class PatternDatabase(DeadlockPruner):
+    """
+    Summary:
+        Cơ sở dữ liệu mẫu bế tắc được lưu lại giữa các lần chạy. Mỗi mẫu là nội dung cửa sổ 5x5 quanh hộp vừa đẩy
+        (tường, ô trống, ô bế tắc, mục tiêu và hộp), đưa về dạng chuẩn theo 8 phép quay/lật, nên dùng được
+        cho mọi bản đồ. Mẫu được học khi tìm kiếm phát hiện bế tắc (từ bộ cắt tỉa khác hoặc từ nhánh con đã
+        duyệt hết), nhưng chỉ được lưu sau khi một tìm kiếm nhỏ trên riêng cửa sổ chứng minh bế tắc với
+        giả định dễ dãi nhất cho phần bên ngoài: người chơi đi lại tự do bên ngoài, và hộp bị đẩy ra khỏi
+        cửa sổ được coi là đã xong. Mẫu mới được ghi nối vào tệp ngay khi học được, mỗi mẫu bằng một lần write
+        trên tệp mở với O_APPEND, nên các tiến trình (danh mục, leo đồi song song) ghi cùng tệp không làm xen
+        lẫn các dòng; dòng hỏng hay không phải mẫu bị bỏ qua khi đọc.
+
+    Arguments:
+        path -- Đường dẫn tệp mẫu (tạo mới nếu chưa có).
+        max_nodes -- Số nút tối đa của tìm kiếm chứng minh trên cửa sổ.
+    """
+    name = 'patterns'
+    radius = 2
+    file_name = 'deadlock_patterns.txt'
+    _shared: Dict[str, 'PatternDatabase'] = {}
+
+    # Ký hiệu của một ô trong cửa sổ
+    WALL, FLOOR, DEAD, TARGET = '#', '.', 'x', '_'
+    BOX, BOX_ON_DEAD, BOX_ON_TARGET = '$', 'D', '*'
+    _with_box = {FLOOR: BOX, DEAD: BOX_ON_DEAD, TARGET: BOX_ON_TARGET}
+    _symbols = frozenset(WALL + FLOOR + DEAD + TARGET + BOX + BOX_ON_DEAD + BOX_ON_TARGET)
+
+    def __init__(self, path: str, max_nodes: int = 200):
+        super().__init__()
+        self.path = path
+        self.max_nodes = max_nodes
+        self.learned = 0
+        self.version = 0  # Tăng mỗi khi có mẫu mới, để bỏ các kết quả đã ghi nhớ trên từng bản đồ
+        self._patterns: Set[str] = set()  # Mọi biến thể đối xứng của các mẫu, để tra cứu bằng một phép băm
+        self._count = 0  # Số mẫu (không tính các biến thể đối xứng)
+        size = 2 * self.radius + 1
+        self._symmetries = [[(ty if swap else tx) * (1 if sx > 0 else -1) + self.radius +
+                             ((tx if swap else ty) * (1 if sy > 0 else -1) + self.radius) * size
+                             for ty in range(-self.radius, self.radius + 1)
+                             for tx in range(-self.radius, self.radius + 1)]
+                            for swap in (False, True) for sx in (1, -1) for sy in (1, -1)]
+        if os.path.exists(path):
+            with open(path, encoding='ascii', errors='replace') as file:
+                for line in file:
+                    line = line.rstrip('\n')
+                    # Bỏ dòng tiêu đề (dài hơn một mẫu) và các dòng hỏng
+                    if len(line) == size * size and self._symbols.issuperset(line):
+                        self._add(line)
+
+    @classmethod
+    def shared(cls, path: str) -> 'PatternDatabase':
+        """
+        Summary:
+            Lấy cơ sở dữ liệu dùng chung cho một tệp, để các lần giải trong cùng tiến trình không phải đọc lại tệp.
+
+        Arguments:
+            path -- Đường dẫn tệp mẫu.
+
+        Returns:
+            PatternDatabase -- Cơ sở dữ liệu của tệp.
+        """
+        key = os.path.abspath(path)
+        database = cls._shared.get(key)
+        if database is None:
+            database = cls._shared[key] = cls(path)
+        return database
+
+    @classmethod
+    def for_results(cls, csv_file: str = 'results_v2.csv') -> 'PatternDatabase':
+        """
+        Summary:
+            Cơ sở dữ liệu dùng chung lưu trong tệp deadlock_patterns.txt cùng thư mục với tệp kết quả.
+
+        Arguments:
+            csv_file -- Đường dẫn tệp kết quả.
+
+        Returns:
+            PatternDatabase -- Cơ sở dữ liệu dùng chung.
+        """
+        return cls.shared(os.path.join(os.path.dirname(os.path.abspath(csv_file)), cls.file_name))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats.update(learned=self.learned, patterns=self._count)
+        return stats
+
+    def is_deadlock(self, level: 'LevelIndex', player: int, box_mask: int, pushed: int) -> bool:
+        if not self._patterns:
+            return False
+        memo = self._memo(level)
+        key = (pushed, box_mask & level.window_masks(self.radius)[pushed])
+        result = memo.get(key)
+        if result is None:
+            result = memo[key] = self._encode(level, box_mask, pushed) in self._patterns
+        return result
+
+    def learn(self, level: 'LevelIndex', player: int, box_mask: int, pushed: int):
+        tried = level.cache(self.name + ':tried')
+        key = (pushed, box_mask & level.window_masks(self.radius)[pushed])
+        if key in tried:
+            return
+        tried[key] = True
+        pattern = self._encode(level, box_mask, pushed)
+        if pattern in self._patterns or not self._unsolvable(pattern):
+            return
+        self._add(pattern)
+        self.learned += 1
+        self.version += 1
+        self._append(self._canonical(pattern))
+
+    def _append(self, pattern: str):
+        """Ghi nối một mẫu vào tệp bằng một lần write (O_APPEND), tạo tệp kèm dòng tiêu đề nếu chưa có."""
+        try:
+            descriptor = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            pass
+        else:
+            size = 2 * self.radius + 1
+            with os.fdopen(descriptor, 'w') as file:
+                file.write(f"# Sokoban deadlock patterns: {size}x{size} windows, row-major\n")
+        descriptor = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(descriptor, (pattern + '\n').encode('ascii'))
+        finally:
+            os.close(descriptor)
+
+    def _memo(self, level: 'LevelIndex') -> dict:
+        """Kết quả tra cứu đã ghi nhớ trên bản đồ, bị xóa khi có mẫu mới."""
+        memo = level.cache(self.name + ':' + self.path)
+        if memo.get('version') != self.version:
+            memo.clear()
+            memo['version'] = self.version
+        return memo
+
+    def _add(self, pattern: str):
+        """Thêm mọi biến thể đối xứng của một mẫu."""
+        if pattern in self._patterns:
+            return
+        self._count += 1
+        for symmetry in self._symmetries:
+            self._patterns.add(''.join(pattern[k] for k in symmetry))
+
+    def _canonical(self, pattern: str) -> str:
+        """Dạng chuẩn (nhỏ nhất theo thứ tự từ điển) của một mẫu trên 8 phép đối xứng."""
+        return min(''.join(pattern[k] for k in symmetry) for symmetry in self._symmetries)
+
+    def _encode(self, level: 'LevelIndex', box_mask: int, pushed: int) -> str:
+        """
+        Summary:
+            Mã hóa cửa sổ quanh ô pushed thành chuỗi ký hiệu theo thứ tự hàng.
+
+        Arguments:
+            level -- Chỉ mục của bản đồ.
+            box_mask -- Mặt nạ bit các ô có hộp.
+            pushed -- Ô ở tâm cửa sổ.
+
+        Returns:
+            str -- Chuỗi (2 * radius + 1)^2 ký hiệu.
+        """
+        static = level.cache(self.name + ':static')
+        tokens = static.get(pushed)
+        if tokens is None:
+            tokens = static[pushed] = [
+                self.WALL if cell < 0 else self.TARGET if (level.target_mask >> cell) & 1 else
+                self.DEAD if level.dead[cell] else self.FLOOR
+                for cell in level.window_cells(self.radius)[pushed]]
+        window = level.window_cells(self.radius)[pushed]
+        return ''.join(self._with_box[token] if cell >= 0 and (box_mask >> cell) & 1 else token
+                       for token, cell in zip(tokens, window))
+
+    def _unsolvable(self, pattern: str) -> bool:
+        """
+        Summary:
+            Tìm kiếm theo chiều rộng trên riêng cửa sổ, bắt đầu từ mọi vùng người chơi có thể đứng. Bên ngoài
+            cửa sổ là một ô ảo OUTSIDE nối với mọi ô ở mép; hộp bị đẩy ra ngoài được bỏ đi. Mục tiêu là mọi hộp
+            còn lại nằm trên mục tiêu. Hộp không được đẩy vào tường, hộp khác hay ô bế tắc.
+
+        Arguments:
+            pattern -- Mẫu cửa sổ.
+
+        Returns:
+            bool -- True nếu đã duyệt hết mà không tới được mục tiêu (bế tắc với mọi phần bên ngoài);
+            False nếu giải được hoặc hết giới hạn nút.
+        """
+        size = 2 * self.radius + 1
+        outside = size * size
+        # neighbors[k][d]: ô kề theo hướng MOVES[d], outside nếu ra ngoài cửa sổ, -1 nếu là tường.
+        # adjacent[k]: mặt nạ bit các ô kề mà người chơi có thể bước sang (bit outside là ô ảo bên ngoài).
+        neighbors = []
+        adjacent = [0] * (outside + 1)
+        for k in range(outside):
+            x, y = k % size, k // size
+            around = []
+            for dx, dy in MOVES:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < size and 0 <= ny < size):
+                    around.append(outside)
+                else:
+                    around.append(-1 if pattern[ny * size + nx] == self.WALL else ny * size + nx)
+            neighbors.append(around)
+            if pattern[k] != self.WALL:
+                for neighbor in around:
+                    if neighbor >= 0:
+                        adjacent[k] |= 1 << neighbor
+                        adjacent[neighbor] |= 1 << k
+        mask_of = lambda tokens: sum(1 << k for k in range(outside) if pattern[k] in tokens)
+        floor = (1 << outside) | mask_of((self.FLOOR, self.DEAD, self.TARGET, self.BOX, self.BOX_ON_DEAD, self.BOX_ON_TARGET))
+        blocked = mask_of((self.DEAD, self.BOX_ON_DEAD))
+        targets = mask_of((self.TARGET, self.BOX_ON_TARGET))
+        start_boxes = mask_of((self.BOX, self.BOX_ON_DEAD, self.BOX_ON_TARGET))
+
+        def reach(player: int, boxes: int) -> int:
+            free = floor & ~boxes
+            region = frontier = 1 << player
+            while frontier:
+                grown = 0
+                while frontier:
+                    low = frontier & -frontier
+                    grown |= adjacent[low.bit_length() - 1]
+                    frontier ^= low
+                frontier = grown & free & ~region
+                region |= frontier
+            return region
+
+        # Các vùng xuất phát: vùng nối với bên ngoài và mọi túi ô trống kín trong cửa sổ
+        queue = deque()
+        uncovered = floor & ~start_boxes
+        while uncovered:
+            start = (uncovered & -uncovered).bit_length() - 1
+            uncovered &= ~reach(start, start_boxes)
+            queue.append((start_boxes, start))
+        seen = set()
+        while queue:
+            if len(seen) >= self.max_nodes:
+                return False
+            boxes, player = queue.popleft()
+            if boxes & ~targets == 0:
+                return False
+            region = reach(player, boxes)
+            key = (boxes, region & -region)
+            if key in seen:
+                continue
+            seen.add(key)
+            remaining = boxes
+            while remaining:
+                bit = remaining & -remaining
+                remaining ^= bit
+                box = bit.bit_length() - 1
+                for direction in range(len(MOVES)):
+                    stand = neighbors[box][direction ^ 1]
+                    if stand < 0 or not (region >> stand) & 1:
+                        continue
+                    dest = neighbors[box][direction]
+                    if dest == outside:
+                        queue.append((boxes ^ bit, box))
+                    elif dest >= 0 and not ((boxes | blocked) >> dest) & 1:
+                        queue.append((boxes ^ bit | (1 << dest), box))
+        return True
+
+
+def load_maps(filename: str) -> List[List[str]]:
+    """
+    Summary:
+        Đọc các bản đồ từ tệp văn bản (ví dụ maps.txt). Mỗi bản đồ bắt đầu bằng một dòng chú thích '#',
+        các dòng trống bị bỏ qua.
+
+    Arguments:
+        filename -- Đường dẫn tệp bản đồ.
+
+    Returns:
+        List[List[str]] -- Danh sách bản đồ, mỗi bản đồ là danh sách các dòng ('W' tường, 'P' người chơi,
+        'B' hộp, 'T' mục tiêu, ký tự khác là ô trống).
+    """
+    maps = []
+    current_map = []
+    with open(filename, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith('#'):
+                if current_map:
+                    maps.append(current_map)
+                    current_map = []
+            elif line:
+                current_map.append(line)
+        if current_map:
+            maps.append(current_map)
+    return maps
+
+
+def map_to_game_state(map_data: List[str]) -> Tuple[List[List[int]], Tuple[int, int], List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """
+    Summary:
+        Chuyển một bản đồ dạng văn bản (xem load_maps) thành dữ liệu cho các hàm solve_sokoban_*.
+
+    Arguments:
+        map_data -- Các dòng của bản đồ.
+
+    Returns:
+        Tuple -- (mê cung với 1 là tường, 0 là ô trống; vị trí người chơi; danh sách hộp; danh sách mục tiêu).
+    """
+    maze = []
+    player_pos = None
+    boxes = []
+    targets = []
+
+    for y, row in enumerate(map_data):
+        maze_row = []
+        for x, cell in enumerate(row):
+            if cell == 'W':
+                maze_row.append(1)
+            elif cell == 'P':
+                maze_row.append(0)
+                player_pos = (x, y)
+            elif cell == 'B':
+                maze_row.append(0)
+                boxes.append((x, y))
+            elif cell == 'T':
+                maze_row.append(0)
+                targets.append((x, y))
+            else:
+                maze_row.append(0)
+        maze.append(maze_row)
+    return maze, player_pos, boxes, targets
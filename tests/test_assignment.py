@@ -0,0 +1,34 @@
+import os
+import random
+
+import pytest
+
+from sokoban_common import Assignment, LevelIndex, load_maps, map_to_game_state
+
+MAPS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'maps.txt')
+
+
+def _random_moves(level, boxes, distance, rng, steps):
+    """Di chuyển ngẫu nhiên từng hộp và so phép ghép sửa lại bằng moved với phép ghép giải từ đầu."""
+    assignment = Assignment.solve(level, boxes, distance)
+    free = [cell for cell in range(len(level.cells)) if cell not in boxes]
+    for _ in range(steps):
+        old_cell = rng.choice(boxes)
+        new_cell = free.pop(rng.randrange(len(free)))
+        free.append(old_cell)
+        boxes[boxes.index(old_cell)] = new_cell
+        assignment = assignment.moved(old_cell, new_cell)
+        assert assignment.cost == Assignment.solve(level, boxes, distance).cost
+
+
+@pytest.mark.parametrize('distance', ['manhattan', 'push'])
+@pytest.mark.parametrize('remove', [0, 1, 2], ids=['equal', 'one_box_fewer', 'two_boxes_fewer'])
+def test_moved_matches_solve(distance, remove):
+    rng = random.Random(2024)
+    for game_map in load_maps(MAPS_FILE)[:10]:
+        maze, _, boxes, targets = map_to_game_state(game_map)
+        level = LevelIndex.for_maze(tuple(tuple(row) for row in maze), frozenset(targets))
+        cells = [level.cell_index[box] for box in boxes]
+        if len(cells) <= remove:
+            continue
+        _random_moves(level, rng.sample(cells, len(cells) - remove), distance, rng, 200)
@@ -0,0 +1,24 @@
+import os
+import threading
+
+from astar_solver import AStarSolver
+from sokoban_common import SokobanState, SolveResult, load_maps, map_to_game_state
+
+MAPS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'maps.txt')
+
+
+def test_closing_solve_anytime_finishes_the_solve():
+    maze, player_pos, boxes, targets = map_to_game_state(load_maps(MAPS_FILE)[9])
+    initial_state = SokobanState(tuple(tuple(row) for row in maze), player_pos, frozenset(boxes), frozenset(targets))
+    threads = threading.active_count()
+
+    solver = AStarSolver(csv_file=None)
+    solutions = solver.solve_anytime(initial_state)
+    first = next(solutions)
+    assert solver.result is None  # Tìm kiếm còn đang dừng ở lời giải đầu tiên
+    solutions.close()
+
+    assert solver.result is not None
+    assert solver.result.status == SolveResult.CANCELLED
+    assert solver.result.moves == first.moves
+    assert threading.active_count() == threads  # Luồng đo bộ nhớ đã dừng
@@ -0,0 +1,30 @@
+import multiprocessing
+import os
+import threading
+import time
+
+from hill_climbing_solver import HillClimbingSolver
+from sokoban_common import SokobanState, load_maps, map_to_game_state
+
+MAPS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'maps.txt')
+
+
+def test_solve_parallel_returns_when_a_worker_dies():
+    maze, player_pos, boxes, targets = map_to_game_state(load_maps(MAPS_FILE)[0])
+    initial_state = SokobanState(tuple(tuple(row) for row in maze), player_pos, frozenset(boxes), frozenset(targets))
+    solver = HillClimbingSolver(max_iterations=50, csv_file=None, seed=0, memory='off')
+    thread = threading.Thread(target=solver.solve_parallel, args=(initial_state, 2), daemon=True)
+    thread.start()
+
+    # Giết một tiến trình con từ tiến trình chính ngay khi nó được tạo, trước khi nó kịp gửi kết quả
+    victim = None
+    while victim is None and thread.is_alive():
+        victim = next(iter(multiprocessing.active_children()), None)
+        time.sleep(0.001)
+    assert victim is not None
+    victim.kill()
+
+    thread.join(30)
+    assert not thread.is_alive(), 'solve_parallel không dừng khi một tiến trình chết'
+    assert solver.result is not None
+    assert solver.result.stats['workers'] == 2